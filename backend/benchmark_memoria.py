@@ -0,0 +1,73 @@
+# benchmark_memoria.py
+#
+# Escrituras/seg de guardar_memoria con N escritores concurrentes:
+# conexión nueva por llamada + rollback journal (esquema anterior)
+# vs. MemoriaDB con pool de conexiones y WAL.
+#   python -m backend.benchmark_memoria --escritores 1 4 8 16 --escrituras 200
+
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from backend.db import MemoriaDB
+
+FALLOS = [{"titulo": "Fallo de prueba", "contenido": "x" * 500, "link": None}] * 3
+
+
+def _guardar_sin_pool(db_path):
+    """Réplica del guardar_memoria original: conexión nueva y journal por defecto."""
+    with sqlite3.connect(db_path, timeout=30) as conn:
+        conn.execute("""
+            INSERT INTO memoria (tipo, texto, resultado, fallos_relacionados, timestamp)
+            VALUES (?, ?, ?, ?, datetime('now','localtime'))
+        """, ("Conflicto laboral", "consulta", "informe " * 200, json.dumps(FALLOS)))
+        conn.commit()
+
+
+def _correr(escritores, escrituras, guardar):
+    def trabajo():
+        for _ in range(escrituras):
+            guardar()
+
+    hilos = [threading.Thread(target=trabajo) for _ in range(escritores)]
+    inicio = time.perf_counter()
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    return escritores * escrituras / (time.perf_counter() - inicio)
+
+
+def benchmark(lista_escritores, escrituras):
+    print(f"{'escritores':>10} {'sin pool (w/s)':>15} {'pool+WAL (w/s)':>15}")
+    for n in lista_escritores:
+        with tempfile.TemporaryDirectory() as tmp:
+            legacy = os.path.join(tmp, "legacy.db")
+            MemoriaDB(legacy).cerrar()
+            with sqlite3.connect(legacy) as conn:
+                conn.execute("PRAGMA journal_mode=DELETE")
+            sin_pool = _correr(n, escrituras, lambda: _guardar_sin_pool(legacy))
+
+            db = MemoriaDB(os.path.join(tmp, "pool.db"))
+            con_pool = _correr(n, escrituras, lambda: db.guardar_memoria(
+                tipo="Conflicto laboral",
+                texto="consulta",
+                resultado="informe " * 200,
+                fallos_relacionados=FALLOS,
+            ))
+            db.cerrar()
+
+        print(f"{n:>10} {sin_pool:>15.0f} {con_pool:>15.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de escrituras en MemoriaDB")
+    parser.add_argument("--escritores", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--escrituras", type=int, default=200)
+    args = parser.parse_args()
+
+    benchmark(args.escritores, args.escrituras)
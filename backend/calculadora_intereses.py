@@ -1,15 +1,17 @@
-import requests
 from bs4 import BeautifulSoup
 from datetime import datetime
 
+from backend.config import http_client
+
 class CalculadoraIntereses:
-    def __init__(self):
+    def __init__(self, http=None):
         self.ultima_tasa_guardada = None
+        self.http = http or http_client
 
     def obtener_tasa_oficial(self, tipo_tasa="TEA"):
         try:
             url = "https://cintereses.agjusneuquen.gob.ar/"
-            res = requests.get(url)
+            res = self.http.get(url)
             soup = BeautifulSoup(res.text, "html.parser")
 
             # 🔹 Buscar la tasa según el tipo (ej. "TEA", "TNA", "Activa", "Pasiva")
@@ -1,6 +1,13 @@
 import os
+from urllib.parse import urlparse
 from openai import OpenAI
 from backend.db import MemoriaDB
+from backend.core.cola_escritura import ColaEscritura
+from backend.core.cache_respuestas import CacheRespuestas
+from backend.core.cache_http import CacheHTTP
+from backend.core.http_client import ClienteHTTP
+from backend.core.reranker import Reranker
+from backend.core.uso_llm import MetricasLLM
 
 # ============================================================
 # CONFIGURACIÓN DEL LLM (DeepSeek)
@@ -17,12 +24,108 @@ llm_client = OpenAI(
 # Cambiamos el modelo por el de DeepSeek
 MODEL_NAME = os.getenv("MODEL_NAME", "deepseek-chat")
 
+# Uso de tokens y hits de la cache de prompts del proveedor. Precios en USD por
+# millón de tokens de entrada (normal / servidos desde cache) para estimar el ahorro
+LLM_PRECIO_ENTRADA_MTOK = float(os.getenv("LLM_PRECIO_ENTRADA_MTOK", "0.27"))
+LLM_PRECIO_CACHE_MTOK = float(os.getenv("LLM_PRECIO_CACHE_MTOK", "0.07"))
+
+metricas_llm = MetricasLLM(
+    precio_entrada_mtok=LLM_PRECIO_ENTRADA_MTOK,
+    precio_cache_mtok=LLM_PRECIO_CACHE_MTOK,
+)
+
 # ============================================================
 # CONFIGURACIÓN DE FAISS
 # ============================================================
 
 FAISS_SERVER = os.getenv("FAISS_URL", "http://127.0.0.1:8081")
 
+# Similitud coseno mínima para considerar relevante un fragmento de FAISS
+FAISS_MIN_SCORE = float(os.getenv("FAISS_MIN_SCORE", "0.35"))
+
+# Ranking de /buscar: vector, bm25 o hibrido (BM25 + vectores fusionados con RRF).
+# El híbrido recupera mejor las citas exactas ("art. 245", "Ley 20.744")
+FAISS_MODO_BUSQUEDA = os.getenv("FAISS_MODO_BUSQUEDA", "hibrido")
+
+# ============================================================
+# TIMEOUTS POR ETAPA (segundos) DEL PIPELINE ASÍNCRONO
+# ============================================================
+
+TIMEOUT_FAISS = float(os.getenv("TIMEOUT_FAISS", "5"))
+TIMEOUT_SCRAPING = float(os.getenv("TIMEOUT_SCRAPING", "15"))
+TIMEOUT_DB = float(os.getenv("TIMEOUT_DB", "3"))
+TIMEOUT_LLM = float(os.getenv("TIMEOUT_LLM", "90"))
+
+# ============================================================
+# CLIENTE HTTP COMPARTIDO (FAISS, scraping, tasas)
+# ============================================================
+
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "20"))
+HTTP_REINTENTOS = int(os.getenv("HTTP_REINTENTOS", "2"))
+HTTP_BACKOFF = float(os.getenv("HTTP_BACKOFF", "0.3"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+
+http_client = ClienteHTTP(
+    pool_maxsize=HTTP_POOL_MAXSIZE,
+    reintentos=HTTP_REINTENTOS,
+    backoff=HTTP_BACKOFF,
+    timeout=HTTP_TIMEOUT,
+    timeouts_por_host={urlparse(FAISS_SERVER).netloc: TIMEOUT_FAISS},
+)
+
+# Cache en disco de las páginas scrapeadas del portal de jurisprudencia:
+# el índice se revalida seguido, los fallos publicados casi nunca cambian
+SCRAPING_CACHE_DIR = os.getenv("SCRAPING_CACHE_DIR", "cache_scraping")
+SCRAPING_CACHE_MAX_MB = int(os.getenv("SCRAPING_CACHE_MAX_MB", "200"))
+SCRAPING_TTL_INDICE = float(os.getenv("SCRAPING_TTL_INDICE", "900"))
+SCRAPING_TTL_FALLOS = float(os.getenv("SCRAPING_TTL_FALLOS", "604800"))
+
+# Scraping del portal en cada consulta. Con los fallos ya ingestados en FAISS
+# por backend/crawler_jurisprudencia.py se puede apagar (0): la búsqueda
+# queda como una consulta al índice local
+SCRAPING_EN_CONSULTA = os.getenv("SCRAPING_EN_CONSULTA", "1") == "1"
+
+# Descargas simultáneas de fallos (para todo el proceso) y plazo total por consulta
+SCRAPING_CONCURRENCIA = int(os.getenv("SCRAPING_CONCURRENCIA", "4"))
+SCRAPING_DEADLINE = float(os.getenv("SCRAPING_DEADLINE", "10"))
+
+cache_scraping = CacheHTTP(
+    http_client,
+    SCRAPING_CACHE_DIR,
+    ttl=SCRAPING_TTL_INDICE,
+    max_bytes=SCRAPING_CACHE_MAX_MB * 1024 * 1024,
+)
+
+# ============================================================
+# PRESUPUESTO DE CONTEXTO DEL PROMPT
+# ============================================================
+
+# Tokens máximos para fallos, antecedentes, casos e historial en el prompt,
+# y por entrada (las más largas se resumen)
+CONTEXTO_MAX_TOKENS = int(os.getenv("CONTEXTO_MAX_TOKENS", "3000"))
+CONTEXTO_MAX_TOKENS_ENTRADA = int(os.getenv("CONTEXTO_MAX_TOKENS_ENTRADA", "350"))
+
+# ============================================================
+# RERANK DE FALLOS (cross-encoder local)
+# ============================================================
+
+# Reordena los fallos de FAISS + scraping antes de mandarlos al prompt.
+# Candidatos que se puntúan, segundos por consulta (vencidos se usa el orden
+# de la primera etapa) y fallos que quedan después del rerank
+RERANK_ACTIVO = os.getenv("RERANK_ACTIVO", "0") == "1"
+RERANK_MODELO = os.getenv("RERANK_MODELO", "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1")
+RERANK_TOP_N = int(os.getenv("RERANK_TOP_N", "20"))
+RERANK_PRESUPUESTO = float(os.getenv("RERANK_PRESUPUESTO", "0.8"))
+RERANK_BATCH = int(os.getenv("RERANK_BATCH", "16"))
+RERANK_MAX_FALLOS = int(os.getenv("RERANK_MAX_FALLOS", "5"))
+
+reranker_fallos = Reranker(
+    RERANK_MODELO,
+    top_n=RERANK_TOP_N,
+    presupuesto=RERANK_PRESUPUESTO,
+    batch_size=RERANK_BATCH,
+) if RERANK_ACTIVO else None
+
 # ============================================================
 # BASE DE DATOS LOCAL
 # ============================================================
@@ -30,6 +133,28 @@ FAISS_SERVER = os.getenv("FAISS_URL", "http://127.0.0.1:8081")
 DB_PATH = os.getenv("DB_PATH", "memoria_agente.db")
 db = MemoriaDB(DB_PATH)
 
+# Write-behind de memoria/casos: filas por lote y segundos máximos de espera
+ESCRITURA_MAX_LOTE = int(os.getenv("ESCRITURA_MAX_LOTE", "50"))
+ESCRITURA_INTERVALO = float(os.getenv("ESCRITURA_INTERVALO", "0.5"))
+
+cola_escritura = ColaEscritura(db, max_lote=ESCRITURA_MAX_LOTE, intervalo=ESCRITURA_INTERVALO)
+
+# ============================================================
+# CACHE DE RESPUESTAS
+# ============================================================
+
+# Entradas máximas (0 la desactiva), vida en segundos y similitud coseno mínima
+# para el nivel semántico (0 lo desactiva y se usa solo coincidencia exacta)
+CACHE_RESPUESTAS_MAX = int(os.getenv("CACHE_RESPUESTAS_MAX", "500"))
+CACHE_RESPUESTAS_TTL = float(os.getenv("CACHE_RESPUESTAS_TTL", "3600"))
+CACHE_RESPUESTAS_SIMILITUD = float(os.getenv("CACHE_RESPUESTAS_SIMILITUD", "0.95"))
+
+cache_respuestas = CacheRespuestas(
+    max_entradas=CACHE_RESPUESTAS_MAX,
+    ttl=CACHE_RESPUESTAS_TTL,
+    umbral_similitud=CACHE_RESPUESTAS_SIMILITUD,
+)
+
 # ============================================================
 # CONFIGURACIÓN DE OCR
 # ============================================================
@@ -0,0 +1,169 @@
+# core/cache_http.py
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+from loguru import logger
+
+
+class CacheHTTP:
+    """
+    Cache HTTP persistente en disco para páginas que se scrapean seguido.
+    Por cada URL guarda dos archivos (nombre = sha256 de la URL):
+    - <clave>.body: el HTML tal como llegó
+    - <clave>.json: url, ETag, Last-Modified y momento de la última validación
+    Una entrada dentro de su TTL se sirve sin tocar la red. Vencida, se
+    revalida con If-None-Match / If-Modified-Since (un 304 solo renueva el
+    TTL). Si el portal no responde se sirve la copia vencida. El tamaño total
+    se acota expulsando las entradas usadas hace más tiempo.
+    """
+
+    def __init__(self, http, directorio: str, ttl: float = 3600, max_bytes: int = 200 * 1024 * 1024):
+        self.http = http
+        self.directorio = directorio
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+
+        os.makedirs(directorio, exist_ok=True)
+        self._lock = threading.Lock()
+        self._bytes = sum(
+            os.path.getsize(os.path.join(directorio, f))
+            for f in os.listdir(directorio) if f.endswith(".body")
+        )
+
+        self.hits = 0
+        self.revalidadas = 0
+        self.descargas = 0
+        self.obsoletas_servidas = 0
+        self.evicciones = 0
+
+    # ============================================================
+    # Archivos
+    # ============================================================
+    def _rutas(self, url: str):
+        clave = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        base = os.path.join(self.directorio, clave)
+        return base + ".json", base + ".body"
+
+    def _leer(self, url: str):
+        ruta_meta, ruta_body = self._rutas(url)
+        try:
+            with open(ruta_meta, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(ruta_body, "r", encoding="utf-8") as f:
+                cuerpo = f.read()
+        except (OSError, ValueError):
+            return None, None
+        return meta, cuerpo
+
+    def _escribir_atomico(self, ruta: str, contenido: str):
+        tmp = f"{ruta}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(contenido)
+        os.replace(tmp, ruta)
+
+    def _guardar(self, url: str, meta: dict, cuerpo: str = None):
+        ruta_meta, ruta_body = self._rutas(url)
+        if cuerpo is not None:
+            anterior = os.path.getsize(ruta_body) if os.path.exists(ruta_body) else 0
+            self._escribir_atomico(ruta_body, cuerpo)
+            with self._lock:
+                self._bytes += os.path.getsize(ruta_body) - anterior
+        self._escribir_atomico(ruta_meta, json.dumps(meta))
+
+    def _tocar(self, url: str):
+        # La fecha de acceso del body ordena la expulsión LRU
+        try:
+            os.utime(self._rutas(url)[1])
+        except OSError:
+            pass
+
+    def _recortar(self):
+        with self._lock:
+            if self._bytes <= self.max_bytes:
+                return
+            cuerpos = []
+            for nombre in os.listdir(self.directorio):
+                if nombre.endswith(".body"):
+                    ruta = os.path.join(self.directorio, nombre)
+                    try:
+                        st = os.stat(ruta)
+                    except OSError:
+                        continue
+                    cuerpos.append((st.st_mtime, st.st_size, ruta))
+
+            for _, tam, ruta in sorted(cuerpos):
+                if self._bytes <= self.max_bytes:
+                    break
+                for r in (ruta, ruta[:-len(".body")] + ".json"):
+                    try:
+                        os.remove(r)
+                    except OSError:
+                        pass
+                self._bytes -= tam
+                self.evicciones += 1
+
+    # ============================================================
+    # API
+    # ============================================================
+    def obtener(self, url: str, headers: dict = None, ttl: float = None, **kwargs) -> str:
+        """
+        Texto de `url`, desde disco si está vigente o sigue siendo válido.
+        Lanza la excepción de red solo si no hay ninguna copia en cache.
+        `kwargs` (ej. timeout) se pasan al GET.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        meta, cuerpo = self._leer(url)
+
+        if meta is not None and time.time() - meta["validado"] < ttl:
+            self.hits += 1
+            self._tocar(url)
+            return cuerpo
+
+        condicionales = dict(headers or {})
+        if meta is not None:
+            if meta.get("etag"):
+                condicionales["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                condicionales["If-Modified-Since"] = meta["last_modified"]
+
+        try:
+            resp = self.http.get(url, headers=condicionales, **kwargs)
+            if resp.status_code == 304 and meta is not None:
+                meta["validado"] = time.time()
+                self._guardar(url, meta)
+                self._tocar(url)
+                self.revalidadas += 1
+                return cuerpo
+            resp.raise_for_status()
+        except Exception as e:
+            if meta is None:
+                raise
+            logger.warning(f"No se pudo revalidar {url}, se usa la copia en cache: {e}")
+            self.obsoletas_servidas += 1
+            return cuerpo
+
+        self.descargas += 1
+        self._guardar(url, {
+            "url": url,
+            "etag": resp.headers.get("ETag"),
+            "last_modified": resp.headers.get("Last-Modified"),
+            "validado": time.time(),
+        }, resp.text)
+        self._recortar()
+        return resp.text
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            return {
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "revalidadas": self.revalidadas,
+                "descargas": self.descargas,
+                "obsoletas_servidas": self.obsoletas_servidas,
+                "evicciones": self.evicciones,
+            }
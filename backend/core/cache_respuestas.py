@@ -0,0 +1,145 @@
+# core/cache_respuestas.py
+
+import copy
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from backend.core.normalizador import Normalizador
+
+
+class CacheRespuestas:
+    """
+    Cache de respuestas completas del agente para consultas repetidas.
+    Dos niveles:
+    - exacto: clave = texto normalizado (sin tildes, minúsculas, solo palabras)
+    - semántico (opcional): similitud coseno entre el embedding de la consulta
+      y los de las consultas cacheadas, contra `umbral_similitud`
+    Entradas con TTL y expulsión LRU. Se vacía cuando cambia la versión del
+    corpus FAISS (ver `sincronizar`) o cuando el agente agrega documentos.
+    """
+
+    def __init__(self, max_entradas: int = 500, ttl: float = 3600,
+                 umbral_similitud: float = 0.95):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self.umbral_similitud = umbral_similitud
+
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+
+        self.hits_exactos = 0
+        self.hits_semanticos = 0
+        self.misses = 0
+        self.invalidaciones = 0
+
+    @property
+    def semantica(self) -> bool:
+        return 0 < self.umbral_similitud <= 1
+
+    @staticmethod
+    def clave(texto: str) -> str:
+        return " ".join(re.findall(r"\w+", Normalizador.normalizar(texto or "")))
+
+    @staticmethod
+    def _unitario(vector):
+        if vector is None:
+            return None
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        norma = np.linalg.norm(vector)
+        return vector / norma if norma > 0 else None
+
+    # ============================================================
+    # Invalidación
+    # ============================================================
+    def sincronizar(self, version):
+        """Vacía la cache si la versión del corpus cambió desde la última vista."""
+        if version is None:
+            return
+        with self._lock:
+            if self._version is not None and version != self._version:
+                self._vaciar()
+            self._version = version
+
+    def invalidar(self):
+        with self._lock:
+            self._vaciar()
+
+    def _vaciar(self):
+        if self._datos:
+            self.invalidaciones += 1
+        self._datos.clear()
+
+    # ============================================================
+    # Lectura / escritura
+    # ============================================================
+    def obtener(self, texto: str, vector=None):
+        """
+        Devuelve (respuesta, nivel) con nivel "exacto" o "semantico",
+        o (None, None) si no hay una entrada vigente.
+        """
+        clave = self.clave(texto)
+        vector = self._unitario(vector) if self.semantica else None
+        ahora = time.monotonic()
+
+        with self._lock:
+            self._purgar_vencidas(ahora)
+
+            entrada = self._datos.get(clave)
+            if entrada is not None:
+                self._datos.move_to_end(clave)
+                self.hits_exactos += 1
+                return copy.deepcopy(entrada["respuesta"]), "exacto"
+
+            if vector is not None:
+                candidatas = [(c, e) for c, e in self._datos.items() if e["vector"] is not None]
+                if candidatas:
+                    matriz = np.vstack([e["vector"] for _, e in candidatas])
+                    similitudes = matriz @ vector
+                    mejor = int(np.argmax(similitudes))
+                    if similitudes[mejor] >= self.umbral_similitud:
+                        clave_similar, entrada = candidatas[mejor]
+                        self._datos.move_to_end(clave_similar)
+                        self.hits_semanticos += 1
+                        return copy.deepcopy(entrada["respuesta"]), "semantico"
+
+            self.misses += 1
+            return None, None
+
+    def guardar(self, texto: str, respuesta: dict, vector=None):
+        if self.max_entradas <= 0:
+            return
+        clave = self.clave(texto)
+        with self._lock:
+            self._datos[clave] = {
+                "respuesta": copy.deepcopy(respuesta),
+                "vector": self._unitario(vector) if self.semantica else None,
+                "expira": time.monotonic() + self.ttl,
+            }
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+
+    def _purgar_vencidas(self, ahora: float):
+        vencidas = [c for c, e in self._datos.items() if e["expira"] <= ahora]
+        for c in vencidas:
+            del self._datos[c]
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            hits = self.hits_exactos + self.hits_semanticos
+            total = hits + self.misses
+            return {
+                "entradas": len(self._datos),
+                "max_entradas": self.max_entradas,
+                "hits_exactos": self.hits_exactos,
+                "hits_semanticos": self.hits_semanticos,
+                "misses": self.misses,
+                "invalidaciones": self.invalidaciones,
+                "version_corpus": self._version,
+                "hit_rate": round(hits / total, 4) if total else 0.0,
+            }
@@ -0,0 +1,153 @@
+# core/cola_escritura.py
+
+import atexit
+import queue
+import threading
+import time
+
+# Marca de cierre: el hilo escribe lo pendiente y termina
+_FIN = object()
+
+
+class ColaEscritura:
+    """
+    Cola write-behind para la persistencia de memoria y casos.
+    El agente encola las filas y responde sin esperar a SQLite; un hilo de
+    fondo las agrupa y las inserta con MemoriaDB.guardar_lote:
+    - un lote se escribe al llegar a `max_lote` filas o a `intervalo` segundos
+      desde la primera fila encolada
+    - `max_pendientes` acota la cola (si se llena, encolar bloquea)
+    - al cerrar (shutdown de FastAPI o salida del proceso) se vacía todo
+    Las lecturas (/memoria, /casos) pueden no ver aún las filas encoladas.
+    """
+
+    def __init__(self, db, max_lote: int = 50, intervalo: float = 0.5,
+                 max_pendientes: int = 10000):
+        self.db = db
+        self.max_lote = max_lote
+        self.intervalo = intervalo
+
+        self._cola = queue.Queue(maxsize=max_pendientes)
+        self._hilo = None
+        self._hilo_lock = threading.Lock()
+
+        self._escritas = 0
+        self._lotes = 0
+        self._errores = 0
+        self._ultimo_lote_ms = 0.0
+
+    # ============================================================
+    # Encolar
+    # ============================================================
+    def encolar_memoria(self, tipo: str, texto: str, resultado: str, fallos_json: str):
+        self._encolar(("memoria", (tipo, texto, resultado, fallos_json)))
+
+    def encolar_caso(self, tipo: str, texto: str, normativa: str, jurisprudencia: str,
+                     resultado: str):
+        self._encolar(("caso", (tipo, texto, normativa, jurisprudencia, resultado)))
+
+    def _encolar(self, item):
+        self._iniciar()
+        self._cola.put(item)
+
+    def _iniciar(self):
+        # El hilo se crea con la primera escritura (después de un fork de workers)
+        if self._hilo is not None and self._hilo.is_alive():
+            return
+        with self._hilo_lock:
+            if self._hilo is None or not self._hilo.is_alive():
+                self._hilo = threading.Thread(
+                    target=self._bucle, name="cola-escritura", daemon=True
+                )
+                self._hilo.start()
+                atexit.register(self.cerrar)
+
+    # ============================================================
+    # Hilo de escritura
+    # ============================================================
+    def _bucle(self):
+        while True:
+            primero = self._cola.get()
+            if primero is _FIN:
+                self._cola.task_done()
+                return
+
+            lote = [primero]
+            fin = False
+            limite = time.monotonic() + self.intervalo
+            while len(lote) < self.max_lote:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    item = self._cola.get(timeout=restante)
+                except queue.Empty:
+                    break
+                if item is _FIN:
+                    fin = True
+                    break
+                lote.append(item)
+
+            self._escribir(lote)
+            for _ in lote:
+                self._cola.task_done()
+
+            if fin:
+                self._cola.task_done()
+                return
+
+    def _escribir(self, lote: list):
+        memorias = [fila for tabla, fila in lote if tabla == "memoria"]
+        casos = [fila for tabla, fila in lote if tabla == "caso"]
+
+        inicio = time.perf_counter()
+        try:
+            self.db.guardar_lote(memorias=memorias, casos=casos)
+        except Exception as e:
+            print(f"Error escribiendo lote de {len(lote)} filas, se reintenta una por una: {e}")
+            memorias, casos = self._escribir_de_a_una(memorias, casos)
+
+        self._ultimo_lote_ms = (time.perf_counter() - inicio) * 1000
+        self._escritas += len(memorias) + len(casos)
+        self._lotes += 1
+
+    def _escribir_de_a_una(self, memorias: list, casos: list):
+        """Aísla la fila que rompió el lote; devuelve las que se pudieron guardar."""
+        guardadas = ([], [])
+        for destino, filas, clave in ((guardadas[0], memorias, "memorias"),
+                                      (guardadas[1], casos, "casos")):
+            for fila in filas:
+                try:
+                    self.db.guardar_lote(**{clave: [fila]})
+                    destino.append(fila)
+                except Exception as e:
+                    self._errores += 1
+                    print(f"Error guardando fila en {clave}, se descarta: {e}")
+        return guardadas
+
+    # ============================================================
+    # Control
+    # ============================================================
+    def vaciar(self):
+        """Bloquea hasta que todo lo encolado hasta ahora quede escrito."""
+        if self._hilo is not None and self._hilo.is_alive():
+            self._cola.join()
+
+    def cerrar(self):
+        """Escribe lo pendiente y detiene el hilo."""
+        with self._hilo_lock:
+            hilo = self._hilo
+            self._hilo = None
+        if hilo is None or not hilo.is_alive():
+            return
+        self._cola.put(_FIN)
+        hilo.join()
+
+    def estadisticas(self) -> dict:
+        return {
+            "pendientes": self._cola.qsize(),
+            "escritas": self._escritas,
+            "lotes": self._lotes,
+            "errores": self._errores,
+            "ultimo_lote_ms": round(self._ultimo_lote_ms, 1),
+        }
@@ -1,63 +1,215 @@
 # core/context_builder.py
 
+import math
+import re
+
 from backend.core.formatter import ResponseFormatter
+from backend.core.normalizador import Normalizador
+
+# tiktoken cuenta exacto para los modelos compatibles con OpenAI; sin él se
+# estima con ~4 caracteres por token
+try:
+    import tiktoken
+    _CODIFICADOR = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    _CODIFICADOR = None
+
+RE_ORACION = re.compile(r"(?<=[.;:!?])\s+")
+
+
+def contar_tokens(texto: str) -> int:
+    if not texto:
+        return 0
+    if _CODIFICADOR is not None:
+        return len(_CODIFICADOR.encode(texto, disallowed_special=()))
+    return math.ceil(len(texto) / 4)
 
 
 class ContextBuilder:
     """
     Construye el contexto que se envía al agente jurídico.
-    Combina:
-    - historial reciente
+    Combina, dentro de un presupuesto fijo de tokens:
+    - fallos relacionados (jurisprudencia recuperada)
+    - antecedentes de FAISS
     - casos guardados
-    - texto del usuario
-    - resultados de búsqueda (si aplica)
+    - historial reciente
+    Cada sección tiene una proporción del presupuesto; lo que una no usa
+    pasa a las siguientes. Dentro de una sección las entradas se ordenan por
+    relevancia con la consulta (términos en común + posición original) y las
+    largas se resumen extrayendo las oraciones con más términos de la consulta.
     """
 
-    def __init__(self, max_historial=5, max_casos=5):
+    # Orden de prioridad y proporción del presupuesto de cada sección
+    SECCIONES = (("fallos", 0.40), ("antecedentes", 0.20), ("casos", 0.25), ("historial", 0.15))
+
+    VACIOS = {
+        "fallos": "No se recuperaron fallos.",
+        "antecedentes": "No hay antecedentes similares.",
+        "casos": "No hay casos guardados.",
+        "historial": "No hay historial previo.",
+    }
+
+    # Por debajo de esto no vale la pena resumir una entrada para que entre
+    MIN_TOKENS_ENTRADA = 40
+
+    def __init__(self, max_historial=5, max_casos=5, max_fallos=5, max_antecedentes=5,
+                 presupuesto_tokens=3000, max_tokens_entrada=350):
         self.max_historial = max_historial
         self.max_casos = max_casos
+        self.max_fallos = max_fallos
+        self.max_antecedentes = max_antecedentes
+        self.presupuesto_tokens = presupuesto_tokens
+        self.max_tokens_entrada = max_tokens_entrada
 
+    # ============================================================
+    # Entradas de cada sección
+    # ============================================================
     def construir_historial(self, historial):
         """
         Recibe una lista de dicts:
         [{"consulta": "...", "respuesta": "..."}]
+        o filas de MemoriaDB.listar_memoria ({"texto": ..., "resultado": ...}).
+        Devuelve una entrada de texto por consulta.
         """
-        if not historial:
-            return "No hay historial previo."
-
-        partes = []
-        for h in historial[-self.max_historial:]:
-            partes.append(
-                f"- Consulta: {h['consulta']}\n  Respuesta: {h['respuesta']}"
-            )
-
-        return "\n".join(partes)
+        entradas = []
+        for h in (historial or [])[-self.max_historial:]:
+            consulta = h.get("consulta", h.get("texto", ""))
+            respuesta = h.get("respuesta", h.get("resultado", ""))
+            entradas.append(f"- Consulta: {consulta}\n  Respuesta: {respuesta}")
+        return entradas
 
     def construir_casos(self, casos):
         """
         Recibe una lista de dicts provenientes de la DB.
         """
-        if not casos:
-            return "No hay casos guardados."
+        return [
+            f"- Caso #{c['id']} ({c['tipo']}): {c['texto']}\n  Resultado: {c['resultado']}"
+            for c in (casos or [])[-self.max_casos:]
+        ]
 
-        partes = []
-        for c in casos[-self.max_casos:]:
-            partes.append(
-                f"- Caso #{c['id']} ({c['tipo']}): {c['texto']}\n"
-                f"  Resultado: {c['resultado']}"
-            )
+    def construir_fallos(self, fallos):
+        entradas = []
+        for f in (fallos or [])[:self.max_fallos]:
+            datos = ", ".join(x for x in (f.get("tribunal"), f.get("fecha")) if x)
+            encabezado = f"- {f.get('titulo') or 'Fallo sin título'}" + (f" ({datos})" if datos else "")
+            entrada = f"{encabezado}\n  {f.get('contenido') or ''}"
+            if f.get("link"):
+                entrada += f"\n  Fuente: {f['link']}"
+            entradas.append(entrada)
+        return entradas
+
+    def construir_antecedentes(self, antecedentes, fallos=None):
+        # Los resultados de FAISS que ya están entre los fallos no se repiten
+        ya_incluidos = {f.get("link") or f.get("titulo") for f in (fallos or [])}
+        entradas = []
+        for a in antecedentes or []:
+            if (a.get("link") or a.get("titulo") or a.get("texto")) in ya_incluidos:
+                continue
+            entradas.append(f"- {a.get('texto', '')}\n  Respuesta: {a.get('respuesta', '')}")
+            if len(entradas) >= self.max_antecedentes:
+                break
+        return entradas
 
-        return "\n".join(partes)
+    # ============================================================
+    # Relevancia y recorte
+    # ============================================================
+    @staticmethod
+    def _terminos(texto: str) -> set:
+        return set(Normalizador.tokens(texto, sin_stopwords=True))
 
-    def construir_contexto(self, historial, casos):
+    def _priorizar(self, entradas: list[str], terminos: set) -> list[str]:
+        """Ordena por términos de la consulta presentes, desempatando por posición."""
+        if not terminos:
+            return entradas
+
+        def relevancia(item):
+            posicion, entrada = item
+            comunes = len(terminos & self._terminos(entrada)) / len(terminos)
+            return comunes + 0.5 / (1 + posicion)
+
+        return [e for _, e in sorted(enumerate(entradas), key=relevancia, reverse=True)]
+
+    def resumir(self, texto: str, max_tokens: int, terminos: set = None) -> str:
         """
-        Devuelve un dict listo para inyectar en el prompt.
+        Resumen extractivo: la primera oración (encabezado de la entrada) y
+        las que más términos de la consulta contienen, en su orden original,
+        hasta `max_tokens`.
         """
-        return {
-            "historial": ResponseFormatter.limpiar_texto(
-                self.construir_historial(historial)
-            ),
-            "casos": ResponseFormatter.limpiar_texto(
-                self.construir_casos(casos)
-            )
+        if contar_tokens(texto) <= max_tokens:
+            return texto
+
+        oraciones = [o for o in RE_ORACION.split(texto) if o.strip()]
+        puntaje = [
+            (len(terminos & self._terminos(o)) if terminos else 0, -i)
+            for i, o in enumerate(oraciones)
+        ]
+        orden = [0] + sorted(range(1, len(oraciones)), key=lambda i: puntaje[i], reverse=True)
+
+        elegidas, usados = set(), contar_tokens(" …")
+        for i in orden:
+            costo = contar_tokens(oraciones[i]) + 1
+            if usados + costo > max_tokens:
+                continue
+            elegidas.add(i)
+            usados += costo
+
+        if not elegidas:
+            # Ni la primera oración entra: corte duro por caracteres
+            return texto[:max(1, max_tokens * 3)].rstrip() + " …"
+        return " ".join(oraciones[i] for i in sorted(elegidas)) + " …"
+
+    def _armar_seccion(self, entradas: list[str], presupuesto: int, terminos: set) -> tuple:
+        partes, usados, recortadas = [], 0, 0
+        for entrada in self._priorizar(entradas, terminos):
+            disponible = presupuesto - usados
+            limite = min(self.max_tokens_entrada, disponible)
+            if limite < self.MIN_TOKENS_ENTRADA:
+                break
+            texto = self.resumir(entrada, limite, terminos)
+            if texto != entrada:
+                recortadas += 1
+            partes.append(texto)
+            usados += contar_tokens(texto) + 1
+        return partes, usados, recortadas
+
+    # ============================================================
+    # Contexto completo
+    # ============================================================
+    def construir_contexto(self, historial, casos, consulta: str = "", fallos=None,
+                           antecedentes=None, presupuesto_tokens: int = None):
+        """
+        Devuelve un dict listo para inyectar en el prompt (una clave por
+        sección) y "estadisticas": tokens usados por sección, entradas
+        incluidas / disponibles / resumidas y total contra el presupuesto.
+        """
+        presupuesto = self.presupuesto_tokens if presupuesto_tokens is None else presupuesto_tokens
+        terminos = self._terminos(consulta)
+        entradas = {
+            "fallos": self.construir_fallos(fallos),
+            "antecedentes": self.construir_antecedentes(antecedentes, fallos),
+            "casos": self.construir_casos(casos),
+            "historial": self.construir_historial(historial),
         }
+
+        contexto, estadisticas = {}, {}
+        sobrante, total = 0, 0
+        for seccion, proporcion in self.SECCIONES:
+            asignado = int(presupuesto * proporcion) + sobrante
+            partes, usados, recortadas = self._armar_seccion(
+                [ResponseFormatter.limpiar_texto(e) for e in entradas[seccion]], asignado, terminos
+            )
+            contexto[seccion] = "\n".join(partes) or self.VACIOS[seccion]
+            sobrante = max(0, asignado - usados)
+            total += usados
+            estadisticas[seccion] = {
+                "tokens": usados,
+                "asignados": asignado,
+                "incluidas": len(partes),
+                "disponibles": len(entradas[seccion]),
+                "resumidas": recortadas,
+            }
+
+        estadisticas["total"] = total
+        estadisticas["presupuesto"] = presupuesto
+        contexto["estadisticas"] = estadisticas
+        return contexto
@@ -66,3 +66,50 @@ class ResponseFormatter:
         texto = ResponseFormatter.limpiar_bullets(texto)
         texto = ResponseFormatter.eliminar_repeticiones(texto)
         return texto
+
+
+class FormateadorIncremental:
+    """
+    Aplica ResponseFormatter sobre un texto que llega por fragmentos (streaming).
+    Solo emite líneas completas, ya formateadas; `cerrar()` entrega el resto.
+    """
+
+    def __init__(self):
+        self.texto = ""          # texto crudo acumulado
+        self._pendiente = ""     # línea en curso, todavía sin formatear
+        self._emitido = False
+        self._lineas_vacias = 0
+
+    def agregar(self, fragmento: str) -> str:
+        self.texto += fragmento
+        self._pendiente += fragmento
+
+        if "\n" not in self._pendiente:
+            return ""
+
+        completas, self._pendiente = self._pendiente.rsplit("\n", 1)
+        return "".join(self._formatear_linea(l) for l in completas.split("\n"))
+
+    def cerrar(self) -> str:
+        resto, self._pendiente = self._pendiente, ""
+        if not resto.strip():
+            return ""
+        return self._formatear_linea(resto).rstrip("\n")
+
+    def _formatear_linea(self, linea: str) -> str:
+        linea = linea.replace("\r", "").replace("\u200b", "")
+        linea = ResponseFormatter.limpiar_bullets(linea)
+        linea = ResponseFormatter.eliminar_repeticiones(linea)
+        linea = re.sub(r"[ \t]+", " ", linea).strip()
+
+        # Mismo criterio que limpiar_texto: sin líneas vacías al inicio
+        # y como máximo una línea vacía seguida
+        if not linea:
+            if not self._emitido or self._lineas_vacias >= 1:
+                return ""
+            self._lineas_vacias += 1
+            return "\n"
+
+        self._emitido = True
+        self._lineas_vacias = 0
+        return linea + "\n"
@@ -0,0 +1,140 @@
+# core/http_client.py
+
+import asyncio
+import threading
+import time
+from urllib.parse import urlparse
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class ClienteHTTP:
+    """
+    Cliente HTTP compartido por el agente, la jurisprudencia y la calculadora.
+    Maneja:
+    - sesión keep-alive con pool de conexiones acotado
+    - reintentos con backoff exponencial (errores de conexión y 5xx)
+    - timeouts por host
+    - métricas de latencia por upstream
+    Expone también un httpx.AsyncClient compartido para el pipeline asíncrono.
+    """
+
+    def __init__(self, pool_maxsize: int = 20, reintentos: int = 2, backoff: float = 0.3,
+                 timeout: float = 10, timeouts_por_host: dict = None):
+        self.pool_maxsize = pool_maxsize
+        self.timeout = timeout
+        self.timeouts_por_host = timeouts_por_host or {}
+
+        retry = Retry(
+            total=reintentos,
+            backoff_factor=backoff,
+            status_forcelist=(502, 503, 504),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=pool_maxsize,
+            pool_maxsize=pool_maxsize,
+            max_retries=retry,
+        )
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._async_client = None
+        self._async_loop = None
+
+        self._lock = threading.Lock()
+        self._metricas = {}
+
+    # ============================================================
+    # Utilidades
+    # ============================================================
+    def timeout_para(self, url: str) -> float:
+        return self.timeouts_por_host.get(urlparse(url).netloc, self.timeout)
+
+    def _registrar(self, url: str, inicio: float, error: bool):
+        host = urlparse(url).netloc
+        ms = (time.perf_counter() - inicio) * 1000
+        with self._lock:
+            m = self._metricas.setdefault(
+                host, {"llamadas": 0, "errores": 0, "ms_total": 0.0, "ms_max": 0.0}
+            )
+            m["llamadas"] += 1
+            m["errores"] += int(error)
+            m["ms_total"] += ms
+            m["ms_max"] = max(m["ms_max"], ms)
+
+    def metricas(self) -> dict:
+        with self._lock:
+            return {
+                host: {
+                    "llamadas": m["llamadas"],
+                    "errores": m["errores"],
+                    "ms_promedio": round(m["ms_total"] / m["llamadas"], 1) if m["llamadas"] else 0.0,
+                    "ms_max": round(m["ms_max"], 1),
+                }
+                for host, m in self._metricas.items()
+            }
+
+    # ============================================================
+    # Síncrono (requests)
+    # ============================================================
+    def request(self, metodo: str, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout_para(url))
+        inicio = time.perf_counter()
+        error = True
+        try:
+            resp = self.session.request(metodo, url, **kwargs)
+            error = resp.status_code >= 500
+            return resp
+        finally:
+            self._registrar(url, inicio, error)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    # ============================================================
+    # Asíncrono (httpx)
+    # ============================================================
+    def async_client(self) -> httpx.AsyncClient:
+        """AsyncClient compartido, recreado si cambia el event loop."""
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_loop is not loop:
+            self._async_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.pool_maxsize,
+                    max_keepalive_connections=self.pool_maxsize,
+                ),
+                transport=httpx.AsyncHTTPTransport(retries=1),
+            )
+            self._async_loop = loop
+        return self._async_client
+
+    async def arequest(self, metodo: str, url: str, **kwargs) -> httpx.Response:
+        kwargs.setdefault("timeout", self.timeout_para(url))
+        inicio = time.perf_counter()
+        error = True
+        try:
+            resp = await self.async_client().request(metodo, url, **kwargs)
+            error = resp.status_code >= 500
+            return resp
+        finally:
+            self._registrar(url, inicio, error)
+
+    async def aget(self, url: str, **kwargs) -> httpx.Response:
+        return await self.arequest("GET", url, **kwargs)
+
+    async def apost(self, url: str, **kwargs) -> httpx.Response:
+        return await self.arequest("POST", url, **kwargs)
+
+    async def acerrar(self):
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+        self.session.close()
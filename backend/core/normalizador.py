@@ -0,0 +1,71 @@
+# core/normalizador.py
+
+import re
+import unicodedata
+
+
+class Normalizador:
+    """
+    Normalización de texto en español para búsquedas:
+    - minúsculas y sin tildes (igual que LaborLawyerAgent.normalizar)
+    - stemming liviano por sufijos ("despidos" -> "despid", "indemnización" -> "indemniz")
+    - stopwords frecuentes fuera de las consultas
+    """
+
+    # Del más largo al más corto: se quita el primero que aplique
+    SUFIJOS = (
+        "amientos", "imientos", "amiento", "imiento",
+        "aciones", "iciones", "uciones", "adores", "adoras",
+        "idades", "acion", "icion", "ucion", "mente", "ador", "adora",
+        "ables", "ibles", "idad", "able", "ible",
+        "ados", "idos", "adas", "idas", "ado", "ido", "ada", "ida",
+        "ar", "er", "ir", "es", "os", "as", "s", "o", "a", "e",
+    )
+    MIN_RAIZ = 4
+
+    STOPWORDS = {
+        "a", "al", "ante", "con", "como", "cual", "de", "del", "desde", "donde",
+        "el", "ella", "en", "entre", "es", "esta", "este", "hay", "la", "las",
+        "le", "les", "lo", "los", "mas", "me", "mi", "muy", "no", "o", "para",
+        "pero", "por", "que", "se", "si", "sin", "sobre", "su", "sus", "te",
+        "tu", "un", "una", "uno", "y", "ya", "yo",
+    }
+
+    @staticmethod
+    def normalizar(texto: str) -> str:
+        """Minúsculas y sin marcas diacríticas."""
+        texto = texto.lower()
+        return "".join(
+            c for c in unicodedata.normalize("NFD", texto)
+            if unicodedata.category(c) != "Mn"
+        )
+
+    @classmethod
+    def raiz(cls, palabra: str) -> str:
+        if not palabra.isalpha():
+            return palabra  # números de artículo / ley se conservan tal cual
+        for sufijo in cls.SUFIJOS:
+            if palabra.endswith(sufijo) and len(palabra) - len(sufijo) >= cls.MIN_RAIZ:
+                return palabra[:-len(sufijo)]
+        return palabra
+
+    @classmethod
+    def tokens(cls, texto: str, sin_stopwords: bool = False) -> list[str]:
+        palabras = re.findall(r"\w+", cls.normalizar(texto or ""))
+        if sin_stopwords:
+            palabras = [p for p in palabras if p not in cls.STOPWORDS]
+        return [cls.raiz(p) for p in palabras]
+
+    @classmethod
+    def para_indice(cls, texto: str) -> str:
+        """Texto normalizado y con raíces, listo para guardar en una tabla FTS."""
+        return " ".join(cls.tokens(texto))
+
+    @classmethod
+    def consulta_fts(cls, texto: str) -> str:
+        """
+        Consulta FTS5 en OR de las raíces (el ranking BM25 premia las que
+        coinciden en más términos). Devuelve "" si no queda ningún término.
+        """
+        terminos = dict.fromkeys(cls.tokens(texto, sin_stopwords=True))
+        return " OR ".join(f'"{t}"' for t in terminos)
@@ -0,0 +1,117 @@
+# core/reranker.py
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+
+from loguru import logger
+
+
+class Reranker:
+    """
+    Segunda etapa de ranking de fallos con un cross-encoder local (CPU).
+    Puntúa cada par (consulta, fallo) de los primeros `top_n` candidatos de
+    todas las fuentes, por lotes, dentro de un presupuesto de tiempo por
+    consulta. Si el presupuesto se agota (o el modelo no está disponible
+    o todavía se está cargando) se devuelve el orden de la primera etapa.
+    El modelo se carga en el hilo del reranker la primera vez que se usa,
+    así que esa consulta cae al orden original sin esperarlo.
+    """
+
+    def __init__(self, modelo: str, top_n: int = 20, presupuesto: float = 0.8,
+                 batch_size: int = 16, max_caracteres: int = 1500):
+        self.modelo = modelo
+        self.top_n = top_n
+        self.presupuesto = presupuesto
+        self.batch_size = batch_size
+        self.max_caracteres = max_caracteres
+
+        # Un solo hilo: el cross-encoder ya usa todos los núcleos en cada lote
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="reranker")
+        self._lock = threading.Lock()
+        self._encoder = None
+        self._carga = None
+        self.disponible = True
+
+        self.reordenadas = 0
+        self.fuera_de_presupuesto = 0
+        self.sin_modelo = 0
+
+    # ============================================================
+    # Modelo
+    # ============================================================
+    def _cargar(self):
+        try:
+            from sentence_transformers import CrossEncoder
+            encoder = CrossEncoder(self.modelo, device="cpu")
+        except Exception as e:
+            logger.warning(f"Reranker deshabilitado, no se pudo cargar {self.modelo}: {e}")
+            self.disponible = False
+            return None
+        self._encoder = encoder
+        logger.info(f"Reranker listo: {self.modelo}")
+        return encoder
+
+    def _modelo_listo(self) -> bool:
+        with self._lock:
+            if self._encoder is not None:
+                return True
+            if self.disponible and self._carga is None:
+                self._carga = self._pool.submit(self._cargar)
+            return False
+
+    def _texto(self, fallo: dict) -> str:
+        texto = f"{fallo.get('titulo') or ''}. {fallo.get('contenido') or ''}"
+        return texto[:self.max_caracteres]
+
+    # ============================================================
+    # Reordenamiento
+    # ============================================================
+    def reordenar(self, consulta: str, fallos: list[dict], max_resultados: int = None,
+                  presupuesto: float = None) -> list[dict]:
+        """
+        Devuelve `fallos` ordenados por relevancia del cross-encoder (con
+        `score_rerank`), recortados a `max_resultados`. Fuera de presupuesto
+        o sin modelo, el orden de entrada.
+        """
+        presupuesto = self.presupuesto if presupuesto is None else presupuesto
+        candidatos, resto = fallos[:self.top_n], fallos[self.top_n:]
+
+        if len(candidatos) < 2 or presupuesto <= 0:
+            return fallos[:max_resultados]
+        if not self._modelo_listo():
+            self.sin_modelo += 1
+            return fallos[:max_resultados]
+
+        limite = time.monotonic() + presupuesto
+        pares = [(consulta, self._texto(f)) for f in candidatos]
+        scores = []
+        for inicio in range(0, len(pares), self.batch_size):
+            lote = pares[inicio:inicio + self.batch_size]
+            futuro = self._pool.submit(self._encoder.predict, lote, batch_size=self.batch_size)
+            try:
+                scores.extend(float(s) for s in futuro.result(timeout=max(0.0, limite - time.monotonic())))
+            except FuturesTimeout:
+                # El lote en curso termina en segundo plano; no se encolan más
+                self.fuera_de_presupuesto += 1
+                logger.warning(f"Rerank fuera de presupuesto ({presupuesto}s), se usa el orden original.")
+                return fallos[:max_resultados]
+            except Exception as e:
+                logger.error(f"Error en rerank, se usa el orden original: {e}")
+                return fallos[:max_resultados]
+
+        for fallo, score in zip(candidatos, scores):
+            fallo["score_rerank"] = score
+        orden = sorted(range(len(candidatos)), key=lambda i: -scores[i])
+        self.reordenadas += 1
+        return ([candidatos[i] for i in orden] + resto)[:max_resultados]
+
+    def estadisticas(self) -> dict:
+        return {
+            "modelo": self.modelo,
+            "cargado": self._encoder is not None,
+            "disponible": self.disponible,
+            "reordenadas": self.reordenadas,
+            "fuera_de_presupuesto": self.fuera_de_presupuesto,
+            "sin_modelo": self.sin_modelo,
+        }
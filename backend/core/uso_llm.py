@@ -0,0 +1,74 @@
+# core/uso_llm.py
+
+import threading
+
+
+class MetricasLLM:
+    """
+    Acumula el uso de tokens que reporta la API del LLM en cada llamada,
+    incluida la parte del prompt servida desde la cache de prefijos del
+    proveedor:
+    - DeepSeek: usage.prompt_cache_hit_tokens / prompt_cache_miss_tokens
+    - OpenAI: usage.prompt_tokens_details.cached_tokens
+    Separa la latencia de las llamadas con y sin hit de cache y estima el
+    ahorro con los precios por millón de tokens de entrada configurados.
+    """
+
+    def __init__(self, precio_entrada_mtok: float = 0.0, precio_cache_mtok: float = 0.0):
+        self.precio_entrada_mtok = precio_entrada_mtok
+        self.precio_cache_mtok = precio_cache_mtok
+        self._lock = threading.Lock()
+
+        self.llamadas = 0
+        self.sin_usage = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cache_hit_tokens = 0
+        self._latencias = {"con_hit": [0, 0.0], "sin_hit": [0, 0.0]}
+
+    @staticmethod
+    def tokens_en_cache(usage) -> int:
+        hit = getattr(usage, "prompt_cache_hit_tokens", None)
+        if hit is None:
+            detalles = getattr(usage, "prompt_tokens_details", None)
+            hit = getattr(detalles, "cached_tokens", None) if detalles is not None else None
+        return int(hit or 0)
+
+    def registrar(self, usage, segundos: float) -> dict:
+        """Suma el `usage` de una respuesta y devuelve el resumen de esa llamada."""
+        with self._lock:
+            self.llamadas += 1
+            if usage is None:
+                self.sin_usage += 1
+                return {}
+
+            prompt = int(getattr(usage, "prompt_tokens", 0) or 0)
+            completion = int(getattr(usage, "completion_tokens", 0) or 0)
+            hit = self.tokens_en_cache(usage)
+
+            self.prompt_tokens += prompt
+            self.completion_tokens += completion
+            self.cache_hit_tokens += hit
+            latencia = self._latencias["con_hit" if hit else "sin_hit"]
+            latencia[0] += 1
+            latencia[1] += segundos
+
+        return {"prompt_tokens": prompt, "completion_tokens": completion,
+                "cache_hit_tokens": hit, "segundos": round(segundos, 3)}
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            ahorro = self.cache_hit_tokens * (self.precio_entrada_mtok - self.precio_cache_mtok) / 1e6
+            return {
+                "llamadas": self.llamadas,
+                "sin_usage": self.sin_usage,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "cache_hit_tokens": self.cache_hit_tokens,
+                "cache_hit_rate": round(self.cache_hit_tokens / self.prompt_tokens, 4) if self.prompt_tokens else 0.0,
+                "segundos_promedio": {
+                    clave: round(total / n, 3) if n else None
+                    for clave, (n, total) in self._latencias.items()
+                },
+                "ahorro_estimado_usd": round(ahorro, 6),
+            }
@@ -0,0 +1,268 @@
+# crawler_jurisprudencia.py
+#
+# Recorre el portal de jurisprudencia fuera de línea, extrae el texto completo
+# de cada fallo con tribunal y fecha y lo carga en el servidor FAISS por lotes
+# (/guardar_lote). Es reanudable: el estado (frontera, URLs visitadas y hashes
+# de contenido) se guarda en disco después de cada lote confirmado.
+#   python -m backend.crawler_jurisprudencia --max-paginas 2000 --estado crawler_estado.json
+# Con el índice poblado se puede correr el backend con SCRAPING_EN_CONSULTA=0.
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from collections import deque
+from urllib.parse import urldefrag, urlparse
+
+from backend.config import FAISS_SERVER, SCRAPING_TTL_FALLOS, SCRAPING_TTL_INDICE, http_client
+from backend.core.normalizador import Normalizador
+from backend.juris_search import Jurisprudencia
+
+ORIGEN = "Portal oficial (indexado)"
+EXTENSIONES_IGNORADAS = (".pdf", ".doc", ".docx", ".jpg", ".jpeg", ".png", ".gif", ".zip", ".css", ".js")
+
+
+class CrawlerJurisprudencia:
+    """
+    Crawler en anchura (BFS) restringido al host del portal.
+    - Una página con al menos `min_caracteres` de texto se considera un fallo:
+      se fragmenta y se envía a FAISS con sus metadatos
+    - Duplicados: por URL (sin fragmento #) y por hash del texto normalizado;
+      una URL entra a la frontera una sola vez
+    - Una descarga fallida no cuenta como visitada: vuelve al final de la
+      frontera hasta `max_reintentos` intentos (contados entre ejecuciones)
+    - Las descargas pasan por la cache HTTP de Jurisprudencia, así que una
+      re-ejecución no vuelve a pedir al portal las páginas vigentes
+    """
+
+    def __init__(self, buscador: Jurisprudencia = None, estado_path: str = "crawler_estado.json",
+                 max_paginas: int = 500, lote: int = 64, palabras_fragmento: int = 300,
+                 solapamiento: int = 50, min_caracteres: int = 1500, pausa: float = 0.5,
+                 max_reintentos: int = 3, http=None):
+        self.buscador = buscador or Jurisprudencia()
+        self.http = http or http_client
+        self.estado_path = estado_path
+        self.max_paginas = max_paginas
+        self.lote = lote
+        self.palabras_fragmento = palabras_fragmento
+        self.solapamiento = solapamiento
+        self.min_caracteres = min_caracteres
+        self.pausa = pausa
+        self.max_reintentos = max_reintentos
+
+        self.host = urlparse(self.buscador.base_url).netloc
+        self._cargar_estado()
+
+        # Páginas procesadas cuyos fragmentos todavía no se confirmaron en FAISS
+        self._buffer = []
+        self._urls_buffer = set()
+        self._hashes_buffer = set()
+
+    # ============================================================
+    # Estado reanudable
+    # ============================================================
+    def _cargar_estado(self):
+        estado = {}
+        if os.path.exists(self.estado_path):
+            with open(self.estado_path, "r", encoding="utf-8") as f:
+                estado = json.load(f)
+            print(f"🔁 Reanudando crawl: {len(estado.get('visitadas', []))} páginas ya visitadas.")
+
+        # dict.fromkeys descarta repetidos de estados guardados por versiones anteriores
+        self.pendientes = deque(dict.fromkeys(estado.get("pendientes", [])))
+        self.en_cola = set(self.pendientes)
+        self.visitadas = set(estado.get("visitadas", []))
+        self.errores = estado.get("errores", {})
+        self.hashes = set(estado.get("hashes", []))
+        self.fallos = estado.get("fallos", 0)
+        self.fragmentos = estado.get("fragmentos", 0)
+
+    def _guardar_estado(self):
+        estado = {
+            "pendientes": list(self.pendientes),
+            "visitadas": sorted(self.visitadas),
+            "hashes": sorted(self.hashes),
+            "errores": self.errores,
+            "fallos": self.fallos,
+            "fragmentos": self.fragmentos,
+        }
+        tmp = self.estado_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(estado, f, ensure_ascii=False)
+        os.replace(tmp, self.estado_path)
+
+    def _encolar(self, url: str, al_frente: bool = False):
+        if url in self.en_cola:
+            return
+        self.en_cola.add(url)
+        if al_frente:
+            self.pendientes.appendleft(url)
+        else:
+            self.pendientes.append(url)
+
+    def _descartada(self, url: str) -> bool:
+        return self.errores.get(url, 0) >= self.max_reintentos
+
+    # ============================================================
+    # Extracción
+    # ============================================================
+    def _es_rastreable(self, url: str) -> bool:
+        partes = urlparse(url)
+        return (
+            partes.scheme in ("http", "https")
+            and partes.netloc == self.host
+            and not partes.path.lower().endswith(EXTENSIONES_IGNORADAS)
+        )
+
+    @staticmethod
+    def _hash(texto: str) -> str:
+        return hashlib.sha256(" ".join(Normalizador.tokens(texto)).encode("utf-8")).hexdigest()
+
+    def _fragmentar(self, texto: str) -> list[str]:
+        palabras = texto.split()
+        paso = max(1, self.palabras_fragmento - self.solapamiento)
+        return [
+            " ".join(palabras[i:i + self.palabras_fragmento])
+            for i in range(0, max(len(palabras) - self.solapamiento, 1), paso)
+        ]
+
+    def _documentos_de_fallo(self, url: str, titulo_enlace: str, html: str) -> list[dict]:
+        titulo, texto = self.buscador.texto_completo(html)
+        titulo = titulo_enlace or titulo or "Fallo sin título"
+        metadatos = self.buscador.extraer_metadatos(texto)
+
+        return [
+            {
+                # El título se antepone para que cada fragmento lleve su contexto al embedding
+                "texto": f"{titulo}. {fragmento}",
+                "respuesta": fragmento,
+                "tipo": "fallo",
+                "titulo": titulo,
+                "tribunal": metadatos["tribunal"],
+                "fecha": metadatos["fecha"],
+                "link": url,
+                "origen": ORIGEN,
+            }
+            for fragmento in self._fragmentar(texto)
+        ]
+
+    # ============================================================
+    # Carga en FAISS
+    # ============================================================
+    def _enviar_lote(self):
+        """Envía el buffer a /guardar_lote y, si se confirmó, persiste el estado."""
+        if self._buffer:
+            resp = self.http.post(
+                f"{FAISS_SERVER}/guardar_lote",
+                json={"documentos": self._buffer},
+                timeout=300,
+            )
+            datos = resp.json() if resp.status_code == 200 else {"error": resp.text}
+            if "error" in datos:
+                raise RuntimeError(f"FAISS rechazó el lote: {datos['error']}")
+            self.fragmentos += datos.get("guardados", 0)
+            print(f"✅ {datos.get('guardados')} fragmentos guardados (total en índice: {datos.get('total')}).")
+
+        self.visitadas.update(self._urls_buffer)
+        self.hashes.update(self._hashes_buffer)
+        self._buffer, self._urls_buffer, self._hashes_buffer = [], set(), set()
+        self._guardar_estado()
+
+    # ============================================================
+    # Recorrido
+    # ============================================================
+    def correr(self) -> dict:
+        procesadas = 0
+        titulos = {}
+        cache = self.buscador.cache
+        base = self.buscador.base_url
+
+        # El índice del portal se recorre en cada ejecución para descubrir fallos nuevos
+        self._encolar(base, al_frente=True)
+
+        while self.pendientes and procesadas < self.max_paginas:
+            url = self.pendientes.popleft()
+            self.en_cola.discard(url)
+            if url in self._urls_buffer or (url in self.visitadas and url != base):
+                continue
+
+            descargas = cache.descargas
+            es_indice = url == base
+            try:
+                html = self.buscador.obtener_pagina(
+                    url, ttl=SCRAPING_TTL_INDICE if es_indice else SCRAPING_TTL_FALLOS
+                )
+            except Exception as e:
+                # No se marca como visitada: se reintenta más tarde (o en la próxima ejecución)
+                self.errores[url] = self.errores.get(url, 0) + 1
+                if self._descartada(url):
+                    print(f"❌ Se descarta {url} tras {self.errores[url]} intentos: {e}")
+                else:
+                    print(f"⚠ No se pudo descargar {url} (intento {self.errores[url]}): {e}")
+                    self._encolar(url)
+                continue
+
+            procesadas += 1
+            self._urls_buffer.add(url)
+            self.errores.pop(url, None)
+
+            for titulo, enlace in self.buscador.enlaces(html, url):
+                enlace = urldefrag(enlace)[0]
+                if (self._es_rastreable(enlace) and enlace not in self.visitadas
+                        and enlace not in self._urls_buffer and not self._descartada(enlace)):
+                    titulos.setdefault(enlace, titulo)
+                    self._encolar(enlace)
+
+            _, texto = self.buscador.texto_completo(html)
+            if not es_indice and len(texto) >= self.min_caracteres:
+                huella = self._hash(texto)
+                if huella not in self.hashes and huella not in self._hashes_buffer:
+                    self._hashes_buffer.add(huella)
+                    self._buffer.extend(self._documentos_de_fallo(url, titulos.get(url), html))
+                    self.fallos += 1
+
+            # También se confirma cada `lote` páginas aunque no hayan aportado fallos
+            if len(self._buffer) >= self.lote or len(self._urls_buffer) >= self.lote:
+                self._enviar_lote()
+
+            # Solo se espera entre pedidos reales al portal, no entre hits de cache
+            if cache.descargas > descargas and self.pausa:
+                time.sleep(self.pausa)
+
+        self._enviar_lote()
+
+        resumen = {
+            "paginas_procesadas": procesadas,
+            "visitadas_total": len(self.visitadas),
+            "pendientes": len(self.pendientes),
+            "descartadas": sum(1 for url in self.errores if self._descartada(url)),
+            "fallos": self.fallos,
+            "fragmentos": self.fragmentos,
+        }
+        print(f"✔ Crawl terminado: {resumen}")
+        return resumen
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Crawler de jurisprudencia hacia FAISS")
+    parser.add_argument("--estado", default="crawler_estado.json")
+    parser.add_argument("--max-paginas", type=int, default=500)
+    parser.add_argument("--lote", type=int, default=64)
+    parser.add_argument("--palabras-fragmento", type=int, default=300)
+    parser.add_argument("--solapamiento", type=int, default=50)
+    parser.add_argument("--min-caracteres", type=int, default=1500)
+    parser.add_argument("--pausa", type=float, default=0.5)
+    parser.add_argument("--max-reintentos", type=int, default=3)
+    args = parser.parse_args()
+
+    CrawlerJurisprudencia(
+        estado_path=args.estado,
+        max_paginas=args.max_paginas,
+        lote=args.lote,
+        palabras_fragmento=args.palabras_fragmento,
+        solapamiento=args.solapamiento,
+        min_caracteres=args.min_caracteres,
+        pausa=args.pausa,
+        max_reintentos=args.max_reintentos,
+    ).correr()
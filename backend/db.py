@@ -1,9 +1,27 @@
 import os
+import queue
 import sqlite3
 import json
+import threading
+from contextlib import contextmanager
+
+from loguru import logger
+
+from backend.core.normalizador import Normalizador
 
 # Leer DB_PATH directamente del entorno para evitar import circular
 DB_PATH = os.getenv("DB_PATH", "memoria_agente.db")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+
+# Pragmas aplicados a cada conexión del pool
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",        # lectores no bloquean al escritor
+    "PRAGMA synchronous=NORMAL",      # fsync solo en checkpoints (seguro con WAL)
+    "PRAGMA cache_size=-20000",       # ~20 MB de cache de páginas
+    "PRAGMA mmap_size=268435456",     # 256 MB mapeados en memoria
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+)
 
 
 class MemoriaDB:
@@ -13,17 +31,78 @@ class MemoriaDB:
     - feedback
     - memoria del agente
     - casos jurídicos
+    Las conexiones se reutilizan desde un pool acotado y thread-safe
+    (compartido por el threadpool de FastAPI), en modo WAL.
     """
 
-    def __init__(self, db_path: str = DB_PATH):
+    # Rutas ya inicializadas en este proceso: _init_db corre una sola vez por DB
+    _inicializadas = set()
+    _init_lock = threading.Lock()
+    # Rutas cuyo SQLite no tiene FTS5 compilado
+    _fts_deshabilitado = set()
+
+    def __init__(self, db_path: str = DB_PATH, pool_size: int = DB_POOL_SIZE):
         self.db_path = db_path
-        self._init_db()
+        self.pool_size = pool_size
+        self._pool = queue.LifoQueue()
+        self._creadas = 0
+        self._pool_lock = threading.Lock()
+
+        with MemoriaDB._init_lock:
+            if db_path not in MemoriaDB._inicializadas:
+                self._init_db()
+                MemoriaDB._inicializadas.add(db_path)
+
+    # ============================================================
+    # Pool de conexiones
+    # ============================================================
+    def _nueva_conexion(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=5)
+        conn.row_factory = sqlite3.Row
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _obtener(self) -> sqlite3.Connection:
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._pool_lock:
+            if self._creadas < self.pool_size:
+                self._creadas += 1
+                return self._nueva_conexion()
+
+        return self._pool.get()
+
+    @contextmanager
+    def _conexion(self):
+        """Presta una conexión del pool; commit al salir, rollback si hubo error."""
+        conn = self._obtener()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self._pool.put(conn)
+
+    def cerrar(self):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._pool_lock:
+            self._creadas = 0
 
     # ============================================================
     # Inicialización de tablas
     # ============================================================
     def _init_db(self):
-        with sqlite3.connect(self.db_path) as conn:
+        with self._conexion() as conn:
             cursor = conn.cursor()
 
             # Tabla de feedback
@@ -62,13 +141,140 @@ class MemoriaDB:
                 )
             """)
 
+            # Índices para filtros + paginación por cursor (id DESC)
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_memoria_tipo_id ON memoria (tipo, id)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_memoria_timestamp ON memoria (timestamp)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_casos_tipo_id ON casos (tipo, id)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_casos_timestamp ON casos (timestamp)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_feedback_calificacion_id ON feedback (calificacion, id)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_feedback_timestamp ON feedback (timestamp)")
+
             conn.commit()
 
+        self._init_fts()
+
+    # ============================================================
+    # Búsqueda full-text (FTS5)
+    # ============================================================
+    # Cada tabla FTS guarda el texto ya normalizado (sin tildes, con raíces)
+    # y usa rowid = id de la tabla original. Se mantiene sincronizada desde
+    # los métodos guardar_* / eliminar_* dentro de la misma transacción.
+    FTS_TABLAS = {
+        "casos": ("texto", "resultado"),
+        "memoria": ("texto", "resultado"),
+    }
+
+    def _init_fts(self):
+        try:
+            with self._conexion() as conn:
+                for tabla, columnas in self.FTS_TABLAS.items():
+                    conn.execute(f"""
+                        CREATE VIRTUAL TABLE IF NOT EXISTS {tabla}_fts
+                        USING fts5({", ".join(columnas)}, tokenize='unicode61 remove_diacritics 2')
+                    """)
+
+                    # Backfill si la tabla FTS quedó desfasada (ej. DB previa)
+                    total = conn.execute(f"SELECT COUNT(*) FROM {tabla}").fetchone()[0]
+                    indexados = conn.execute(f"SELECT COUNT(*) FROM {tabla}_fts").fetchone()[0]
+                    if total != indexados:
+                        conn.execute(f"DELETE FROM {tabla}_fts")
+                        filas = conn.execute(
+                            f"SELECT id, {', '.join(columnas)} FROM {tabla}"
+                        ).fetchall()
+                        for fila in filas:
+                            self._indexar_fts(conn, tabla, fila["id"], [fila[c] for c in columnas])
+        except sqlite3.OperationalError as e:
+            logger.warning(f"FTS5 no disponible, la búsqueda usa los registros recientes: {e}")
+            MemoriaDB._fts_deshabilitado.add(self.db_path)
+
+    @property
+    def fts_disponible(self) -> bool:
+        return self.db_path not in MemoriaDB._fts_deshabilitado
+
+    def _indexar_fts(self, conn, tabla: str, row_id: int, valores: list):
+        if not self.fts_disponible:
+            return
+        columnas = self.FTS_TABLAS[tabla]
+        conn.execute(
+            f"INSERT INTO {tabla}_fts (rowid, {', '.join(columnas)}) VALUES (?, {', '.join('?' * len(columnas))})",
+            (row_id, *[Normalizador.para_indice(v or "") for v in valores])
+        )
+
+    def _desindexar_fts(self, conn, tabla: str, row_id: int):
+        if self.fts_disponible:
+            conn.execute(f"DELETE FROM {tabla}_fts WHERE rowid = ?", (row_id,))
+
+    def _buscar_fts(self, tabla: str, columnas_select: str, consulta: str, limit: int):
+        """
+        Filas de `tabla` que coinciden con `consulta`, ordenadas por BM25 (más
+        relevante primero). None si no se puede buscar (sin FTS5 o consulta
+        sin términos): el llamador usa los registros recientes.
+        """
+        match = Normalizador.consulta_fts(consulta)
+        if not match or not self.fts_disponible:
+            return None
+
+        with self._conexion() as conn:
+            # texto pesa el doble que resultado; bm25() es menor cuanto más relevante
+            rows = conn.execute(f"""
+                SELECT {columnas_select}, bm25({tabla}_fts, 2.0, 1.0) AS score
+                FROM {tabla}_fts
+                JOIN {tabla} t ON t.id = {tabla}_fts.rowid
+                WHERE {tabla}_fts MATCH ?
+                ORDER BY score
+                LIMIT ?
+            """, (match, limit)).fetchall()
+
+        return [dict(row) for row in rows]
+
+    # ============================================================
+    # Paginación por cursor (keyset)
+    # ============================================================
+    @staticmethod
+    def _normalizar_fecha(fecha: str, fin_del_dia: bool = False) -> str:
+        """Acepta 'YYYY-MM-DD' o ISO 8601 y lo lleva al formato de `timestamp`."""
+        fecha = fecha.strip().replace("T", " ")
+        if len(fecha) == 10 and fin_del_dia:
+            fecha += " 23:59:59"
+        return fecha
+
+    def _where(self, cursor: int = None, desde: str = None, hasta: str = None, **iguales):
+        """
+        Arma el WHERE de un listado: id < cursor (página siguiente),
+        rango de timestamp y filtros de igualdad (ej. tipo).
+        """
+        condiciones, params = [], []
+
+        if cursor is not None:
+            condiciones.append("id < ?")
+            params.append(cursor)
+
+        for columna, valor in iguales.items():
+            if valor is not None:
+                condiciones.append(f"{columna} = ?")
+                params.append(valor)
+
+        if desde:
+            condiciones.append("timestamp >= ?")
+            params.append(self._normalizar_fecha(desde))
+
+        if hasta:
+            condiciones.append("timestamp <= ?")
+            params.append(self._normalizar_fecha(hasta, fin_del_dia=True))
+
+        where = ("WHERE " + " AND ".join(condiciones)) if condiciones else ""
+        return where, params
+
+    @staticmethod
+    def siguiente_cursor(filas: list, limit: int):
+        """Cursor para pedir la página siguiente, o None si no hay más."""
+        return filas[-1]["id"] if filas and len(filas) >= limit else None
+
     # ============================================================
     # Feedback
     # ============================================================
     def guardar_feedback(self, consulta: str, calificacion: int, comentario: str):
-        with sqlite3.connect(self.db_path) as conn:
+        with self._conexion() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 INSERT INTO feedback (consulta, calificacion, comentario, timestamp)
@@ -76,43 +282,68 @@ class MemoriaDB:
             """, (consulta, calificacion, comentario))
             conn.commit()
 
-    def listar_feedback(self, limit: int = 20):
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            cursor.execute("""
+    def listar_feedback(self, limit: int = 20, cursor: int = None, calificacion: int = None,
+                        desde: str = None, hasta: str = None):
+        where, params = self._where(cursor, desde, hasta, calificacion=calificacion)
+        with self._conexion() as conn:
+            cur = conn.cursor()
+            cur.execute(f"""
                 SELECT id, consulta, calificacion, comentario, timestamp
                 FROM feedback
+                {where}
                 ORDER BY id DESC
                 LIMIT ?
-            """, (limit,))
-            rows = cursor.fetchall()
+            """, (*params, limit))
+            rows = cur.fetchall()
 
         return [dict(row) for row in rows]
 
+    # ============================================================
+    # Escritura por lotes
+    # ============================================================
+    def guardar_lote(self, memorias: list = (), casos: list = ()):
+        """
+        Inserta memorias y casos en una sola transacción (un único fsync).
+        - memorias: tuplas (tipo, texto, resultado, fallos_relacionados_json)
+        - casos: tuplas (tipo, texto, normativa, jurisprudencia, resultado)
+        """
+        with self._conexion() as conn:
+            cursor = conn.cursor()
+            for tipo, texto, resultado, fallos_json in memorias:
+                cursor.execute("""
+                    INSERT INTO memoria (tipo, texto, resultado, fallos_relacionados, timestamp)
+                    VALUES (?, ?, ?, ?, datetime('now','localtime'))
+                """, (tipo, texto, resultado, fallos_json))
+                self._indexar_fts(conn, "memoria", cursor.lastrowid, [texto, resultado])
+
+            for tipo, texto, normativa, jurisprudencia, resultado in casos:
+                cursor.execute("""
+                    INSERT INTO casos (tipo, texto, normativa, jurisprudencia, resultado, timestamp)
+                    VALUES (?, ?, ?, ?, ?, datetime('now','localtime'))
+                """, (tipo, texto, normativa, jurisprudencia, resultado))
+                self._indexar_fts(conn, "casos", cursor.lastrowid, [texto, resultado])
+
     # ============================================================
     # Memoria del agente
     # ============================================================
     def guardar_memoria(self, tipo: str, texto: str, resultado: str, fallos_relacionados: list):
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO memoria (tipo, texto, resultado, fallos_relacionados, timestamp)
-                VALUES (?, ?, ?, ?, datetime('now','localtime'))
-            """, (tipo, texto, resultado, json.dumps(fallos_relacionados)))
-            conn.commit()
+        self.guardar_lote(memorias=[
+            (tipo, texto, resultado, json.dumps(fallos_relacionados, ensure_ascii=False))
+        ])
 
-    def listar_memoria(self, limit: int = 10):
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            cursor.execute("""
+    def listar_memoria(self, limit: int = 10, cursor: int = None, tipo: str = None,
+                       desde: str = None, hasta: str = None):
+        where, params = self._where(cursor, desde, hasta, tipo=tipo)
+        with self._conexion() as conn:
+            cur = conn.cursor()
+            cur.execute(f"""
                 SELECT id, tipo, texto, resultado, fallos_relacionados, timestamp
                 FROM memoria
+                {where}
                 ORDER BY id DESC
                 LIMIT ?
-            """, (limit,))
-            rows = cursor.fetchall()
+            """, (*params, limit))
+            rows = cur.fetchall()
 
         resultados = []
         for row in rows:
@@ -132,35 +363,56 @@ class MemoriaDB:
 
         return resultados
 
+    def buscar_memoria(self, consulta: str, limit: int = 5):
+        """Registros de memoria más relevantes para `consulta` según BM25."""
+        filas = self._buscar_fts(
+            "memoria",
+            "t.id, t.tipo, t.texto, t.resultado, t.fallos_relacionados, t.timestamp",
+            consulta, limit
+        )
+        if filas is None:
+            return self.listar_memoria(limit=limit)
+        for fila in filas:
+            try:
+                fila["fallos_relacionados"] = json.loads(fila["fallos_relacionados"] or "[]")
+            except Exception:
+                fila["fallos_relacionados"] = []
+        return filas
+
+    def eliminar_memoria(self, memoria_id: int):
+        with self._conexion() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM memoria WHERE id = ?", (memoria_id,))
+            cambios = cursor.rowcount
+            self._desindexar_fts(conn, "memoria", memoria_id)
+            conn.commit()
+
+        return cambios > 0
+
     # ============================================================
     # Casos jurídicos
     # ============================================================
     def guardar_caso(self, tipo: str, texto: str, normativa: str, jurisprudencia: str, resultado: str):
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO casos (tipo, texto, normativa, jurisprudencia, resultado, timestamp)
-                VALUES (?, ?, ?, ?, ?, datetime('now','localtime'))
-            """, (tipo, texto, normativa, jurisprudencia, resultado))
-            conn.commit()
+        self.guardar_lote(casos=[(tipo, texto, normativa, jurisprudencia, resultado)])
 
-    def listar_casos(self, limit: int = 10):
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            cursor.execute("""
+    def listar_casos(self, limit: int = 10, cursor: int = None, tipo: str = None,
+                     desde: str = None, hasta: str = None):
+        where, params = self._where(cursor, desde, hasta, tipo=tipo)
+        with self._conexion() as conn:
+            cur = conn.cursor()
+            cur.execute(f"""
                 SELECT id, tipo, texto, normativa, jurisprudencia, resultado, timestamp
                 FROM casos
+                {where}
                 ORDER BY id DESC
                 LIMIT ?
-            """, (limit,))
-            rows = cursor.fetchall()
+            """, (*params, limit))
+            rows = cur.fetchall()
 
         return [dict(row) for row in rows]
 
     def obtener_caso(self, caso_id: int):
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        with self._conexion() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 SELECT id, tipo, texto, normativa, jurisprudencia, resultado, timestamp
@@ -172,10 +424,20 @@ class MemoriaDB:
         return dict(row) if row else None
 
     def eliminar_caso(self, caso_id: int):
-        with sqlite3.connect(self.db_path) as conn:
+        with self._conexion() as conn:
             cursor = conn.cursor()
             cursor.execute("DELETE FROM casos WHERE id = ?", (caso_id,))
-            cambios = conn.total_changes
+            cambios = cursor.rowcount
+            self._desindexar_fts(conn, "casos", caso_id)
             conn.commit()
 
         return cambios > 0
+
+    def buscar_casos(self, consulta: str, limit: int = 5):
+        """Casos más relevantes para `consulta` según BM25."""
+        filas = self._buscar_fts(
+            "casos",
+            "t.id, t.tipo, t.texto, t.normativa, t.jurisprudencia, t.resultado, t.timestamp",
+            consulta, limit
+        )
+        return self.listar_casos(limit=limit) if filas is None else filas
@@ -1,105 +1,244 @@
-import requests
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import lru_cache
+
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin
 from loguru import logger
 
-from backend.config import FAISS_SERVER
+from backend.config import (
+    FAISS_SERVER, FAISS_MIN_SCORE, FAISS_MODO_BUSQUEDA, http_client,
+    cache_scraping, SCRAPING_TTL_INDICE, SCRAPING_TTL_FALLOS, SCRAPING_EN_CONSULTA,
+    SCRAPING_CONCURRENCIA, SCRAPING_DEADLINE, RERANK_MAX_FALLOS, reranker_fallos,
+)
+
+# lxml parsea bastante más rápido que html.parser; si no está instalado se usa el de stdlib
+try:
+    import lxml  # noqa: F401
+    PARSER = "lxml"
+except ImportError:
+    PARSER = "html.parser"
+
+# Pool compartido por todas las consultas: acota los pedidos simultáneos al portal
+_pool_fallos = ThreadPoolExecutor(max_workers=SCRAPING_CONCURRENCIA, thread_name_prefix="fallos")
+
+
+# El HTML llega desde la cache en disco: mientras no cambie, el parseo
+# tampoco se repite
+@lru_cache(maxsize=8)
+def _extraer_enlaces(html: str, base_url: str) -> tuple:
+    soup = BeautifulSoup(html, PARSER)
+    return tuple(
+        (link.get_text(strip=True), urljoin(base_url, link["href"]))
+        for link in soup.find_all("a", href=True)
+    )
+
+
+@lru_cache(maxsize=256)
+def _extraer_contenido(html: str) -> str:
+    contenido = BeautifulSoup(html, PARSER).get_text(" ", strip=True)
+    return contenido[:600] + "..." if contenido else ""
+
+
+MESES = {
+    "enero": 1, "febrero": 2, "marzo": 3, "abril": 4, "mayo": 5, "junio": 6, "julio": 7,
+    "agosto": 8, "septiembre": 9, "setiembre": 9, "octubre": 10, "noviembre": 11, "diciembre": 12,
+}
+RE_FECHA_NUMERICA = re.compile(r"\b(\d{1,2})[/.-](\d{1,2})[/.-](\d{4})\b")
+RE_FECHA_TEXTO = re.compile(
+    r"\b(\d{1,2}) de (" + "|".join(MESES) + r") (?:de|del) (\d{4})\b", re.IGNORECASE
+)
+RE_TRIBUNAL = re.compile(
+    r"\b(Tribunal Superior de Justicia|Corte Suprema de Justicia de la Naci[oó]n"
+    r"|C[aá]mara (?:Provincial |Nacional )?de Apelaciones[^.;:\n]{0,80}"
+    r"|Juzgado [^.;:\n]{3,80})"
+)
 
 
 class Jurisprudencia:
     """
     Módulo premium para búsqueda de fallos:
-    - Scraping del portal oficial
+    - Scraping del portal oficial (páginas servidas desde una cache HTTP en disco)
     - Búsqueda semántica en FAISS externo
     Devuelve SIEMPRE una estructura uniforme.
     """
 
     BASE_URL = "http://juriscivil.jusneuquen.gov.ar/"
 
-    def __init__(self, base_url: str = None):
+    def __init__(self, base_url: str = None, http=None, cache=None, reranker=None):
         self.base_url = base_url or self.BASE_URL
         self.headers = {"User-Agent": "Mozilla/5.0"}
+        self.http = http or http_client
+        self.cache = cache or cache_scraping
+        self.reranker = reranker or reranker_fallos
+
+    # ============================================================
+    # PÁGINAS Y METADATOS
+    # ============================================================
+    def obtener_pagina(self, url: str, ttl: float = None) -> str:
+        """HTML de una página del portal, pasando por la cache HTTP en disco."""
+        return self.cache.obtener(url, headers=self.headers, ttl=ttl)
+
+    def enlaces(self, html: str, base_url: str = None) -> list[tuple[str, str]]:
+        """(título, URL absoluta) de cada enlace de la página."""
+        return list(_extraer_enlaces(html, base_url or self.base_url))
+
+    @staticmethod
+    def texto_completo(html: str) -> tuple[str, str]:
+        """(título, texto) de una página de fallo, sin scripts, estilos ni navegación."""
+        soup = BeautifulSoup(html, PARSER)
+        for tag in soup(["script", "style", "nav", "header", "footer"]):
+            tag.decompose()
+        titulo = soup.title.get_text(strip=True) if soup.title else ""
+        return titulo, " ".join(soup.get_text(" ", strip=True).split())
+
+    @staticmethod
+    def extraer_metadatos(texto: str) -> dict:
+        """Tribunal y fecha (ISO, YYYY-MM-DD) mencionados primero en el texto del fallo."""
+        fecha = None
+        candidatas = []
+        m = RE_FECHA_NUMERICA.search(texto)
+        if m:
+            candidatas.append((m.start(), int(m.group(3)), int(m.group(2)), int(m.group(1))))
+        m = RE_FECHA_TEXTO.search(texto)
+        if m:
+            candidatas.append((m.start(), int(m.group(3)), MESES[m.group(2).lower()], int(m.group(1))))
+        for _, anio, mes, dia in sorted(candidatas):
+            if 1 <= mes <= 12 and 1 <= dia <= 31:
+                fecha = f"{anio:04d}-{mes:02d}-{dia:02d}"
+                break
+
+        m = RE_TRIBUNAL.search(texto)
+        tribunal = " ".join(m.group(1).split()) if m else None
+
+        return {"tribunal": tribunal, "fecha": fecha}
 
     # ============================================================
     # SCRAPING OFICIAL
     # ============================================================
-    def buscar_fallos_scraping(self, query: str, max_resultados=5) -> list[dict]:
-        """Busca fallos judiciales en el portal público por palabra clave."""
+    def obtener_fallo(self, titulo: str, href: str, timeout: float = None) -> dict:
+        """Descarga un fallo y arma su resultado; lanza si la página no se pudo obtener."""
+        # Los fallos publicados no cambian: TTL largo
+        kwargs = {"timeout": timeout} if timeout else {}
+        html = self.cache.obtener(href, headers=self.headers, ttl=SCRAPING_TTL_FALLOS, **kwargs)
+        contenido = _extraer_contenido(html)
+        metadatos = self.extraer_metadatos(contenido)
+        return {
+            "titulo": titulo,
+            "contenido": contenido,
+            "link": href,
+            "tribunal": metadatos["tribunal"],
+            "fecha": metadatos["fecha"],
+            "origen": "Portal oficial"
+        }
+
+    def buscar_fallos_scraping(self, query: str, max_resultados=5, deadline: float = None) -> list[dict]:
+        """
+        Busca fallos judiciales en el portal público por palabra clave.
+        Las páginas de los fallos se descargan en paralelo (pool global de
+        SCRAPING_CONCURRENCIA hilos) con un plazo total de `deadline` segundos;
+        al juntar `max_resultados` fallos descargados se cancelan los pendientes.
+        """
+        deadline = SCRAPING_DEADLINE if deadline is None else deadline
+        limite = time.monotonic() + deadline
 
         try:
-            response = requests.get(self.base_url, headers=self.headers, timeout=10)
-            response.raise_for_status()
+            indice = self.obtener_pagina(self.base_url, ttl=SCRAPING_TTL_INDICE)
         except Exception as e:
             logger.error(f"No se pudo conectar con {self.base_url}: {e}")
             return []
 
-        soup = BeautifulSoup(response.text, "html.parser")
-        resultados = []
+        # Candidatos en orden de aparición, sin títulos repetidos; se piden algunos
+        # de más para reemplazar a los que fallen
+        candidatos = []
         vistos = set()
+        for titulo, href in _extraer_enlaces(indice, self.base_url):
+            if query.lower() not in titulo.lower() or titulo in vistos:
+                continue
+            vistos.add(titulo)
+            candidatos.append((titulo, href))
+            if len(candidatos) >= max_resultados * 2:
+                break
 
-        for link in soup.find_all("a", href=True):
-            titulo = link.get_text(strip=True)
-            href = urljoin(self.base_url, link["href"])
+        if not candidatos:
+            return []
 
-            if query.lower() not in titulo.lower():
-                continue
+        def descargar(titulo, href):
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                raise TimeoutError("plazo de scraping vencido")
+            return self.obtener_fallo(titulo, href, timeout=restante)
 
-            if titulo in vistos:
-                continue
+        futuros = {
+            _pool_fallos.submit(descargar, titulo, href): i
+            for i, (titulo, href) in enumerate(candidatos)
+        }
+        buenos = {}
+        pendientes = set(futuros)
+        while pendientes and len(buenos) < max_resultados:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                break
+            listos, pendientes = wait(pendientes, timeout=restante, return_when=FIRST_COMPLETED)
+            for futuro in listos:
+                try:
+                    buenos[futuros[futuro]] = futuro.result()
+                except Exception as e:
+                    logger.warning(f"No se pudo extraer el fallo {candidatos[futuros[futuro]][1]}: {e}")
 
-            # Intentar extraer contenido del fallo
-            contenido = ""
-            try:
-                fallo_resp = requests.get(href, headers=self.headers, timeout=10)
-                fallo_resp.raise_for_status()
-                fallo_soup = BeautifulSoup(fallo_resp.text, "html.parser")
-                contenido = fallo_soup.get_text(" ", strip=True)
-                contenido = contenido[:600] + "..." if contenido else ""
-            except Exception:
-                contenido = "No se pudo extraer el contenido del fallo."
-
-            resultados.append({
+        for futuro in pendientes:
+            futuro.cancel()
+
+        # Si no alcanzan los descargados, se completan con los enlaces sin contenido
+        for i, (titulo, href) in enumerate(candidatos):
+            if len(buenos) >= max_resultados:
+                break
+            buenos.setdefault(i, {
                 "titulo": titulo,
-                "contenido": contenido,
+                "contenido": "No se pudo extraer el contenido del fallo.",
                 "link": href,
                 "tribunal": None,
                 "fecha": None,
                 "origen": "Portal oficial"
             })
 
-            vistos.add(titulo)
-
-            if len(resultados) >= max_resultados:
-                break
-
-        return resultados
+        return [buenos[i] for i in sorted(buenos)][:max_resultados]
 
     # ============================================================
     # FAISS EXTERNO
     # ============================================================
-    def buscar_fallos_semanticos(self, consulta: str, top_k=5) -> list[dict]:
-        """Busca fallos relevantes en FAISS externo."""
+    def buscar_fallos_semanticos(self, consulta: str, top_k=5, **filtros) -> list[dict]:
+        """
+        Busca fallos relevantes en FAISS externo.
+        `filtros` (tipo, tribunal, origen, fecha_desde, fecha_hasta) se aplican
+        en el servidor antes de rankear, ej. tipo="fallo", fecha_desde="2020-01-01".
+        """
+        params = {"texto": consulta, "k": top_k, "min_score": FAISS_MIN_SCORE,
+                  "modo": FAISS_MODO_BUSQUEDA}
+        params.update({k: v for k, v in filtros.items() if v})
         try:
-            resp = requests.get(
-                f"{FAISS_SERVER}/buscar",
-                params={"texto": consulta, "k": top_k},
-                timeout=10
-            )
+            resp = self.http.get(f"{FAISS_SERVER}/buscar", params=params)
             resp.raise_for_status()
             resultados = resp.json().get("resultados", [])
         except Exception as e:
             logger.error(f"Error al buscar en FAISS: {e}")
             return []
 
+        return self.a_fallos(resultados)
+
+    @staticmethod
+    def a_fallos(resultados: list[dict]) -> list[dict]:
+        """Convierte resultados crudos del servidor FAISS al formato uniforme de fallos."""
         fallos = []
         for r in resultados:
             fallos.append({
-                "titulo": r.get("texto", "Fallo sin título"),
+                "titulo": r.get("titulo") or r.get("texto", "Fallo sin título"),
                 "contenido": r.get("respuesta", "")[:600] + "...",
-                "link": None,
+                "link": r.get("link"),
                 "tribunal": r.get("tribunal"),
                 "fecha": r.get("fecha"),
-                "origen": "FAISS externo"
+                "origen": r.get("origen") or "FAISS externo"
             })
 
         return fallos
@@ -107,26 +246,59 @@ class Jurisprudencia:
     # ============================================================
     # MÉTODO MAESTRO
     # ============================================================
-    def buscar_fallos(self, consulta: str, top_k=5, incluir_scraping=True) -> list[dict]:
+    def buscar_fallos(self, consulta: str, top_k=5, incluir_scraping=SCRAPING_EN_CONSULTA,
+                      semanticos: list[dict] = None) -> list[dict]:
         """
         Combina:
         - Búsqueda semántica en FAISS externo
         - Scraping del portal oficial
         Devuelve una lista uniforme de fallos.
+        Si se pasan `semanticos` (resultados crudos de FAISS ya obtenidos),
+        se reutilizan en lugar de volver a consultar el servidor.
         """
 
         resultados = []
 
         # 1. FAISS externo
-        semanticos = self.buscar_fallos_semanticos(consulta, top_k)
-        resultados.extend(semanticos)
+        if semanticos is None:
+            resultados.extend(self.buscar_fallos_semanticos(consulta, top_k))
+        else:
+            resultados.extend(self.a_fallos(semanticos[:top_k]))
 
         # 2. Scraping oficial
+        scraping = []
         if incluir_scraping:
             scraping = self.buscar_fallos_scraping(consulta, top_k)
-            resultados.extend(scraping)
 
-        # 3. Ordenar por fecha si existe
-        resultados.sort(key=lambda x: x.get("fecha") or "", reverse=True)
+        # 3. Rerank de los candidatos de ambas fuentes
+        return self.priorizar(consulta, self.combinar_fallos(resultados, scraping))
 
-        return resultados or []
+    @staticmethod
+    def combinar_fallos(*listas: list[dict]) -> list[dict]:
+        """
+        Une listas de fallos de distintas fuentes intercalándolas (cada una ya
+        viene ordenada por relevancia) y descarta repetidos por link o título.
+        """
+        resultados, vistos = [], set()
+        for posicion in range(max((len(lista) for lista in listas), default=0)):
+            for lista in listas:
+                if posicion >= len(lista):
+                    continue
+                fallo = lista[posicion]
+                clave = fallo.get("link") or fallo.get("titulo")
+                if clave in vistos:
+                    continue
+                if clave:
+                    vistos.add(clave)
+                resultados.append(fallo)
+        return resultados
+
+    def priorizar(self, consulta: str, fallos: list[dict], max_resultados: int = RERANK_MAX_FALLOS) -> list[dict]:
+        """
+        Segunda etapa: con reranker configurado, reordena los candidatos con el
+        cross-encoder y se queda con los `max_resultados` mejores. Sin
+        reranker devuelve `fallos` tal cual.
+        """
+        if self.reranker is None:
+            return fallos
+        return self.reranker.reordenar(consulta, fallos, max_resultados=max_resultados)
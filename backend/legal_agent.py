@@ -1,14 +1,25 @@
+import asyncio
 import json
-import unicodedata
-import requests
+import time
 from openai import OpenAI
 
 # Configuración y módulos internos
-from backend.config import OPENAI_API_KEY, MODEL_NAME, FAISS_SERVER
+from backend.config import (
+    OPENAI_API_KEY, MODEL_NAME, FAISS_SERVER, FAISS_MIN_SCORE, FAISS_MODO_BUSQUEDA,
+    TIMEOUT_FAISS, TIMEOUT_SCRAPING, TIMEOUT_DB, TIMEOUT_LLM, SCRAPING_EN_CONSULTA,
+    CONTEXTO_MAX_TOKENS, CONTEXTO_MAX_TOKENS_ENTRADA,
+    http_client, metricas_llm,
+)
 from backend.juris_search import Jurisprudencia
-from backend.prompt import LABOR_LAWYER_PROMPT
-from backend.core.formatter import ResponseFormatter
+from backend.prompt import LABOR_LAWYER_PROMPT, CONTEXTO_PROMPT
+from backend.core.formatter import ResponseFormatter, FormateadorIncremental
 from backend.core.context_builder import ContextBuilder
+from backend.core.normalizador import Normalizador
+
+
+# Prefijo fijo de todos los pedidos al LLM: se arma una sola vez y no lleva
+# nada variable, para que la cache de prompts del proveedor lo reutilice
+MENSAJE_SISTEMA = {"role": "system", "content": LABOR_LAWYER_PROMPT.strip()}
 
 
 class LaborLawyerAgent:
@@ -25,8 +36,15 @@ class LaborLawyerAgent:
     - ResponseFormatter
     """
 
-    def __init__(self, db, llm_client=None):
+    def __init__(self, db, llm_client=None, http=None, escritura=None, cache=None, metricas=None):
         self.db = db
+        self.http = http or http_client
+        # Tokens por llamada al LLM, incluidos los servidos desde la cache de prompts
+        self.metricas = metricas or metricas_llm
+        # Cola write-behind; sin ella se persiste en línea
+        self.escritura = escritura
+        # Cache de respuestas (CacheRespuestas); sin ella siempre se consulta al LLM
+        self.cache = cache
 
         # ============================================
         # 🔥 CAMBIO CLAVE: usar DeepSeek SIEMPRE
@@ -36,49 +54,128 @@ class LaborLawyerAgent:
             base_url="https://api.deepseek.com/v1"
         )
 
-        self.buscador = Jurisprudencia()
-        self.context_builder = ContextBuilder()
+        self.buscador = Jurisprudencia(http=self.http)
+        self.context_builder = ContextBuilder(
+            presupuesto_tokens=CONTEXTO_MAX_TOKENS,
+            max_tokens_entrada=CONTEXTO_MAX_TOKENS_ENTRADA,
+        )
 
     # ============================================================
     # Utilidades
     # ============================================================
     def normalizar(self, texto: str) -> str:
-        texto = texto.lower()
-        return "".join(
-            c for c in unicodedata.normalize("NFD", texto)
-            if unicodedata.category(c) != "Mn"
-        )
+        return Normalizador.normalizar(texto)
 
     # ============================================================
     # FAISS
     # ============================================================
     def guardar_en_faiss(self, texto: str, respuesta: str):
         try:
-            requests.post(
+            self.http.post(
                 f"{FAISS_SERVER}/guardar",
-                json={"texto": texto, "respuesta": respuesta},
-                timeout=10
+                json={"texto": texto, "respuesta": respuesta, "tipo": "consulta"}
             )
+            # El corpus cambió: las respuestas cacheadas pueden quedar desactualizadas
+            if self.cache is not None:
+                self.cache.invalidar()
         except Exception as e:
             print(f"Error al guardar en FAISS: {e}")
 
     def buscar_en_faiss(self, texto: str, k: int = 5):
         try:
-            resp = requests.get(
+            resp = self.http.get(
                 f"{FAISS_SERVER}/buscar",
-                params={"texto": texto, "k": k},
-                timeout=10
+                params={"texto": texto, "k": k, "min_score": FAISS_MIN_SCORE,
+                        "modo": FAISS_MODO_BUSQUEDA}
             )
             return resp.json().get("resultados", [])
         except Exception as e:
             print(f"Error al buscar en FAISS: {e}")
             return []
 
+    def buscar_lote_en_faiss(self, textos: list[str], k: int = 5) -> list[list]:
+        """Resuelve varias consultas con una sola llamada a /buscar_lote."""
+        if not textos:
+            return []
+        try:
+            resp = self.http.post(
+                f"{FAISS_SERVER}/buscar_lote",
+                json={
+                    "consultas": [{"texto": t} for t in textos],
+                    "k": k,
+                    "min_score": FAISS_MIN_SCORE,
+                    "modo": FAISS_MODO_BUSQUEDA,
+                }
+            )
+            lote = resp.json().get("resultados", [])
+            return [r.get("resultados", []) for r in lote]
+        except Exception as e:
+            print(f"Error al buscar lote en FAISS: {e}")
+            return [[] for _ in textos]
+
+    # ============================================================
+    # Cache de respuestas
+    # ============================================================
+    def embeber_consulta(self, texto: str):
+        """Embedding de la consulta y versión del corpus, vía /embeddings del servidor FAISS."""
+        try:
+            resp = self.http.post(f"{FAISS_SERVER}/embeddings", json={"textos": [texto]})
+            return self._leer_embedding(resp.json())
+        except Exception as e:
+            print(f"Error obteniendo embedding de la consulta: {e}")
+            return None, None
+
+    async def aembeber_consulta(self, texto: str):
+        try:
+            resp = await self.http.apost(f"{FAISS_SERVER}/embeddings", json={"textos": [texto]})
+            return self._leer_embedding(resp.json())
+        except Exception as e:
+            print(f"Error obteniendo embedding de la consulta: {e}")
+            return None, None
+
+    @staticmethod
+    def _leer_embedding(datos: dict):
+        vectores = datos.get("vectores") or [None]
+        return vectores[0], datos.get("version_corpus")
+
+    def _buscar_en_cache(self, texto: str, vector, version):
+        """Respuesta cacheada para `texto` (marcada con el nivel de la cache) o None."""
+        self.cache.sincronizar(version)
+        respuesta, nivel = self.cache.obtener(texto, vector)
+        if respuesta is None:
+            return None
+        respuesta["consulta"] = texto
+        respuesta["cache"] = nivel
+        return respuesta
+
+    def _cachear(self, texto: str, respuesta: dict, vector):
+        # Un informe vacío (LLM caído o con timeout) no se cachea
+        if self.cache is not None and respuesta.get("informe"):
+            self.cache.guardar(texto, respuesta, vector)
+
+    def consultar_cache(self, texto: str):
+        """Devuelve (respuesta cacheada o None, embedding de la consulta)."""
+        if self.cache is None:
+            return None, None
+        vector, version = self.embeber_consulta(texto) if self.cache.semantica else (None, None)
+        return self._buscar_en_cache(texto, vector, version), vector
+
+    async def aconsultar_cache(self, texto: str):
+        if self.cache is None:
+            return None, None
+        vector, version = None, None
+        if self.cache.semantica:
+            vector, version = await self._etapa(
+                "embedding", self.aembeber_consulta(texto), TIMEOUT_FAISS, (None, None)
+            )
+        return self._buscar_en_cache(texto, vector, version), vector
+
     # ============================================================
     # Explicación doctrinal
     # ============================================================
-    def explicar_concepto(self, texto: str) -> dict:
-        antecedentes = self.buscar_en_faiss(texto)
+    def explicar_concepto(self, texto: str, antecedentes: list = None, fallos: list = None) -> dict:
+        if antecedentes is None:
+            antecedentes = self.buscar_en_faiss(texto)
         if antecedentes:
             return {
                 "explicacion": f"Se encontraron {len(antecedentes)} antecedentes similares en FAISS.",
@@ -86,7 +183,10 @@ class LaborLawyerAgent:
                 "antecedentes": antecedentes,
             }
 
-        fallos = self.buscador.buscar_fallos(consulta=texto, top_k=3)
+        if fallos is None:
+            fallos = self.buscador.buscar_fallos(consulta=texto, top_k=3)
+        else:
+            fallos = fallos[:3]
         if fallos:
             f0 = fallos[0]
             fuente = f"{f0.get('tribunal', 'Tribunal no especificado')} - {f0.get('fecha', 'Fecha no disponible')}"
@@ -114,66 +214,81 @@ class LaborLawyerAgent:
         return "Consulta general"
 
     # ============================================================
-    # Lógica principal
+    # Etapas compartidas por responder() y aresponder()
     # ============================================================
-    def responder(self, texto: str) -> dict:
-
-        clasificacion = self._clasificar(texto)
-        antecedentes_faiss = self.buscar_en_faiss(texto)
-        fallos_relacionados = self.buscador.buscar_fallos(consulta=texto, top_k=5)
-        doctrina = self.explicar_concepto(texto)
-
-        historial = self.db.listar_memoria(limit=5)
-        casos = self.db.listar_casos(limit=5)
-
+    def _construir_prompt(self, texto: str, historial: list, casos: list,
+                          fallos: list = None, antecedentes: list = None) -> tuple[str, dict]:
+        """
+        Parte variable del prompt (contexto recortado al presupuesto de tokens
+        y consulta), que va después del prefijo fijo MENSAJE_SISTEMA, y los
+        tokens por sección.
+        """
         contexto = self.context_builder.construir_contexto(
             historial=historial,
-            casos=casos
+            casos=casos,
+            consulta=texto,
+            fallos=fallos,
+            antecedentes=antecedentes,
         )
+        uso = contexto["estadisticas"]
 
-        prompt_final = LABOR_LAWYER_PROMPT.format(
+        prompt = CONTEXTO_PROMPT.format(
+            fallos=contexto["fallos"],
+            antecedentes=contexto["antecedentes"],
             historial=contexto["historial"],
-            casos=contexto["casos"]
-        ) + f"\n\n=== CONSULTA DEL USUARIO ===\n{texto}\n"
+            casos=contexto["casos"],
+            consulta=texto,
+        )
+        return prompt, uso
 
-        # ============================================================
-        # 🔥 LLM (DeepSeek)
-        # ============================================================
+    def _mensajes(self, prompt_final: str) -> list:
+        return [MENSAJE_SISTEMA, {"role": "user", "content": prompt_final}]
+
+    def _generar_informe(self, prompt_final: str) -> str:
         informe = None
         try:
+            inicio = time.perf_counter()
             resp = self.llm_client.chat.completions.create(
                 model=MODEL_NAME,
-                messages=[
-                    {"role": "system", "content": prompt_final},
-                    {"role": "user", "content": texto},
-                ],
+                messages=self._mensajes(prompt_final),
                 temperature=0.2,
                 max_tokens=1500
             )
+            self.metricas.registrar(getattr(resp, "usage", None), time.perf_counter() - inicio)
             informe = resp.choices[0].message.content
         except Exception as e:
             print(f"Error al generar informe narrativo: {e}")
 
-        informe = ResponseFormatter.formatear_respuesta(informe or "")
+        return ResponseFormatter.formatear_respuesta(informe or "")
 
-        # Guardar memoria
-        self.db.guardar_memoria(
-            tipo=clasificacion,
-            texto=texto,
-            resultado=informe,
-            fallos_relacionados=fallos_relacionados
-        )
+    def _persistir(self, clasificacion: str, texto: str, informe: str, fallos_relacionados: list):
+        # Los fallos se serializan una sola vez para memoria y caso
+        fallos_json = json.dumps(fallos_relacionados, ensure_ascii=False)
+
+        memorias = [(clasificacion, texto, informe, fallos_json)]
+        casos = []
 
         # Guardar caso si corresponde
         if clasificacion in ["Revisión de contrato", "Conflicto laboral"]:
-            self.db.guardar_caso(
-                tipo=clasificacion,
-                texto=texto,
-                normativa="Normativa aplicable pendiente de extracción.",
-                jurisprudencia=json.dumps(fallos_relacionados, ensure_ascii=False),
-                resultado=informe
-            )
+            casos.append((
+                clasificacion,
+                texto,
+                "Normativa aplicable pendiente de extracción.",
+                fallos_json,
+                informe
+            ))
+
+        if self.escritura is None:
+            self.db.guardar_lote(memorias=memorias, casos=casos)
+            return
 
+        for fila in memorias:
+            self.escritura.encolar_memoria(*fila)
+        for fila in casos:
+            self.escritura.encolar_caso(*fila)
+
+    def _armar_respuesta(self, texto, clasificacion, doctrina, fallos_relacionados,
+                         antecedentes_faiss, informe, uso_contexto: dict = None) -> dict:
         return {
             "consulta": texto,
             "clasificacion": clasificacion,
@@ -182,8 +297,250 @@ class LaborLawyerAgent:
             "fallos_relacionados": fallos_relacionados,
             "antecedentes_faiss": antecedentes_faiss,
             "informe": informe,
+            "uso_contexto": uso_contexto,
             "conclusion": (
                 "Este informe es una aproximación automatizada basada únicamente en el contexto disponible. "
                 "No reemplaza la revisión jurídica especializada."
             )
         }
+
+    # ============================================================
+    # Lógica principal
+    # ============================================================
+    def responder(self, texto: str) -> dict:
+
+        cacheada, vector = self.consultar_cache(texto)
+        if cacheada is not None:
+            return cacheada
+
+        clasificacion = self._clasificar(texto)
+
+        # Una sola búsqueda en FAISS, reutilizada por jurisprudencia y doctrina
+        antecedentes_faiss = self.buscar_en_faiss(texto)
+        fallos_relacionados = self.buscador.buscar_fallos(
+            consulta=texto, top_k=5, semanticos=antecedentes_faiss
+        )
+        doctrina = self.explicar_concepto(
+            texto, antecedentes=antecedentes_faiss, fallos=fallos_relacionados
+        )
+
+        historial = self.db.listar_memoria(limit=5)
+        casos = self.db.buscar_casos(texto, limit=5)
+
+        prompt_final, uso_contexto = self._construir_prompt(
+            texto, historial, casos, fallos=fallos_relacionados, antecedentes=antecedentes_faiss
+        )
+
+        # ============================================================
+        # 🔥 LLM (DeepSeek)
+        # ============================================================
+        informe = self._generar_informe(prompt_final)
+
+        self._persistir(clasificacion, texto, informe, fallos_relacionados)
+
+        respuesta = self._armar_respuesta(
+            texto, clasificacion, doctrina, fallos_relacionados, antecedentes_faiss, informe,
+            uso_contexto=uso_contexto,
+        )
+        self._cachear(texto, respuesta, vector)
+        return respuesta
+
+    # ============================================================
+    # Lógica principal (asyncio)
+    # ============================================================
+    async def _etapa(self, nombre: str, coro, timeout: float, defecto):
+        """Ejecuta una etapa con timeout propio; si falla o vence, devuelve `defecto`."""
+        try:
+            return await asyncio.wait_for(coro, timeout=timeout)
+        except asyncio.TimeoutError:
+            print(f"Timeout en etapa '{nombre}' ({timeout}s), se continúa sin ella.")
+        except Exception as e:
+            print(f"Error en etapa '{nombre}': {e}")
+        return defecto
+
+    async def abuscar_en_faiss(self, texto: str, k: int = 5):
+        resp = await self.http.aget(
+            f"{FAISS_SERVER}/buscar",
+            params={"texto": texto, "k": k, "min_score": FAISS_MIN_SCORE,
+                    "modo": FAISS_MODO_BUSQUEDA},
+        )
+        return resp.json().get("resultados", [])
+
+    async def _arecuperar(self, texto: str) -> dict:
+        """
+        Etapas de recuperación independientes (FAISS, scraping, memoria y
+        casos) en paralelo, cada una con su timeout.
+        """
+        antecedentes_faiss, scraping, historial, casos = await asyncio.gather(
+            self._etapa(
+                "faiss", self.abuscar_en_faiss(texto), TIMEOUT_FAISS, []
+            ),
+            self._etapa(
+                "scraping",
+                asyncio.to_thread(self.buscador.buscar_fallos_scraping, texto, 5),
+                TIMEOUT_SCRAPING, []
+            ) if SCRAPING_EN_CONSULTA else asyncio.sleep(0, []),
+            self._etapa(
+                "memoria",
+                asyncio.to_thread(self.db.listar_memoria, limit=5),
+                TIMEOUT_DB, []
+            ),
+            self._etapa(
+                "casos",
+                asyncio.to_thread(self.db.buscar_casos, texto, limit=5),
+                TIMEOUT_DB, []
+            ),
+        )
+
+        fallos_relacionados = await asyncio.to_thread(
+            self.buscador.priorizar,
+            texto,
+            self.buscador.combinar_fallos(self.buscador.a_fallos(antecedentes_faiss[:5]), scraping),
+        )
+        doctrina = self.explicar_concepto(
+            texto, antecedentes=antecedentes_faiss, fallos=fallos_relacionados
+        )
+
+        return {
+            "antecedentes_faiss": antecedentes_faiss,
+            "fallos_relacionados": fallos_relacionados,
+            "doctrina": doctrina,
+            "historial": historial,
+            "casos": casos,
+        }
+
+    async def aresponder(self, texto: str) -> dict:
+        """
+        Variante asíncrona de responder().
+        La recuperación corre en paralelo (ver _arecuperar); el LLM y la
+        persistencia corren en el threadpool para no bloquear el event loop.
+        """
+        cacheada, vector = await self.aconsultar_cache(texto)
+        if cacheada is not None:
+            return cacheada
+
+        clasificacion = self._clasificar(texto)
+        rec = await self._arecuperar(texto)
+
+        prompt_final, uso_contexto = self._construir_prompt(
+            texto, rec["historial"], rec["casos"],
+            fallos=rec["fallos_relacionados"], antecedentes=rec["antecedentes_faiss"],
+        )
+
+        informe = await self._etapa(
+            "llm",
+            asyncio.to_thread(self._generar_informe, prompt_final),
+            TIMEOUT_LLM, ""
+        )
+
+        await asyncio.to_thread(
+            self._persistir, clasificacion, texto, informe, rec["fallos_relacionados"]
+        )
+
+        respuesta = self._armar_respuesta(
+            texto, clasificacion, rec["doctrina"], rec["fallos_relacionados"],
+            rec["antecedentes_faiss"], informe, uso_contexto=uso_contexto,
+        )
+        self._cachear(texto, respuesta, vector)
+        return respuesta
+
+    # ============================================================
+    # Streaming (SSE)
+    # ============================================================
+    def _producir_tokens(self, prompt_final: str, emitir):
+        """Itera el stream del LLM en un hilo y entrega cada fragmento con `emitir`."""
+        try:
+            inicio = time.perf_counter()
+            stream = self.llm_client.chat.completions.create(
+                model=MODEL_NAME,
+                messages=self._mensajes(prompt_final),
+                temperature=0.2,
+                max_tokens=1500,
+                stream=True,
+                # El último chunk trae el usage (tokens y hits de cache)
+                stream_options={"include_usage": True},
+            )
+            usage = None
+            for chunk in stream:
+                if getattr(chunk, "usage", None) is not None:
+                    usage = chunk.usage
+                if chunk.choices and chunk.choices[0].delta.content:
+                    emitir(chunk.choices[0].delta.content)
+            self.metricas.registrar(usage, time.perf_counter() - inicio)
+        except Exception as e:
+            print(f"Error en streaming del informe: {e}")
+        finally:
+            emitir(None)
+
+    async def astream(self, texto: str):
+        """
+        Generador asíncrono de eventos (nombre, datos) para SSE:
+        - "contexto": fallos y antecedentes recuperados, antes del LLM
+        - "token": fragmentos del informe ya formateados
+        - "fin": respuesta completa, emitida luego de persistir memoria y caso
+        Con un hit de cache el informe llega en un único evento "token".
+        """
+        cacheada, vector = await self.aconsultar_cache(texto)
+        if cacheada is not None:
+            yield "contexto", {
+                clave: cacheada[clave] for clave in (
+                    "consulta", "clasificacion", "explicacion_doctrinal",
+                    "fuente_doctrina", "fallos_relacionados", "antecedentes_faiss",
+                )
+            }
+            yield "token", {"texto": cacheada["informe"]}
+            yield "fin", cacheada
+            return
+
+        clasificacion = self._clasificar(texto)
+        rec = await self._arecuperar(texto)
+
+        yield "contexto", {
+            "consulta": texto,
+            "clasificacion": clasificacion,
+            "explicacion_doctrinal": rec["doctrina"]["explicacion"],
+            "fuente_doctrina": rec["doctrina"]["fuente"],
+            "fallos_relacionados": rec["fallos_relacionados"],
+            "antecedentes_faiss": rec["antecedentes_faiss"],
+        }
+
+        prompt_final, uso_contexto = self._construir_prompt(
+            texto, rec["historial"], rec["casos"],
+            fallos=rec["fallos_relacionados"], antecedentes=rec["antecedentes_faiss"],
+        )
+
+        loop = asyncio.get_running_loop()
+        cola = asyncio.Queue()
+        loop.run_in_executor(
+            None, self._producir_tokens, prompt_final,
+            lambda t: loop.call_soon_threadsafe(cola.put_nowait, t)
+        )
+
+        formateador = FormateadorIncremental()
+        while True:
+            try:
+                fragmento = await asyncio.wait_for(cola.get(), timeout=TIMEOUT_LLM)
+            except asyncio.TimeoutError:
+                print(f"Timeout esperando al LLM ({TIMEOUT_LLM}s), se corta el stream.")
+                break
+            if fragmento is None:
+                break
+            salida = formateador.agregar(fragmento)
+            if salida:
+                yield "token", {"texto": salida}
+
+        salida = formateador.cerrar()
+        if salida:
+            yield "token", {"texto": salida}
+
+        informe = ResponseFormatter.formatear_respuesta(formateador.texto)
+        await asyncio.to_thread(
+            self._persistir, clasificacion, texto, informe, rec["fallos_relacionados"]
+        )
+
+        respuesta = self._armar_respuesta(
+            texto, clasificacion, rec["doctrina"], rec["fallos_relacionados"],
+            rec["antecedentes_faiss"], informe, uso_contexto=uso_contexto,
+        )
+        self._cachear(texto, respuesta, vector)
+        yield "fin", respuesta
@@ -1,5 +1,6 @@
 # backend/main.py
 
+import asyncio
 import os
 import logging
 from fastapi import FastAPI
@@ -7,7 +8,7 @@ from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 
 # Configuración centralizada
-from backend.config import db, llm_client, FAISS_SERVER
+from backend.config import db, llm_client, http_client, cola_escritura, cache_respuestas, FAISS_SERVER
 
 # Agente jurídico
 from backend.legal_agent import LaborLawyerAgent
@@ -52,12 +53,21 @@ app.add_middleware(
 # Inicializar el agente
 # ============================================================
 try:
-    app.state.agent = LaborLawyerAgent(db=db, llm_client=llm_client)
+    app.state.agent = LaborLawyerAgent(
+        db=db, llm_client=llm_client, escritura=cola_escritura, cache=cache_respuestas
+    )
     logger.info("LaborLawyerAgent inicializado correctamente.")
 except Exception as e:
     logger.exception("Error al inicializar LaborLawyerAgent.")
 
 
+@app.on_event("shutdown")
+async def cerrar_conexiones():
+    await http_client.acerrar()
+    # Escribe lo que quede en la cola write-behind antes de salir
+    await asyncio.to_thread(cola_escritura.cerrar)
+
+
 # ============================================================
 # Registrar routers
 # ============================================================
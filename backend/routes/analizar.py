@@ -2,6 +2,7 @@
 
 from fastapi import APIRouter, Request, UploadFile, File, HTTPException, Query
 from pydantic import BaseModel
+import asyncio
 import io
 import logging
 from PyPDF2 import PdfReader
@@ -92,7 +93,7 @@ async def analizar_documento(
                 raise HTTPException(status_code=400, detail="El archivo debe ser un PDF válido.")
 
             file_bytes = await file.read()
-            contenido = extraer_texto_pdf(file_bytes)
+            contenido = await asyncio.to_thread(extraer_texto_pdf, file_bytes)
 
             if not contenido:
                 raise HTTPException(
@@ -109,7 +110,7 @@ async def analizar_documento(
             raise HTTPException(status_code=400, detail="No se recibió texto válido para analizar.")
 
         # Delegar al agente jurídico (método correcto)
-        resultado = agente.responder(contenido)
+        resultado = await agente.aresponder(contenido)
 
         # Construcción del informe narrativo
         informe = f"""
@@ -166,7 +167,7 @@ async def consultar_documento(request: Request, pregunta: str = Query(..., min_l
         if not contenido:
             raise HTTPException(status_code=400, detail="La pregunta no puede estar vacía.")
 
-        resultado = agente.responder(contenido)
+        resultado = await agente.aresponder(contenido)
 
         informe = f"""
 ⚖️ Informe Jurídico Automatizado
@@ -1,6 +1,6 @@
 # routes/casos.py
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 from backend.config import db  # Import corregido
 
 router = APIRouter(tags=["Casos"])
@@ -10,19 +10,50 @@ router = APIRouter(tags=["Casos"])
 # Listar casos guardados
 # ---------------------------
 @router.get("/casos")
-async def listar_casos(limit: int = 10):
+def listar_casos(
+    limit: int = Query(10, ge=1, le=200),
+    cursor: int | None = Query(None, description="next_cursor de la página anterior"),
+    tipo: str | None = None,
+    desde: str | None = Query(None, description="Fecha/hora mínima (YYYY-MM-DD o ISO)"),
+    hasta: str | None = Query(None, description="Fecha/hora máxima (YYYY-MM-DD o ISO)"),
+):
     """
-    Devuelve los últimos casos guardados por el agente.
+    Devuelve los casos guardados por el agente, del más reciente al más antiguo.
+    Paginación por cursor: pasar `next_cursor` como `cursor` para la página siguiente.
     """
     try:
-        casos = db.listar_casos(limit=limit)
-        return {"status": "ok", "casos": casos}
+        casos = db.listar_casos(limit=limit, cursor=cursor, tipo=tipo, desde=desde, hasta=hasta)
+        return {
+            "status": "ok",
+            "casos": casos,
+            "next_cursor": db.siguiente_cursor(casos, limit)
+        }
 
     except Exception as e:
         print(f"Error en /casos: {e}")
         raise HTTPException(status_code=500, detail="Error interno del servidor.")
 
 
+# ---------------------------
+# Buscar casos por texto (FTS5 + BM25)
+# ---------------------------
+@router.get("/casos/buscar")
+def buscar_casos(
+    q: str = Query(..., min_length=1, description="Texto a buscar"),
+    limit: int = Query(10, ge=1, le=100),
+):
+    """
+    Devuelve los casos más relevantes para `q`, ordenados por BM25.
+    Ignora tildes, mayúsculas y variaciones de género/número ("despidos" ~ "despido").
+    """
+    try:
+        return {"status": "ok", "casos": db.buscar_casos(q, limit=limit)}
+
+    except Exception as e:
+        print(f"Error en /casos/buscar: {e}")
+        raise HTTPException(status_code=500, detail="Error interno del servidor.")
+
+
 # ---------------------------
 # Obtener un caso por ID
 # ---------------------------
@@ -1,10 +1,13 @@
 # routes/chat.py
 
+import json
+
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
 from backend.legal_agent import LaborLawyerAgent
-from backend.config import llm_client, db
+from backend.config import llm_client, db, cola_escritura, cache_respuestas
 
 router = APIRouter()
 
@@ -19,7 +22,9 @@ class ChatRequest(BaseModel):
 # ---------------------------
 # Instancia del agente
 # ---------------------------
-agente = LaborLawyerAgent(db=db, llm_client=llm_client)
+agente = LaborLawyerAgent(
+    db=db, llm_client=llm_client, escritura=cola_escritura, cache=cache_respuestas
+)
 
 
 # ---------------------------
@@ -38,7 +43,7 @@ async def chat_endpoint(data: ChatRequest):
         raise HTTPException(status_code=400, detail="El mensaje no puede estar vacío.")
 
     try:
-        respuesta = agente.responder(texto)
+        respuesta = await agente.aresponder(texto)
         return {
             "status": "ok",
             "respuesta": respuesta
@@ -47,3 +52,39 @@ async def chat_endpoint(data: ChatRequest):
     except Exception as e:
         print(f"Error en /chat: {e}")
         raise HTTPException(status_code=500, detail="Error interno del servidor.")
+
+
+# ---------------------------
+# Chat con streaming (Server-Sent Events)
+# ---------------------------
+def _evento_sse(nombre: str, datos: dict) -> str:
+    return f"event: {nombre}\ndata: {json.dumps(datos, ensure_ascii=False)}\n\n"
+
+
+@router.post("/chat/stream")
+async def chat_stream_endpoint(data: ChatRequest):
+    """
+    Igual que /chat, pero responde por SSE:
+    primero los fallos/antecedentes recuperados (evento "contexto"),
+    luego el informe a medida que lo genera el LLM (eventos "token")
+    y por último la respuesta completa (evento "fin").
+    """
+
+    texto = data.mensaje.strip()
+
+    if not texto:
+        raise HTTPException(status_code=400, detail="El mensaje no puede estar vacío.")
+
+    async def eventos():
+        try:
+            async for nombre, datos in agente.astream(texto):
+                yield _evento_sse(nombre, datos)
+        except Exception as e:
+            print(f"Error en /chat/stream: {e}")
+            yield _evento_sse("error", {"detail": "Error interno del servidor."})
+
+    return StreamingResponse(
+        eventos(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -2,16 +2,18 @@
 
 from fastapi import APIRouter, Query
 from backend.legal_agent import LaborLawyerAgent
-from backend.config import db, llm_client
+from backend.config import db, llm_client, cola_escritura, cache_respuestas
 
 router = APIRouter()
 
 # Inicializamos el agente
-agent = LaborLawyerAgent(db=db, llm_client=llm_client)
+agent = LaborLawyerAgent(
+    db=db, llm_client=llm_client, escritura=cola_escritura, cache=cache_respuestas
+)
 
 
 @router.get("/consultar_documento")
-def consultar_documento(
+async def consultar_documento(
     pregunta: str = Query(..., description="Consulta laboral a analizar"),
     k: int = Query(3, description="Cantidad de antecedentes a recuperar")
 ):
@@ -24,8 +26,8 @@ def consultar_documento(
     try:
         historial = []
 
-        # El método correcto es responder()
-        resultado = agent.responder(pregunta)
+        # Variante asíncrona: no bloquea el event loop
+        resultado = await agent.aresponder(pregunta)
 
         return {
             "informe": resultado.get("informe"),
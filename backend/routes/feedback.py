@@ -1,6 +1,6 @@
 # routes/feedback.py
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
 from backend.config import db  # Import corregido
 
@@ -55,18 +55,28 @@ async def guardar_feedback(data: FeedbackInput):
 # Listar feedback
 # ---------------------------
 @router.get("/feedback")
-async def listar_feedback(limit: int = 20):
+def listar_feedback(
+    limit: int = Query(20, ge=1, le=200),
+    cursor: int | None = Query(None, description="next_cursor de la página anterior"),
+    calificacion: int | None = Query(None, ge=1, le=5),
+    desde: str | None = Query(None, description="Fecha/hora mínima (YYYY-MM-DD o ISO)"),
+    hasta: str | None = Query(None, description="Fecha/hora máxima (YYYY-MM-DD o ISO)"),
+):
     """
-    Devuelve los últimos registros de feedback.
+    Devuelve los registros de feedback, del más reciente al más antiguo.
+    Paginación por cursor: pasar `next_cursor` como `cursor` para la página siguiente.
     """
 
     try:
-        registros = db.listar_feedback(limit=limit)
+        registros = db.listar_feedback(
+            limit=limit, cursor=cursor, calificacion=calificacion, desde=desde, hasta=hasta
+        )
 
         return {
             "status": "ok",
             "cantidad": len(registros),
-            "feedback": registros
+            "feedback": registros,
+            "next_cursor": db.siguiente_cursor(registros, limit)
         }
 
     except Exception as e:
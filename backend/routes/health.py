@@ -1,6 +1,9 @@
 # routes/health.py
 
 from fastapi import APIRouter
+from backend.config import (
+    http_client, cola_escritura, cache_respuestas, cache_scraping, reranker_fallos, metricas_llm,
+)
 
 router = APIRouter(tags=["Health"])
 
@@ -20,5 +23,11 @@ async def health_check():
     """
     return {
         "status": "ok",
-        "detalle": "La API está operativa y lista para recibir solicitudes."
+        "detalle": "La API está operativa y lista para recibir solicitudes.",
+        "upstreams": http_client.metricas(),
+        "cola_escritura": cola_escritura.estadisticas(),
+        "cache_respuestas": cache_respuestas.estadisticas(),
+        "cache_scraping": cache_scraping.estadisticas(),
+        "reranker": reranker_fallos.estadisticas() if reranker_fallos else None,
+        "llm": metricas_llm.estadisticas(),
     }
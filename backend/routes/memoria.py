@@ -1,6 +1,6 @@
 # routes/memoria.py
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 from backend.config import db  # Import corregido
 
 router = APIRouter(tags=["Memoria"])
@@ -10,19 +10,49 @@ router = APIRouter(tags=["Memoria"])
 # Listar memoria
 # ---------------------------
 @router.get("/memoria")
-async def listar_memoria(limit: int = 20):
+def listar_memoria(
+    limit: int = Query(20, ge=1, le=200),
+    cursor: int | None = Query(None, description="next_cursor de la página anterior"),
+    tipo: str | None = None,
+    desde: str | None = Query(None, description="Fecha/hora mínima (YYYY-MM-DD o ISO)"),
+    hasta: str | None = Query(None, description="Fecha/hora máxima (YYYY-MM-DD o ISO)"),
+):
     """
-    Devuelve los últimos registros de memoria del agente.
+    Devuelve los registros de memoria del agente, del más reciente al más antiguo.
+    Paginación por cursor: pasar `next_cursor` como `cursor` para la página siguiente.
     """
     try:
-        memoria = db.listar_memoria(limit=limit)
-        return {"status": "ok", "memoria": memoria}
+        memoria = db.listar_memoria(limit=limit, cursor=cursor, tipo=tipo, desde=desde, hasta=hasta)
+        return {
+            "status": "ok",
+            "memoria": memoria,
+            "next_cursor": db.siguiente_cursor(memoria, limit)
+        }
 
     except Exception as e:
         print(f"Error en /memoria: {e}")
         raise HTTPException(status_code=500, detail="Error interno del servidor.")
 
 
+# ---------------------------
+# Buscar en memoria por texto (FTS5 + BM25)
+# ---------------------------
+@router.get("/memoria/buscar")
+def buscar_memoria(
+    q: str = Query(..., min_length=1, description="Texto a buscar"),
+    limit: int = Query(10, ge=1, le=100),
+):
+    """
+    Devuelve los registros de memoria más relevantes para `q`, ordenados por BM25.
+    """
+    try:
+        return {"status": "ok", "memoria": db.buscar_memoria(q, limit=limit)}
+
+    except Exception as e:
+        print(f"Error en /memoria/buscar: {e}")
+        raise HTTPException(status_code=500, detail="Error interno del servidor.")
+
+
 # ---------------------------
 # Eliminar memoria
 # ---------------------------
@@ -33,7 +63,6 @@ async def eliminar_memoria(memoria_id: int):
     """
 
     try:
-        # ⚠️ ESTE MÉTODO NO EXISTE EN MemoriaDB
         eliminado = db.eliminar_memoria(memoria_id)
 
         if not eliminado:
@@ -0,0 +1,213 @@
+# scripts/almacen_documentos.py
+
+import json
+import mmap
+import os
+import threading
+from array import array
+
+
+class AlmacenDocumentos:
+    """
+    Almacén de documentos en disco para el servidor FAISS.
+    - Blob de texto: el log JSON Lines append-only (una línea por documento)
+    - Archivo de offsets: uint64 con el fin de cada línea en el blob
+    El blob se lee con mmap de solo lectura: la memoria residente la maneja
+    el page cache del sistema y se comparte entre procesos que sirven el
+    mismo directorio. Al arrancar solo se leen los offsets, sin parsear JSON.
+    Se comporta como una lista de dicts de solo lectura + `agregar`.
+    """
+
+    def __init__(self, log_path: str, offsets_path: str):
+        self.log_path = log_path
+        self.offsets_path = offsets_path
+
+        self._fines = array("Q")
+        self._lock = threading.Lock()
+        self._mm = None
+        self._log_fh = None
+        self._offsets_fh = None
+
+    # ============================================================
+    # Apertura y recuperación
+    # ============================================================
+    def abrir(self, solo_lectura: bool = False):
+        """
+        Carga los offsets y mapea el blob. Con `solo_lectura` no se toca
+        ningún archivo (otro proceso, como el servidor, puede estar
+        escribiéndolos): las reparaciones se hacen solo en memoria.
+        """
+        if not os.path.exists(self.log_path):
+            if solo_lectura:
+                return
+            open(self.log_path, "ab").close()
+
+        tam_log = os.path.getsize(self.log_path)
+        fines = self._leer_offsets(reparar=not solo_lectura)
+
+        # Offsets ausentes o que apuntan más allá del blob: reconstruir escaneando
+        if fines is None or (len(fines) and fines[-1] > tam_log):
+            if tam_log:
+                print("🔁 Reconstruyendo offsets del almacén de documentos.")
+            fines = self._escanear_log()
+            if not solo_lectura:
+                self._escribir_offsets(fines)
+
+        self._fines = fines
+        if solo_lectura:
+            self._remapear()
+            return
+
+        fin_valido = fines[-1] if len(fines) else 0
+
+        # Cola sin offset (línea parcial o no confirmada): se descarta
+        if fin_valido < tam_log:
+            print("⚠ Se descarta una cola no confirmada del log de documentos.")
+            with open(self.log_path, "r+b") as f:
+                f.truncate(fin_valido)
+
+        self._log_fh = open(self.log_path, "ab")
+        self._offsets_fh = open(self.offsets_path, "ab")
+        self._remapear()
+
+    def _leer_offsets(self, reparar: bool = True):
+        if not os.path.exists(self.offsets_path):
+            return None
+
+        fines = array("Q")
+        with open(self.offsets_path, "rb") as f:
+            datos = f.read()
+        completos = len(datos) - len(datos) % fines.itemsize
+        fines.frombytes(datos[:completos])
+
+        if completos < len(datos) and reparar:
+            self._escribir_offsets(fines)
+
+        return fines
+
+    def _escanear_log(self) -> array:
+        fines = array("Q")
+        posicion = 0
+        with open(self.log_path, "rb") as f:
+            for linea in f:
+                if not linea.endswith(b"\n"):
+                    break  # línea parcial por caída
+                posicion += len(linea)
+                fines.append(posicion)
+        return fines
+
+    def _escribir_offsets(self, fines: array):
+        tmp = self.offsets_path + ".tmp"
+        with open(tmp, "wb") as f:
+            fines.tofile(f)
+        os.replace(tmp, self.offsets_path)
+
+    def _remapear(self):
+        # El mapa anterior no se cierra: lecturas concurrentes pueden estar
+        # usándolo y se libera solo cuando deja de estar referenciado
+        self._mm = None
+        if os.path.getsize(self.log_path) > 0:
+            with open(self.log_path, "rb") as f:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    # ============================================================
+    # Lectura
+    # ============================================================
+    def __len__(self):
+        return len(self._fines)
+
+    def __getitem__(self, idx: int) -> dict:
+        if idx < 0:
+            idx += len(self._fines)
+        if idx < 0 or idx >= len(self._fines):
+            raise IndexError(idx)
+
+        inicio = self._fines[idx - 1] if idx > 0 else 0
+        fin = self._fines[idx]
+
+        mm = self._mm
+        if mm is None or fin > len(mm):
+            with self._lock:
+                if self._mm is None or fin > len(self._mm):
+                    self._remapear()
+                mm = self._mm
+
+        return json.loads(mm[inicio:fin])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    # ============================================================
+    # Escritura
+    # ============================================================
+    def agregar(self, documentos: list, fsync: bool = False):
+        """Agrega documentos al final del blob y confirma sus offsets."""
+        with self._lock:
+            posicion = self._fines[-1] if len(self._fines) else 0
+            nuevos = array("Q")
+            lineas = []
+            for doc in documentos:
+                linea = (json.dumps(doc, ensure_ascii=False) + "\n").encode("utf-8")
+                posicion += len(linea)
+                nuevos.append(posicion)
+                lineas.append(linea)
+
+            fin_previo = self._fines[-1] if len(self._fines) else 0
+            try:
+                self._log_fh.write(b"".join(lineas))
+                self._log_fh.flush()
+                if fsync:
+                    os.fsync(self._log_fh.fileno())
+
+                # El offset se escribe después del texto: es la confirmación del documento
+                self._offsets_fh.write(nuevos.tobytes())
+                self._offsets_fh.flush()
+                if fsync:
+                    os.fsync(self._offsets_fh.fileno())
+            except Exception:
+                # Escritura a medias: se vuelve al último documento confirmado
+                self._revertir(fin_previo)
+                raise
+
+            self._fines.extend(nuevos)
+
+    def _revertir(self, fin: int):
+        for fh in (self._log_fh, self._offsets_fh):
+            try:
+                fh.close()
+            except Exception:
+                pass
+        os.truncate(self.log_path, fin)
+        os.truncate(self.offsets_path, len(self._fines) * self._fines.itemsize)
+        self._log_fh = open(self.log_path, "ab")
+        self._offsets_fh = open(self.offsets_path, "ab")
+
+    def truncar(self, total: int):
+        """Deja solo los primeros `total` documentos."""
+        with self._lock:
+            if total >= len(self._fines):
+                return
+
+            del self._fines[total:]
+            fin = self._fines[-1] if len(self._fines) else 0
+
+            self.cerrar()
+            self._escribir_offsets(self._fines)
+            with open(self.log_path, "r+b") as f:
+                f.truncate(fin)
+
+            self._log_fh = open(self.log_path, "ab")
+            self._offsets_fh = open(self.offsets_path, "ab")
+            self._remapear()
+
+    def cerrar(self):
+        for fh in (self._log_fh, self._offsets_fh):
+            if fh is not None:
+                fh.close()
+        self._log_fh = None
+        self._offsets_fh = None
+
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
@@ -0,0 +1,235 @@
+# scripts/bm25.py
+
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter
+
+import numpy as np
+
+from scripts.registro_ids import ArregloCreciente
+
+# Números con separadores de miles o incisos ("20.744", "245 bis") se indexan
+# sin puntos, para que "Ley 20.744" y "ley 20744" coincidan
+RE_TOKEN = re.compile(r"\d+(?:[.,]\d+)*|[a-z]+")
+
+# Abreviaturas frecuentes en citas legales
+SINONIMOS = {
+    "articulo": "art", "articulos": "art", "arts": "art",
+    "inciso": "inc", "incisos": "inc",
+    "leyes": "ley",
+    "decreto": "dec", "decretos": "dec",
+}
+
+STOPWORDS = frozenset((
+    "a", "al", "ante", "con", "como", "de", "del", "el", "en", "entre", "es", "la",
+    "las", "le", "les", "lo", "los", "no", "o", "para", "por", "que", "se", "sin",
+    "su", "sus", "un", "una", "uno", "y",
+))
+
+# Postings pendientes de fusionar con el índice compacto
+FUSIONAR_CADA = 200_000
+
+
+def tokens(texto: str) -> list[str]:
+    """Tokens normalizados (sin tildes, minúsculas, números sin separadores)."""
+    texto = "".join(
+        c for c in unicodedata.normalize("NFD", str(texto).lower())
+        if unicodedata.category(c) != "Mn"
+    )
+    salida = []
+    for token in RE_TOKEN.findall(texto):
+        if token[0].isdigit():
+            token = token.replace(".", "").replace(",", "")
+        else:
+            token = SINONIMOS.get(token, token)
+            if token in STOPWORDS:
+                continue
+        salida.append(token)
+    return salida
+
+
+class IndiceBM25:
+    """
+    Índice léxico invertido (BM25) sobre las mismas filas que el índice FAISS,
+    para las consultas con tokens exactos (artículos, números de ley) que los
+    embeddings matchean mal.
+    Los postings se guardan en formato CSR (token -> filas y frecuencias en
+    arreglos numpy contiguos); las altas posteriores van a un delta en
+    memoria que se fusiona con el CSR al superar FUSIONAR_CADA postings.
+    Como IndiceMetadatos, se construye una vez leyendo el almacén y después
+    se mantiene con `agregar`. Las filas dadas de baja se descartan al buscar.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.construido = False
+        self._lock = threading.Lock()
+
+        self._vocabulario = {}
+        self._inicio = np.zeros(1, dtype=np.int64)  # offsets CSR por token id
+        self._filas = np.zeros(0, dtype=np.int64)
+        self._tf = np.zeros(0, dtype=np.float32)
+        self._largos = ArregloCreciente(np.float32)  # tokens por fila
+        self._suma_largos = 0
+
+        self._delta = {}  # token -> ([filas], [tf])
+        self._delta_postings = 0
+        self.total = 0
+
+    @staticmethod
+    def texto_de(doc: dict) -> str:
+        return f"{doc.get('titulo', '')} {doc.get('texto', '')} {doc.get('respuesta', '')}"
+
+    # ============================================================
+    # Construcción
+    # ============================================================
+    def construir(self, documentos):
+        """Indexa todos los documentos del almacén. Llamar con las escrituras bloqueadas."""
+        with self._lock:
+            if self.construido:
+                return
+            self._indexar(documentos, 0)
+            self._fusionar()
+            self.construido = True
+
+    def agregar(self, registros: list, inicio: int):
+        """Indexa documentos recién agregados en las filas inicio, inicio+1, ..."""
+        with self._lock:
+            if not self.construido:
+                return
+            self._indexar(registros, inicio)
+
+    def _indexar(self, documentos, inicio: int):
+        for fila, doc in enumerate(documentos, start=inicio):
+            frecuencias = Counter(tokens(self.texto_de(doc)))
+            for token, tf in frecuencias.items():
+                filas, tfs = self._delta.setdefault(token, ([], []))
+                filas.append(fila)
+                tfs.append(tf)
+            largo = sum(frecuencias.values())
+            self._largos.agregar([largo])
+            self._suma_largos += largo
+            self._delta_postings += len(frecuencias)
+            if self._delta_postings >= FUSIONAR_CADA:
+                self._fusionar()
+        self.total = len(self._largos)
+
+    def _fusionar(self):
+        """Vuelca el delta al CSR (un solo ordenamiento por token id)."""
+        if not self._delta:
+            return
+
+        for token in self._delta:
+            self._vocabulario.setdefault(token, len(self._vocabulario))
+
+        n_tokens = len(self._vocabulario)
+        viejos = np.repeat(np.arange(len(self._inicio) - 1, dtype=np.int64), np.diff(self._inicio))
+        nuevos_tid, nuevas_filas, nuevos_tf = [], [], []
+        for token, (filas, tfs) in self._delta.items():
+            nuevos_tid.append(np.full(len(filas), self._vocabulario[token], dtype=np.int64))
+            nuevas_filas.append(np.asarray(filas, dtype=np.int64))
+            nuevos_tf.append(np.asarray(tfs, dtype=np.float32))
+
+        tid = np.concatenate([viejos] + nuevos_tid)
+        filas = np.concatenate([self._filas] + nuevas_filas)
+        tf = np.concatenate([self._tf] + nuevos_tf)
+
+        # Estable: dentro de cada token las filas quedan en orden de alta
+        orden = np.argsort(tid, kind="stable")
+        self._filas, self._tf = filas[orden], tf[orden]
+        self._inicio = np.zeros(n_tokens + 1, dtype=np.int64)
+        np.cumsum(np.bincount(tid, minlength=n_tokens), out=self._inicio[1:])
+
+        self._delta = {}
+        self._delta_postings = 0
+
+    # ============================================================
+    # Búsqueda
+    # ============================================================
+    def _postings(self, token: str):
+        partes_filas, partes_tf = [], []
+        tid = self._vocabulario.get(token)
+        if tid is not None:
+            a, b = self._inicio[tid], self._inicio[tid + 1]
+            partes_filas.append(self._filas[a:b])
+            partes_tf.append(self._tf[a:b])
+        if token in self._delta:
+            filas, tfs = self._delta[token]
+            partes_filas.append(np.asarray(filas, dtype=np.int64))
+            partes_tf.append(np.asarray(tfs, dtype=np.float32))
+        if not partes_filas:
+            return None, None
+        return np.concatenate(partes_filas), np.concatenate(partes_tf)
+
+    def buscar(self, consulta: str, k: int, permitidas=None):
+        """
+        Top-k por BM25. Devuelve (filas, scores) ordenados de mayor a menor.
+        `permitidas(filas) -> máscara bool` descarta filas (bajas, filtros)
+        antes de recortar a k.
+        """
+        vacio = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        terminos = list(dict.fromkeys(tokens(consulta)))
+        if not terminos or k <= 0:
+            return vacio
+
+        with self._lock:
+            if self.total == 0:
+                return vacio
+            largos = self._largos.datos
+            promedio = self._suma_largos / self.total or 1.0
+
+            filas_partes, score_partes = [], []
+            for termino in terminos:
+                filas, tf = self._postings(termino)
+                if filas is None:
+                    continue
+                df = len(filas)
+                idf = math.log(1 + (self.total - df + 0.5) / (df + 0.5))
+                norma = self.k1 * (1 - self.b + self.b * largos[filas] / promedio)
+                filas_partes.append(filas)
+                score_partes.append(idf * tf * (self.k1 + 1) / (tf + norma))
+
+        if not filas_partes:
+            return vacio
+
+        filas, posiciones = np.unique(np.concatenate(filas_partes), return_inverse=True)
+        scores = np.bincount(posiciones, weights=np.concatenate(score_partes)).astype(np.float32)
+
+        if permitidas is not None:
+            mascara = permitidas(filas)
+            filas, scores = filas[mascara], scores[mascara]
+
+        if len(filas) > k:
+            mejores = np.argpartition(-scores, k - 1)[:k]
+            filas, scores = filas[mejores], scores[mejores]
+        orden = np.argsort(-scores, kind="stable")
+        return filas[orden], scores[orden]
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            return {
+                "construido": self.construido,
+                "documentos": self.total,
+                "vocabulario": len(self._vocabulario) + sum(t not in self._vocabulario for t in self._delta),
+                "postings": len(self._filas) + self._delta_postings,
+            }
+
+
+def fusion_rrf(rankings: list, pesos: list, k_rrf: int = 60, k: int = None):
+    """
+    Reciprocal Rank Fusion: score(d) = sum_i peso_i / (k_rrf + rank_i(d)),
+    con rank desde 1. `rankings` son secuencias de filas ya ordenadas.
+    Devuelve [(fila, score)] ordenado de mayor a menor, recortado a k.
+    """
+    scores = {}
+    for ranking, peso in zip(rankings, pesos):
+        if not peso:
+            continue
+        for rank, fila in enumerate(ranking, start=1):
+            fila = int(fila)
+            scores[fila] = scores.get(fila, 0.0) + peso / (k_rrf + rank)
+    fusion = sorted(scores.items(), key=lambda x: -x[1])
+    return fusion[:k] if k is not None else fusion
@@ -0,0 +1,87 @@
+# scripts/cache_embeddings.py
+
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+
+class CacheEmbeddings:
+    """
+    Cache LRU acotada de embeddings de consultas.
+    La clave es el texto normalizado (minúsculas, sin tildes, espacios
+    colapsados), así "Despido  sin causa" y "despido sin causa" comparten entrada.
+    """
+
+    def __init__(self, max_entradas: int = 2048):
+        self.max_entradas = max_entradas
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evicciones = 0
+
+    @staticmethod
+    def normalizar(texto: str) -> str:
+        texto = " ".join(texto.lower().split())
+        return "".join(
+            c for c in unicodedata.normalize("NFD", texto)
+            if unicodedata.category(c) != "Mn"
+        )
+
+    def codificar(self, textos: list, codificar) -> np.ndarray:
+        """
+        Devuelve los embeddings de `textos` en orden.
+        Solo los textos ausentes de la cache pasan por `codificar`,
+        todos juntos en un único lote.
+        """
+        claves = [self.normalizar(t) for t in textos]
+        vectores = [None] * len(textos)
+        faltantes = {}
+
+        with self._lock:
+            for i, clave in enumerate(claves):
+                vector = self._datos.get(clave)
+                if vector is not None:
+                    self._datos.move_to_end(clave)
+                    vectores[i] = vector
+                    self.hits += 1
+                else:
+                    faltantes.setdefault(clave, []).append(i)
+                    self.misses += 1
+
+        if faltantes:
+            nuevos = codificar([textos[posiciones[0]] for posiciones in faltantes.values()])
+            with self._lock:
+                for (clave, posiciones), vector in zip(faltantes.items(), nuevos):
+                    for i in posiciones:
+                        vectores[i] = vector
+                    self._guardar(clave, vector)
+
+        return np.vstack(vectores).astype(np.float32)
+
+    def _guardar(self, clave: str, vector: np.ndarray):
+        if self.max_entradas <= 0:
+            return
+        self._datos[clave] = vector
+        self._datos.move_to_end(clave)
+        while len(self._datos) > self.max_entradas:
+            self._datos.popitem(last=False)
+            self.evicciones += 1
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entradas": len(self._datos),
+                "max_entradas": self.max_entradas,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evicciones": self.evicciones,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
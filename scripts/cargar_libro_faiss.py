@@ -1,73 +1,98 @@
+# scripts/cargar_libro_faiss.py
+#
+# Carga un libro PDF en el servidor FAISS, fragmentado por artículos,
+# encabezados y oraciones (scripts/fragmentador.py). Se corre como módulo
+# desde la raíz del repo para que resuelva el paquete `scripts`:
+#   python -m scripts.cargar_libro_faiss libro_despido_laboral.pdf --palabras 250 --solapamiento 40
+# --palabras es el máximo por fragmento (250 por defecto; antes eran ventanas
+# fijas de 400). Con el solapamiento entre fragmentos, 250 mantiene la mayoría
+# de los artículos en un solo fragmento sin inflar el prompt. Con
+# --estrategia palabras --palabras 400 --solapamiento 0 se reproduce la carga
+# original.
+
+import argparse
 import os
 import requests
 from PyPDF2 import PdfReader
 
+from scripts.fragmentador import ESTRATEGIAS, a_documento, fragmentar
+
 FAISS_SERVER = "http://127.0.0.1:8081"  # dirección de tu servidor FAISS
 
-def cargar_pdf_en_faiss(pdf_path, chunk_size=400):
-    # Validar archivo
+
+def leer_paginas(pdf_path):
+    """Texto de cada página del PDF (las páginas sin texto quedan vacías para no correr la numeración)."""
     if not os.path.exists(pdf_path):
         print(f"❌ El archivo no existe: {pdf_path}")
-        return
+        return []
 
-    # Leer PDF
     try:
         reader = PdfReader(pdf_path)
     except Exception as e:
         print(f"❌ Error al abrir el PDF: {e}")
-        return
+        return []
 
-    texto_total = ""
+    paginas = []
     for i, page in enumerate(reader.pages):
+        texto = ""
         try:
-            texto = page.extract_text()
-            if texto:
-                texto_total += texto + "\n"
-            else:
+            texto = page.extract_text() or ""
+            if not texto.strip():
                 print(f"⚠ Página {i+1} sin texto detectable.")
         except Exception as e:
             print(f"⚠ Error leyendo página {i+1}: {e}")
+        paginas.append(texto)
+    return paginas
+
 
-    if not texto_total.strip():
+def cargar_pdf_en_faiss(pdf_path, chunk_size=250, solapamiento=40, estrategia="estructura",
+                        lote_size=256, timeout=300):
+    paginas = leer_paginas(pdf_path)
+    if not any(p.strip() for p in paginas):
         print("❌ No se pudo extraer texto del PDF.")
         return
 
-    # Limpiar texto
-    texto_total = " ".join(texto_total.split())
-
-    # Dividir en fragmentos
-    palabras = texto_total.split()
-    fragmentos = [
-        " ".join(palabras[i:i+chunk_size])
-        for i in range(0, len(palabras), chunk_size)
-    ]
+    # Dividir en fragmentos (artículos / encabezados / oraciones, con solapamiento)
+    fragmentos = fragmentar(paginas, estrategia=estrategia, max_palabras=chunk_size,
+                            solapamiento=solapamiento)
+    con_articulo = sum(1 for f in fragmentos if f["articulo"])
+    print(f"📚 Total de fragmentos a enviar: {len(fragmentos)} "
+          f"(estrategia={estrategia}, {con_articulo} con artículo)")
 
-    print(f"📚 Total de fragmentos a enviar: {len(fragmentos)}")
+    titulo = os.path.splitext(os.path.basename(pdf_path))[0]
+    documentos = [a_documento(frag, idx, titulo) for idx, frag in enumerate(fragmentos, start=1)]
 
-    # Guardar cada fragmento en FAISS
-    for idx, frag in enumerate(fragmentos, start=1):
-        if not frag.strip():
-            print(f"⚠ Fragmento {idx} vacío, se omite.")
-            continue
-
-        payload = {"texto": frag, "respuesta": f"Fragmento {idx} del libro"}
+    # Enviar en lotes a /guardar_lote
+    for inicio in range(0, len(documentos), lote_size):
+        lote = documentos[inicio:inicio + lote_size]
+        rango = f"{inicio + 1}-{inicio + len(lote)}"
 
         try:
             r = requests.post(
-                f"{FAISS_SERVER}/guardar",
-                json=payload,
-                timeout=10
+                f"{FAISS_SERVER}/guardar_lote",
+                json={"documentos": lote},
+                timeout=timeout
             )
-            if r.status_code == 200:
-                print(f"✅ Fragmento {idx} guardado.")
+            data = r.json() if r.status_code == 200 else {}
+            if r.status_code == 200 and "error" not in data:
+                print(f"✅ Fragmentos {rango} guardados (total en índice: {data.get('total')}).")
             else:
-                print(f"❌ Error en fragmento {idx}: {r.text}")
+                print(f"❌ Error en fragmentos {rango}: {r.text}")
         except requests.exceptions.Timeout:
-            print(f"⏳ Timeout al enviar fragmento {idx}.")
+            print(f"⏳ Timeout al enviar fragmentos {rango}.")
         except Exception as e:
-            print(f"❌ Error de conexión en fragmento {idx}: {e}")
+            print(f"❌ Error de conexión en fragmentos {rango}: {e}")
 
     print("✔ Carga completa en FAISS.")
 
 if __name__ == "__main__":
-    cargar_pdf_en_faiss("libro_despido_laboral.pdf")
+    parser = argparse.ArgumentParser(description="Carga un libro PDF en el servidor FAISS")
+    parser.add_argument("pdf", nargs="?", default="libro_despido_laboral.pdf")
+    parser.add_argument("--estrategia", choices=ESTRATEGIAS, default="estructura")
+    parser.add_argument("--palabras", type=int, default=250, help="Máximo de palabras por fragmento")
+    parser.add_argument("--solapamiento", type=int, default=40, help="Palabras repetidas entre fragmentos")
+    parser.add_argument("--lote", type=int, default=256)
+    args = parser.parse_args()
+
+    cargar_pdf_en_faiss(args.pdf, chunk_size=args.palabras, solapamiento=args.solapamiento,
+                        estrategia=args.estrategia, lote_size=args.lote)
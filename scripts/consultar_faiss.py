@@ -46,6 +46,32 @@ def preguntar(texto, k=3):
         print(f"📝 Texto: {texto_res}...")
         print(f"💬 Respuesta: {respuesta}")
 
+def preguntar_lote(textos, k=3):
+    """Consulta varias preguntas con una sola llamada a /buscar_lote."""
+    textos = [t for t in textos if t and t.strip()]
+    if not textos:
+        print("❌ No hay consultas para enviar.")
+        return []
+
+    try:
+        resp = requests.post(
+            f"{FAISS_SERVER}/buscar_lote",
+            json={"consultas": [{"texto": t} for t in textos], "k": k},
+            timeout=30
+        )
+        resp.raise_for_status()
+        data = resp.json()
+    except Exception as e:
+        print(f"❌ Error consultando lote en FAISS: {e}")
+        return []
+
+    lote = data.get("resultados", [])
+    for r in lote:
+        print(f"\n🔎 Consulta: {r.get('consulta')}")
+        print(f"📌 Resultados encontrados: {len(r.get('resultados', []))}")
+
+    return lote
+
 if __name__ == "__main__":
     preguntar("Explicame el despido sin causa")
     preguntar("Qué dice sobre fraude laboral")
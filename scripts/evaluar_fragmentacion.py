@@ -0,0 +1,146 @@
+# scripts/evaluar_fragmentacion.py
+#
+# Compara estrategias de fragmentación del libro (palabras, ventana,
+# estructura) por acierto en la recuperación del artículo correcto:
+#   python -m scripts.evaluar_fragmentacion libro_despido_laboral.pdf --k 5
+# Para cada estrategia se fragmenta el libro, se embeben los fragmentos en un
+# índice plano en memoria y se mide hit@1, hit@k, MRR y las palabras que
+# ocupan los k fragmentos recuperados (lo que después va al prompt).
+# Consultas etiquetadas: JSON Lines con {"consulta": ..., "articulo": "245"}.
+# Sin archivo se genera una por artículo: una oración del cuerpo del artículo
+# a la que se le quita parte de las palabras. Un fragmento acierta si al menos
+# la mitad de él (o la mitad del artículo, si es más corto) cae dentro del
+# artículo buscado. Acepta también .txt con las páginas separadas por \f.
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from scripts import indices
+from scripts.fragmentador import (
+    ESTRATEGIAS, TextoPaginado, articulos, fragmentar, oraciones, texto_para_indice,
+)
+
+DIMENSION = 384
+
+
+def leer_libro(ruta: str) -> list[str]:
+    if ruta.lower().endswith(".pdf"):
+        from scripts.cargar_libro_faiss import leer_paginas
+        return leer_paginas(ruta)
+    with open(ruta, "r", encoding="utf-8") as f:
+        return f.read().split("\f")
+
+
+def generar_consultas(paginas, spans, n: int, rng, quitar: float = 0.3) -> list[dict]:
+    """Una consulta por artículo: una oración de su cuerpo con palabras quitadas."""
+    texto = TextoPaginado(paginas).texto
+    numeros = list(spans)
+    rng.shuffle(numeros)
+
+    consultas = []
+    for numero in numeros[:n]:
+        inicio, fin = spans[numero]
+        # La primera oración es el encabezado "Artículo N": no se usa como consulta
+        cuerpo = [texto[a:b] for a, b in oraciones(texto, inicio, fin)[1:]]
+        cuerpo = [o.split() for o in cuerpo if len(o.split()) >= 8] or [texto[inicio:fin].split()[2:]]
+        palabras = cuerpo[int(rng.integers(len(cuerpo)))]
+        if len(palabras) < 4:
+            continue
+        quedan = sorted(rng.choice(len(palabras), size=max(4, int(len(palabras) * (1 - quitar))), replace=False))
+        consultas.append({"consulta": " ".join(palabras[i] for i in quedan), "articulo": numero})
+    return consultas
+
+
+def cargar_consultas(ruta: str, spans) -> list[dict]:
+    consultas = []
+    with open(ruta, "r", encoding="utf-8") as f:
+        for linea in f:
+            if linea.strip():
+                c = json.loads(linea)
+                if str(c["articulo"]) in spans:
+                    consultas.append({"consulta": c["consulta"], "articulo": str(c["articulo"])})
+                else:
+                    print(f"⚠ Artículo {c['articulo']} no encontrado en el libro, se omite la consulta.")
+    return consultas
+
+
+def _acierta(fragmento, objetivo) -> bool:
+    inicio, fin = objetivo
+    comun = min(fin, fragmento["fin"]) - max(inicio, fragmento["inicio"])
+    return comun > 0 and comun >= 0.5 * min(fragmento["fin"] - fragmento["inicio"], fin - inicio)
+
+
+def evaluar(ruta, archivo=None, n_consultas=200, k=5, palabras=250, solapamiento=40,
+            estrategias=ESTRATEGIAS):
+    from sentence_transformers import SentenceTransformer
+
+    paginas = leer_libro(ruta)
+    spans = articulos(paginas)
+    if not spans:
+        print("❌ No se detectaron artículos en el libro.")
+        return []
+
+    rng = np.random.default_rng(0)
+    consultas = cargar_consultas(archivo, spans) if archivo else generar_consultas(paginas, spans, n_consultas, rng)
+    if not consultas:
+        print("❌ No hay consultas para evaluar.")
+        return []
+
+    model = SentenceTransformer("all-MiniLM-L6-v2")
+    consultas_emb = np.array(model.encode([c["consulta"] for c in consultas]), dtype=np.float32)
+
+    filas_reporte = []
+    for estrategia in estrategias:
+        inicio = time.perf_counter()
+        fragmentos = fragmentar(paginas, estrategia=estrategia, max_palabras=palabras,
+                                solapamiento=solapamiento)
+        embeddings = np.array(model.encode([texto_para_indice(f) for f in fragmentos]), dtype=np.float32)
+        segundos = time.perf_counter() - inicio
+
+        index = indices.crear_indice("flat", DIMENSION, metrica="coseno")
+        indices.agregar(index, embeddings)
+        _, I = indices.buscar(index, consultas_emb, k)
+
+        hit1, hitk, mrr, contexto = 0, 0, 0.0, 0
+        for c, fila in zip(consultas, I):
+            recuperados = [fragmentos[i] for i in fila if i >= 0]
+            contexto += sum(len(f["texto"].split()) for f in recuperados)
+            rank = next((r for r, f in enumerate(recuperados, start=1)
+                         if _acierta(f, spans[c["articulo"]])), None)
+            if rank:
+                hit1 += rank == 1
+                hitk += 1
+                mrr += 1 / rank
+
+        n = len(consultas)
+        promedio = sum(len(f["texto"].split()) for f in fragmentos) / len(fragmentos)
+        filas_reporte.append((estrategia, len(fragmentos), promedio, hit1 / n, hitk / n, mrr / n, contexto / n, segundos))
+
+    print(f"\n📊 {len(paginas)} páginas, {len(spans)} artículos, {len(consultas)} consultas, "
+          f"k={k}, palabras={palabras}, solapamiento={solapamiento}")
+    print(f"{'estrategia':<11} {'fragmentos':>10} {'palabras':>9} {'hit@1':>7} {f'hit@{k}':>7} "
+          f"{'MRR':>7} {'palabras top-k':>15} {'s embeber':>10}")
+    for estrategia, total, promedio, h1, hk, mrr, contexto, segundos in filas_reporte:
+        print(f"{estrategia:<11} {total:>10} {promedio:>9.0f} {h1:>7.3f} {hk:>7.3f} "
+              f"{mrr:>7.3f} {contexto:>15.0f} {segundos:>10.1f}")
+    return filas_reporte
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Acierto de recuperación por estrategia de fragmentación")
+    parser.add_argument("libro", help="PDF o .txt (páginas separadas por \\f)")
+    parser.add_argument("--consultas-etiquetadas", default=None)
+    parser.add_argument("--consultas", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--palabras", type=int, default=250)
+    parser.add_argument("--solapamiento", type=int, default=40)
+    parser.add_argument("--estrategias", nargs="+", choices=ESTRATEGIAS, default=list(ESTRATEGIAS))
+    args = parser.parse_args()
+
+    evaluar(
+        args.libro, archivo=args.consultas_etiquetadas, n_consultas=args.consultas, k=args.k,
+        palabras=args.palabras, solapamiento=args.solapamiento, estrategias=args.estrategias,
+    )
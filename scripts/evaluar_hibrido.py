@@ -0,0 +1,208 @@
+# scripts/evaluar_hibrido.py
+#
+# Compara recall@k, MRR y latencia de los modos de búsqueda vector, bm25 e
+# hibrido (RRF) sobre el corpus ya guardado en el log del servidor FAISS:
+#   python -m scripts.evaluar_hibrido --directorio scripts/data --k 10
+# Consultas etiquetadas: JSON Lines con {"consulta": ..., "relevantes": [ids]}
+# (ids públicos de /documentos). Sin archivo se generan a partir de las citas
+# del propio corpus ("art. 245", "ley 20.744"): una consulta por cita con
+# algunas palabras del documento, y son relevantes los documentos que la citan.
+# Solo lee el directorio (no escribe logs, registro ni snapshots): se puede
+# correr con el servidor levantado sobre los mismos datos.
+
+import argparse
+import json
+import os
+import re
+import time
+
+import numpy as np
+
+from scripts import indices
+from scripts.almacen_documentos import AlmacenDocumentos
+from scripts.bm25 import IndiceBM25, fusion_rrf, tokens
+from scripts.persistencia import PersistenciaFAISS
+from scripts.registro_ids import RegistroIds
+
+DIMENSION = 384
+LOTE_AGREGAR = 65_536
+
+RE_CITA = re.compile(r"\b(?:art(?:[íi]culo)?s?\.?|ley)\s*n?[°º]?\s*\d{1,3}(?:\.\d{3})?\b", re.IGNORECASE)
+
+
+def _clave_cita(cita: str) -> tuple:
+    # "Artículo 245" y "art. 245" son la misma cita
+    return tuple(tokens(cita))
+
+
+def generar_consultas(documentos, filas, n: int, rng) -> list[dict]:
+    """Consultas sintéticas con cita exacta y relevantes = documentos que la contienen."""
+    por_cita, ejemplos = {}, {}
+    for fila in filas:
+        doc = documentos[fila]
+        texto = f"{doc.get('texto', '')} {doc.get('respuesta', '')}"
+        for cita in RE_CITA.findall(texto):
+            clave = _clave_cita(cita)
+            por_cita.setdefault(clave, set()).add(int(fila))
+            ejemplos.setdefault(clave, (cita, texto))
+
+    # Citas que identifican pocos documentos: ahí es donde el ranking importa
+    claves = [c for c, docs in por_cita.items() if len(docs) <= 50]
+    rng.shuffle(claves)
+
+    consultas = []
+    for clave in claves[:n]:
+        cita, texto = ejemplos[clave]
+        palabras = [p for p in re.findall(r"\w{5,}", texto) if not p.isdigit()]
+        contexto = " ".join(rng.choice(palabras, size=min(4, len(palabras)), replace=False)) if palabras else ""
+        consultas.append({"consulta": f"{contexto} {cita}".strip(), "relevantes": sorted(por_cita[clave])})
+    return consultas
+
+
+def _leer_u64(ruta: str) -> np.ndarray:
+    try:
+        return np.fromfile(ruta, dtype=np.uint64).astype(np.int64)
+    except FileNotFoundError:
+        return np.zeros(0, dtype=np.int64)
+
+
+def cargar_corpus(directorio: str):
+    """
+    Abre los datos del servidor sin escribir nada: almacén en solo lectura,
+    vectores mapeados desde el log, ids y bajas leídos tal cual. Devuelve
+    (documentos, vectores, vigente, fila_por_id) alineados a las filas
+    confirmadas en ambos logs.
+    """
+    ruta = lambda nombre: os.path.join(directorio, nombre)
+    documentos = AlmacenDocumentos(ruta(PersistenciaFAISS.DOCS_LOG), ruta(PersistenciaFAISS.DOCS_OFFSETS))
+    documentos.abrir(solo_lectura=True)
+
+    vectores_log = ruta(PersistenciaFAISS.VECTORES_LOG)
+    n_vectores = os.path.getsize(vectores_log) // (DIMENSION * 4) if os.path.exists(vectores_log) else 0
+    total = min(len(documentos), n_vectores)
+    vectores = (np.memmap(vectores_log, dtype=np.float32, mode="r", shape=(n_vectores, DIMENSION))
+                if n_vectores else np.zeros((0, DIMENSION), dtype=np.float32))
+
+    ids = _leer_u64(ruta(RegistroIds.IDS))[:total]
+    if len(ids) < total:
+        # Filas previas a los ids: el id es la posición
+        siguiente = int(ids.max()) + 1 if len(ids) else 0
+        ids = np.concatenate([ids, np.arange(siguiente, siguiente + total - len(ids), dtype=np.int64)])
+
+    # Fila vigente de cada id: la última escrita, salvo que esté dada de baja
+    fila_por_id = np.full(int(ids.max()) + 1 if total else 0, -1, dtype=np.int64)
+    np.maximum.at(fila_por_id, ids, np.arange(total, dtype=np.int64))
+    vigente = np.zeros(total, dtype=np.bool_)
+    vigente[fila_por_id[fila_por_id >= 0]] = True
+
+    eliminados = _leer_u64(ruta(RegistroIds.ELIMINADOS))
+    vigente[eliminados[eliminados < total]] = False
+    con_fila = fila_por_id >= 0
+    fila_por_id[con_fila & ~vigente[np.maximum(fila_por_id, 0)]] = -1
+
+    return documentos, vectores[:total], vigente, fila_por_id
+
+
+def cargar_consultas(ruta: str, fila_por_id) -> list[dict]:
+    consultas = []
+    with open(ruta, "r", encoding="utf-8") as f:
+        for linea in f:
+            if linea.strip():
+                c = json.loads(linea)
+                filas = [int(fila_por_id[int(i)]) for i in c["relevantes"] if 0 <= int(i) < len(fila_por_id)]
+                consultas.append({"consulta": c["consulta"], "relevantes": [x for x in filas if x >= 0]})
+    return [c for c in consultas if c["relevantes"]]
+
+
+def _metricas(rankings, consultas, k):
+    recall, mrr = 0.0, 0.0
+    for ranking, c in zip(rankings, consultas):
+        relevantes = set(c["relevantes"])
+        top = [int(f) for f in ranking[:k]]
+        recall += len(relevantes.intersection(top)) / min(k, len(relevantes))
+        rank = next((i for i, f in enumerate(top, start=1) if f in relevantes), None)
+        mrr += 1 / rank if rank else 0.0
+    return recall / len(consultas), mrr / len(consultas)
+
+
+def evaluar(directorio, archivo=None, n_consultas=200, k=10, candidatos=50, rrf_k=60,
+            peso_vector=1.0, peso_bm25=1.0):
+    from sentence_transformers import SentenceTransformer
+
+    documentos, vectores, vigente, fila_por_id = cargar_corpus(directorio)
+    filas = np.flatnonzero(vigente)
+    if len(filas) == 0:
+        print("❌ No hay documentos en el log.")
+        return []
+
+    rng = np.random.default_rng(0)
+    if archivo:
+        consultas = cargar_consultas(archivo, fila_por_id)
+    else:
+        consultas = generar_consultas(documentos, filas, n_consultas, rng)
+    if not consultas:
+        print("❌ No hay consultas etiquetadas (el corpus no tiene citas de artículos o leyes).")
+        return []
+
+    # Índice exacto en memoria con las filas vigentes (el del servidor no se toca)
+    inicio = time.perf_counter()
+    index = indices.con_ids(indices.crear_indice("flat", DIMENSION, metrica="coseno"))
+    for desde in range(0, len(filas), LOTE_AGREGAR):
+        lote = filas[desde:desde + LOTE_AGREGAR]
+        indices.agregar(index, vectores[lote], ids=lote)
+    print(f"🏗 Índice vectorial construido en {time.perf_counter() - inicio:.1f}s ({index.ntotal} vectores)")
+
+    inicio = time.perf_counter()
+    lexico = IndiceBM25()
+    lexico.construir(documentos[i] for i in range(len(vigente)))
+    print(f"🏗 Índice BM25 construido en {time.perf_counter() - inicio:.1f}s ({lexico.estadisticas()['vocabulario']} términos)")
+
+    model = SentenceTransformer("all-MiniLM-L6-v2")
+    textos = [c["consulta"] for c in consultas]
+    embeddings = np.array(model.encode(textos), dtype=np.float32)
+
+    def vector(i):
+        _, I = indices.buscar(index, embeddings[i:i + 1], candidatos)
+        return I[0][I[0] >= 0]
+
+    def bm25(i):
+        return lexico.buscar(textos[i], candidatos, permitidas=lambda f: vigente[f])[0]
+
+    def hibrido(i):
+        fusion = fusion_rrf([vector(i), bm25(i)], [peso_vector, peso_bm25], k_rrf=rrf_k, k=k)
+        return [f for f, _ in fusion]
+
+    filas_reporte = []
+    for nombre, rankear in (("vector", vector), ("bm25", bm25), ("hibrido", hibrido)):
+        inicio = time.perf_counter()
+        rankings = [rankear(i) for i in range(len(consultas))]
+        ms = (time.perf_counter() - inicio) * 1000 / len(consultas)
+        recall, mrr = _metricas(rankings, consultas, k)
+        filas_reporte.append((nombre, recall, mrr, ms))
+
+    print(f"\n📊 {len(filas)} documentos, {len(consultas)} consultas, k={k}, candidatos={candidatos}")
+    print(f"{'modo':<10} {f'recall@{k}':>10} {'MRR':>8} {'ms/consulta':>12}")
+    for nombre, recall, mrr, ms in filas_reporte:
+        print(f"{nombre:<10} {recall:>10.3f} {mrr:>8.3f} {ms:>12.3f}")
+
+    documentos.cerrar()
+    return filas_reporte
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recall y latencia de búsqueda vectorial, BM25 e híbrida")
+    parser.add_argument("--directorio", default=".")
+    parser.add_argument("--consultas-etiquetadas", default=None)
+    parser.add_argument("--consultas", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--candidatos", type=int, default=50)
+    parser.add_argument("--rrf-k", type=int, default=60)
+    parser.add_argument("--peso-vector", type=float, default=1.0)
+    parser.add_argument("--peso-bm25", type=float, default=1.0)
+    args = parser.parse_args()
+
+    evaluar(
+        args.directorio, archivo=args.consultas_etiquetadas, n_consultas=args.consultas,
+        k=args.k, candidatos=args.candidatos, rrf_k=args.rrf_k,
+        peso_vector=args.peso_vector, peso_bm25=args.peso_bm25,
+    )
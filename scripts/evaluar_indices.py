@@ -0,0 +1,96 @@
+# scripts/evaluar_indices.py
+#
+# Reporte recall vs latencia de los índices aproximados contra el flat exacto,
+# usando los embeddings ya guardados en el log del servidor FAISS:
+#   python -m scripts.evaluar_indices --directorio scripts/data --consultas 500
+
+import argparse
+import time
+
+import numpy as np
+
+from scripts import indices
+from scripts.persistencia import PersistenciaFAISS
+
+DIMENSION = 384
+
+# Barridos de nprobe / efSearch a evaluar
+NPROBES = (1, 4, 16, 64)
+EF_SEARCHES = (16, 32, 64, 128)
+
+
+def _medir(index, consultas, k, **params):
+    inicio = time.perf_counter()
+    _, I = indices.buscar(index, consultas, k, **params)
+    ms = (time.perf_counter() - inicio) * 1000 / len(consultas)
+    return I, ms
+
+
+def _recall(I, referencia, k):
+    aciertos = sum(len(set(a[:k]) & set(b[:k])) for a, b in zip(I, referencia))
+    return aciertos / (len(referencia) * k)
+
+
+def evaluar(directorio, n_consultas=500, k=10, metrica="coseno", nlist=1024, pq_m=48, hnsw_m=32):
+    persistencia = PersistenciaFAISS(directorio, DIMENSION, crear_indice=None)
+    vectores = np.ascontiguousarray(persistencia.leer_vectores(), dtype=np.float32)
+    if len(vectores) == 0:
+        print("❌ No hay embeddings en el log.")
+        return []
+
+    rng = np.random.default_rng(0)
+    muestra = rng.choice(len(vectores), size=min(n_consultas, len(vectores)), replace=False)
+    # Consultas = vectores del corpus con ruido, para no encontrarse a sí mismos exactos
+    consultas = vectores[muestra] + rng.normal(0, 0.01, (len(muestra), DIMENSION)).astype(np.float32)
+
+    flat = indices.crear_indice("flat", DIMENSION, metrica=metrica)
+    indices.agregar(flat, vectores)
+    referencia, ms_flat = _medir(flat, consultas, k)
+
+    filas = [("flat", "-", 1.0, ms_flat)]
+    for tipo in ("ivf_flat", "ivf_pq", "hnsw"):
+        inicio = time.perf_counter()
+        index = indices.crear_indice(
+            tipo, DIMENSION, vectores=vectores, metrica=metrica,
+            nlist=nlist, pq_m=pq_m, hnsw_m=hnsw_m
+        )
+        indices.agregar(index, vectores)
+        construccion = time.perf_counter() - inicio
+
+        real = indices.tipo_de(index)
+        if real != tipo:
+            continue  # corpus insuficiente para entrenar este tipo
+
+        print(f"🏗 {tipo}: construido en {construccion:.1f}s")
+        if tipo == "hnsw":
+            barrido = [("efSearch", ef, {"ef_search": ef}) for ef in EF_SEARCHES]
+        else:
+            barrido = [("nprobe", n, {"nprobe": n}) for n in NPROBES]
+
+        for nombre, valor, params in barrido:
+            I, ms = _medir(index, consultas, k, **params)
+            filas.append((tipo, f"{nombre}={valor}", _recall(I, referencia, k), ms))
+
+    print(f"\n📊 {len(vectores)} vectores, {len(consultas)} consultas, recall@{k} vs flat")
+    print(f"{'índice':<10} {'parámetro':<14} {'recall':>8} {'ms/consulta':>12}")
+    for tipo, param, recall, ms in filas:
+        print(f"{tipo:<10} {param:<14} {recall:>8.3f} {ms:>12.3f}")
+
+    return filas
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recall vs latencia de índices FAISS")
+    parser.add_argument("--directorio", default=".")
+    parser.add_argument("--consultas", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--metrica", choices=list(indices.METRICAS), default="coseno")
+    parser.add_argument("--nlist", type=int, default=1024)
+    parser.add_argument("--pq-m", type=int, default=48)
+    parser.add_argument("--hnsw-m", type=int, default=32)
+    args = parser.parse_args()
+
+    evaluar(
+        args.directorio, n_consultas=args.consultas, k=args.k, metrica=args.metrica,
+        nlist=args.nlist, pq_m=args.pq_m, hnsw_m=args.hnsw_m,
+    )
@@ -1,12 +1,21 @@
-from fastapi import FastAPI
+# Ejecutar desde la raíz del repo:
+#   uvicorn scripts.faiss_server:app --port 8081
+
+from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 from typing import List
-import faiss
 import numpy as np
-import json
 import os
+import threading
 from sentence_transformers import SentenceTransformer
 
+from scripts import indices
+from scripts.bm25 import IndiceBM25, fusion_rrf
+from scripts.cache_embeddings import CacheEmbeddings
+from scripts.filtros import IndiceMetadatos, fecha_valida
+from scripts.persistencia import PersistenciaFAISS
+from scripts.registro_ids import hash_contenido
+
 app = FastAPI()
 
 # Modelo de embeddings
@@ -14,82 +23,698 @@ model = SentenceTransformer("all-MiniLM-L6-v2")
 dimension = 384
 
 # Archivos persistentes
-INDEX_FILE = "faiss_index.bin"
-DOCS_FILE = "documentos.json"
-
-# Cargar índice FAISS si existe
-if os.path.exists(INDEX_FILE):
-    index = faiss.read_index(INDEX_FILE)
-else:
-    index = faiss.IndexFlatL2(dimension)
-
-# Cargar documentos si existen
-if os.path.exists(DOCS_FILE):
-    with open(DOCS_FILE, "r", encoding="utf-8") as f:
-        documentos = json.load(f)
-else:
-    documentos = []
+DATA_DIR = os.getenv("FAISS_DATA_DIR", ".")
+SNAPSHOT_CADA = int(os.getenv("FAISS_SNAPSHOT_CADA", "1000"))
+SNAPSHOT_SEGUNDOS = float(os.getenv("FAISS_SNAPSHOT_SEGUNDOS", "300"))
+FSYNC = os.getenv("FAISS_FSYNC", "0") == "1"
+
+# Tamaño de lote para el modelo de embeddings en ingestas masivas
+ENCODE_BATCH_SIZE = int(os.getenv("FAISS_ENCODE_BATCH_SIZE", "64"))
+
+
+# Cache LRU de embeddings de consultas
+CACHE_EMBEDDINGS = int(os.getenv("FAISS_CACHE_EMBEDDINGS", "2048"))
+cache_consultas = CacheEmbeddings(max_entradas=CACHE_EMBEDDINGS)
+
+
+def codificar(textos: List[str], batch_size: int = ENCODE_BATCH_SIZE) -> np.ndarray:
+    return np.array(model.encode(textos, batch_size=batch_size), dtype=np.float32)
+
+
+def codificar_consultas(textos: List[str]) -> np.ndarray:
+    """Embeddings de consultas, pasando por la cache antes que por el modelo."""
+    return cache_consultas.codificar(textos, codificar)
+
+
+# Tipo de índice (flat, ivf_flat, ivf_pq, hnsw) para reconstrucciones desde el log.
+# Un snapshot existente se carga tal cual; para cambiar de tipo usar scripts/reindexar.py
+CONFIG_INDICE = indices.configuracion_desde_entorno()
+
+# Valores por defecto de búsqueda aproximada (se pueden pisar por request)
+NPROBE = int(os.getenv("FAISS_NPROBE", "16"))
+EF_SEARCH = int(os.getenv("FAISS_EF_SEARCH", "64"))
+
+
+# Búsquedas filtradas: con hasta este número de documentos candidatos se busca
+# exacto sobre sus vectores; con más, FAISS filtra con un IDSelector
+FILTRO_EXACTO_MAX = int(os.getenv("FAISS_FILTRO_EXACTO_MAX", "20000"))
+
+# Modo de búsqueda por defecto: vector (solo FAISS), bm25 (solo léxico) o
+# hibrido (ambos rankings fusionados con Reciprocal Rank Fusion)
+MODOS_BUSQUEDA = ("vector", "bm25", "hibrido")
+MODO_BUSQUEDA = os.getenv("FAISS_MODO_BUSQUEDA", "vector")
+RRF_K = int(os.getenv("FAISS_RRF_K", "60"))
+PESO_VECTOR = float(os.getenv("FAISS_PESO_VECTOR", "1.0"))
+PESO_BM25 = float(os.getenv("FAISS_PESO_BM25", "1.0"))
+# Candidatos que aporta cada ranking antes de fusionar
+CANDIDATOS_HIBRIDO = int(os.getenv("FAISS_CANDIDATOS_HIBRIDO", "50"))
+
+# Compactación: se reconstruye el índice sin los documentos dados de baja cuando
+# estos superan el mínimo y la proporción indicada de los vectores del índice
+COMPACTAR_MIN = int(os.getenv("FAISS_COMPACTAR_MIN", "1000"))
+COMPACTAR_PROPORCION = float(os.getenv("FAISS_COMPACTAR_PROPORCION", "0.1"))
+
+
+def crear_indice(vectores: np.ndarray):
+    return indices.crear_indice(dimension=dimension, vectores=vectores, **CONFIG_INDICE)
+
+
+# Cargar índice (snapshot + cola del log) y almacén de documentos en disco (mmap)
+persistencia = PersistenciaFAISS(
+    DATA_DIR,
+    dimension,
+    crear_indice=crear_indice,
+    snapshot_cada=SNAPSHOT_CADA,
+    snapshot_segundos=SNAPSHOT_SEGUNDOS,
+    fsync=FSYNC,
+)
+index, documentos = persistencia.cargar(codificar=codificar)
+registro = persistencia.registro
+
+# Serializa index.add + append al log entre workers del threadpool
+escritura_lock = threading.Lock()
+
+# Una sola compactación a la vez
+compactacion_lock = threading.Lock()
+
+# Metadatos (tipo, origen, tribunal, fecha) indexados para filtrar búsquedas
+metadatos = IndiceMetadatos()
+
+
+def construir_metadatos():
+    # Con las escrituras bloqueadas, para no perder documentos agregados en el medio
+    with escritura_lock:
+        metadatos.construir(documentos)
+
+
+# Índice léxico BM25 sobre las mismas filas, para la búsqueda híbrida
+lexico = IndiceBM25()
+
+
+def construir_lexico():
+    with escritura_lock:
+        lexico.construir(documentos)
+
+
+# Se construyen en segundo plano al arrancar. Una búsqueda filtrada anterior
+# espera a los metadatos; una híbrida, mientras tanto, usa solo vectores
+threading.Thread(target=construir_metadatos, name="metadatos", daemon=True).start()
+threading.Thread(target=construir_lexico, name="lexico", daemon=True).start()
+
 
 class Documento(BaseModel):
     texto: str
     respuesta: str
+    # Metadatos opcionales (fallos ingestados por el crawler de jurisprudencia)
+    tipo: str | None = None  # fallo | libro | consulta
+    titulo: str | None = None
+    tribunal: str | None = None
+    fecha: str | None = None  # ISO, YYYY-MM-DD
+    link: str | None = None
+    origen: str | None = None
+    # Fragmentos de libros (cargar_libro_faiss)
+    paginas: str | None = None  # "12" o "12-13"
+    articulo: str | None = None
+
+
+METADATOS = ("tipo", "titulo", "tribunal", "fecha", "link", "origen", "paginas", "articulo")
+
+
+def a_registro(doc: Documento) -> dict:
+    registro = {"texto": doc.texto, "respuesta": doc.respuesta}
+    for campo in METADATOS:
+        valor = getattr(doc, campo)
+        if valor is not None:
+            registro[campo] = valor
+    return registro
+
+
+class LoteDocumentos(BaseModel):
+    documentos: List[Documento]
+    batch_size: int | None = None
+
+
+class Consulta(BaseModel):
+    texto: str
+    k: int | None = None
+    min_score: float | None = None
+
+
+class Textos(BaseModel):
+    textos: List[str]
+
+
+class Filtros(BaseModel):
+    tipo: str | None = None
+    origen: str | None = None
+    tribunal: str | None = None  # coincide por subcadena, sin tildes
+    fecha_desde: str | None = None
+    fecha_hasta: str | None = None
+
+
+class LoteConsultas(BaseModel):
+    consultas: List[Consulta]
+    k: int = 3
+    nprobe: int | None = None
+    ef_search: int | None = None
+    min_score: float | None = None
+    filtros: Filtros | None = None
+    modo: str | None = None
+    peso_bm25: float | None = None
+    peso_vector: float | None = None
+
+
+def validar_filtros(filtros: Filtros | None):
+    """422 si una fecha del filtro no es YYYY-MM-DD (ignorarla cambiaría el resultado)."""
+    if filtros is None:
+        return
+    for campo in ("fecha_desde", "fecha_hasta"):
+        valor = getattr(filtros, campo)
+        if valor is not None and not fecha_valida(valor):
+            raise HTTPException(status_code=422, detail=f"{campo} debe tener formato YYYY-MM-DD: {valor!r}")
+
+
+def seleccionar_ids(filtros: Filtros | None):
+    """Ids de documentos que cumplen `filtros`, o None si no hay filtros."""
+    if filtros is None:
+        return None
+    if not metadatos.construido:
+        construir_metadatos()
+    return metadatos.seleccionar(**filtros.model_dump())
+
+
+def buscar_vectores(embeddings: np.ndarray, k: int, ids=None, nprobe=None, ef_search=None):
+    """
+    index.search, restringido a `ids` si se indican: subconjuntos chicos se
+    resuelven exacto sobre el log de vectores (recall perfecto aunque el
+    índice sea aproximado); los grandes, dentro de FAISS con un IDSelector.
+    """
+    if ids is not None:
+        # Los metadatos indexan filas del log: se descartan las dadas de baja
+        ids = ids[ids < len(registro)]
+        ids = ids[registro.vigente(ids)]
+        if len(ids) <= FILTRO_EXACTO_MAX:
+            vectores = persistencia.leer_vectores()
+            return indices.buscar_exacto(index, vectores[ids], ids, embeddings, k)
+
+    return indices.buscar(
+        index, embeddings, k,
+        nprobe=nprobe or NPROBE, ef_search=ef_search or EF_SEARCH, ids=ids,
+        excluir=registro.excluir() if ids is None else None,
+    )
+
+
+def rankear(textos: List[str], embeddings: np.ndarray, k: int, ids=None, modo=None,
+            nprobe=None, ef_search=None, peso_bm25=None, peso_vector=None) -> list:
+    """
+    Top-k de cada consulta según `modo`. Devuelve por consulta
+    (distancias, filas, fusion): en modo vector fusion es None; en bm25 e
+    hibrido es {fila: {"score_bm25", "score_rrf"}} y las distancias son las
+    vectoriales exactas de las filas elegidas, en el orden de la fusión.
+    """
+    modo = modo or MODO_BUSQUEDA
+    if modo != "vector" and not lexico.construido:
+        modo = "vector"  # índice léxico todavía en construcción
+
+    if modo == "vector":
+        D, I = buscar_vectores(embeddings, k, ids=ids, nprobe=nprobe, ef_search=ef_search)
+        return [(D[i], I[i], None) for i in range(len(textos))]
+
+    candidatos = max(k, CANDIDATOS_HIBRIDO)
+    if modo == "hibrido":
+        _, I = buscar_vectores(embeddings, candidatos, ids=ids, nprobe=nprobe, ef_search=ef_search)
+
+    def permitidas(filas):
+        mascara = registro.vigente(filas)
+        if ids is not None:
+            mascara &= np.isin(filas, ids, assume_unique=True)
+        return mascara
+
+    vectores = persistencia.leer_vectores()
+    salida = []
+    for i, texto in enumerate(textos):
+        filas_bm25, scores_bm25 = lexico.buscar(texto, candidatos, permitidas=permitidas)
+        if modo == "hibrido":
+            rankings = [I[i][I[i] >= 0], filas_bm25]
+            pesos = [PESO_VECTOR if peso_vector is None else peso_vector,
+                     PESO_BM25 if peso_bm25 is None else peso_bm25]
+        else:
+            rankings, pesos = [filas_bm25], [1.0]
+
+        fusion = fusion_rrf(rankings, pesos, k_rrf=RRF_K, k=k)
+        filas = np.asarray([f for f, _ in fusion], dtype=np.int64)
+        if not len(filas):
+            salida.append((np.zeros(0, dtype=np.float32), filas, {}))
+            continue
+
+        Dv, Iv = indices.buscar_exacto(index, vectores[filas], filas, embeddings[i:i + 1], len(filas))
+        distancia = dict(zip(Iv[0].tolist(), Dv[0].tolist()))
+        bm25 = dict(zip(filas_bm25.tolist(), scores_bm25.tolist()))
+        salida.append((
+            np.asarray([distancia[f] for f in filas.tolist()], dtype=np.float32),
+            filas,
+            {f: {"score_bm25": bm25.get(f, 0.0), "score_rrf": s} for f, s in fusion},
+        ))
+    return salida
+
+
+def version_corpus() -> int:
+    """
+    Cambia cada vez que se agregan, reemplazan o eliminan documentos (filas
+    del log + bajas, ambos append-only).
+    Los clientes la usan para invalidar caches derivadas del corpus.
+    """
+    return persistencia.total + registro.total_bajas
+
+
+# ============================================================
+# Compactación
+# ============================================================
+def compactar() -> bool:
+    """
+    Reconstruye el índice solo con los documentos vigentes. El índice nuevo
+    se arma fuera del lock de escritura (las búsquedas y altas siguen sobre
+    el actual); al final se le agregan las filas escritas mientras tanto y se
+    reemplaza. Devuelve False si ya había una compactación en curso.
+    """
+    global index
+    if not compactacion_lock.acquire(blocking=False):
+        return False
+    try:
+        with escritura_lock:
+            hasta = persistencia.total
+            filas = registro.filas_vigentes(hasta)
+
+        print(f"🧹 Compactando índice: {len(filas)} documentos vigentes de {hasta} filas.")
+        nuevo = persistencia.construir_indice(filas)
+
+        with escritura_lock:
+            cola = hasta + np.flatnonzero(registro.vigente(slice(hasta, persistencia.total)))
+            if len(cola):
+                indices.agregar(nuevo, persistencia.leer_vectores()[cola], ids=cola)
+            # Las bajas ocurridas durante la reconstrucción quedan como exclusiones
+            registro.sincronizar_indice(indices.ids_en_indice(nuevo))
+            index = nuevo
+            persistencia.snapshot(index, forzar=True)
+
+        print(f"✔ Compactación terminada: {index.ntotal} vectores en el índice.")
+        return True
+    except Exception as e:
+        print(f"❌ Error compactando el índice: {e}")
+        return False
+    finally:
+        compactacion_lock.release()
+
+
+def compactar_si_corresponde():
+    """Lanza la compactación en segundo plano si las bajas en el índice superan el umbral."""
+    umbral = max(COMPACTAR_MIN, COMPACTAR_PROPORCION * index.ntotal)
+    if registro.bajas_en_indice >= umbral and not compactacion_lock.locked():
+        threading.Thread(target=compactar, name="compactacion", daemon=True).start()
+
+
+@app.on_event("shutdown")
+def guardar_snapshot_final():
+    persistencia.cerrar(index)
+
 
 @app.get("/health")
 def health_check():
-    return {"status": "ok", "documentos": len(documentos)}
+    return {
+        "status": "ok",
+        "documentos": registro.documentos_vigentes,
+        "filas_log": persistencia.total,
+        "excluidos_en_indice": registro.bajas_en_indice,
+        "compactando": compactacion_lock.locked(),
+        "indice": indices.tipo_de(index),
+        "metrica": "coseno" if indices.es_coseno(index) else "l2",
+        "version_corpus": version_corpus(),
+        "pendientes_snapshot": persistencia.pendientes,
+        "cache_embeddings": cache_consultas.estadisticas(),
+        "metadatos": metadatos.estadisticas(),
+        "lexico": lexico.estadisticas(),
+        "modo_busqueda": MODO_BUSQUEDA,
+    }
+
 
 @app.post("/guardar")
 def guardar(doc: Documento):
     if not doc.texto.strip():
         return {"error": "El texto está vacío"}
 
+    registro_doc = a_registro(doc)
+    huella = hash_contenido(registro_doc)
+
+    # Contenido ya indexado: no se vuelve a codificar ni a agregar
+    duplicado = registro.duplicado(huella)
+    if duplicado is not None:
+        return {"mensaje": "Documento duplicado", "id": duplicado, "duplicado": True}
+
     try:
-        embedding = model.encode([doc.texto])
-        embedding = np.array(embedding, dtype=np.float32)
+        embedding = codificar([doc.texto])
     except Exception as e:
         return {"error": f"Error generando embedding: {e}"}
 
+    with escritura_lock:
+        # Otra request pudo guardar el mismo contenido mientras se codificaba
+        duplicado = registro.duplicado(huella)
+        if duplicado is not None:
+            return {"mensaje": "Documento duplicado", "id": duplicado, "duplicado": True}
+
+        doc_id = registro.siguiente_id()
+        try:
+            agregar_filas([registro_doc], embedding, [doc_id], [huella])
+        except Exception as e:
+            return {"error": f"Error agregando al índice FAISS: {e}"}
+
+    return {"mensaje": "Documento guardado", "id": doc_id, "total": registro.documentos_vigentes}
+
+
+@app.post("/guardar_lote")
+def guardar_lote(lote: LoteDocumentos):
+    """
+    Ingesta masiva: codifica en lotes, agrega todo con un único index.add
+    y persiste una sola vez. Los documentos cuyo contenido ya está indexado
+    (o repetido dentro del lote) se omiten sin codificarlos.
+    """
+    validos = [d for d in lote.documentos if d.texto.strip()]
+    omitidos = len(lote.documentos) - len(validos)
+
+    if not validos:
+        return {"error": "El lote no contiene documentos con texto"}
+
+    batch_size = lote.batch_size or ENCODE_BATCH_SIZE
+    if batch_size < 1:
+        return {"error": "batch_size debe ser mayor a 0"}
+
+    registros, huellas, vistas = [], [], set()
+    duplicados = 0
+    for d in validos:
+        reg = a_registro(d)
+        huella = hash_contenido(reg)
+        if huella in vistas or registro.duplicado(huella) is not None:
+            duplicados += 1
+            continue
+        vistas.add(huella)
+        registros.append(reg)
+        huellas.append(huella)
+
+    if not registros:
+        return {
+            "mensaje": "Lote sin documentos nuevos",
+            "guardados": 0, "ids": [], "duplicados": duplicados,
+            "omitidos": omitidos, "total": registro.documentos_vigentes,
+        }
+
     try:
-        index.add(embedding)
+        embeddings = codificar([r["texto"] for r in registros], batch_size=batch_size)
     except Exception as e:
-        return {"error": f"Error agregando al índice FAISS: {e}"}
+        return {"error": f"Error generando embeddings: {e}"}
+
+    with escritura_lock:
+        nuevos = [i for i, h in enumerate(huellas) if registro.duplicado(h) is None]
+        duplicados += len(huellas) - len(nuevos)
+        registros = [registros[i] for i in nuevos]
+        huellas = [huellas[i] for i in nuevos]
+        embeddings = embeddings[nuevos]
+
+        siguiente = registro.siguiente_id()
+        ids = list(range(siguiente, siguiente + len(registros)))
+        if registros:
+            try:
+                agregar_filas(registros, embeddings, ids, huellas)
+            except Exception as e:
+                return {"error": f"Error agregando al índice FAISS: {e}"}
+
+    return {
+        "mensaje": "Lote guardado",
+        "guardados": len(registros),
+        "ids": ids,
+        "duplicados": duplicados,
+        "omitidos": omitidos,
+        "total": registro.documentos_vigentes,
+    }
+
+
+def agregar_filas(registros: list, embeddings: np.ndarray, ids: list, huellas: list):
+    """
+    Indexa y persiste documentos nuevos en las próximas filas del log.
+    Llamar con escritura_lock tomado.
+    """
+    registro.validar_ids(ids)
+    inicio = persistencia.total
+    filas = np.arange(inicio, inicio + len(registros), dtype=np.int64)
+    indices.agregar(index, embeddings, ids=filas)
+
+    # Persistencia incremental: append al almacén y al log, snapshot por umbral
+    try:
+        persistencia.registrar(index, registros, embeddings, ids, huellas)
+    except Exception:
+        # Sin fila en el log, el vector quedaría en el índice apuntando a otro documento
+        try:
+            index.remove_ids(filas)
+        except Exception as e:
+            print(f"⚠ No se pudieron quitar del índice las filas {inicio}-{filas[-1]}: {e}")
+        raise
+    metadatos.agregar(registros, inicio)
+    lexico.agregar(registros, inicio)
+
 
-    documentos.append({"texto": doc.texto, "respuesta": doc.respuesta})
+# ============================================================
+# Documentos por id
+# ============================================================
+def documento_por_id(doc_id: int) -> dict:
+    fila = registro.fila(doc_id)
+    if fila < 0:
+        raise HTTPException(status_code=404, detail="Documento no encontrado.")
+    return {"id": doc_id, **documentos[fila]}
 
-    # Guardar persistencia
-    faiss.write_index(index, INDEX_FILE)
-    with open(DOCS_FILE, "w", encoding="utf-8") as f:
-        json.dump(documentos, f, ensure_ascii=False, indent=2)
 
-    return {"mensaje": "Documento guardado", "total": len(documentos)}
+@app.get("/documentos/{doc_id}")
+def obtener_documento(doc_id: int):
+    return documento_por_id(doc_id)
+
+
+@app.put("/documentos/{doc_id}")
+def reemplazar_documento(doc_id: int, doc: Documento):
+    """
+    Upsert: agrega el documento con ese id o reemplaza el vigente. La versión
+    anterior queda dada de baja (se excluye de las búsquedas) hasta la
+    próxima compactación. Sin cambios de contenido no se escribe nada.
+    """
+    if doc_id < 0 or doc_id > registro.siguiente_id():
+        return {"error": f"El id debe estar entre 0 y {registro.siguiente_id()}"}
+    if not doc.texto.strip():
+        return {"error": "El texto está vacío"}
+
+    registro_doc = a_registro(doc)
+    huella = hash_contenido(registro_doc)
+
+    fila = registro.fila(doc_id)
+    if fila >= 0 and registro.huella(fila) == huella and documentos[fila] == registro_doc:
+        return {"mensaje": "Documento sin cambios", "id": doc_id, "actualizado": False}
+
+    # El mismo contenido bajo otro id no se duplica: se devuelve ese id
+    duplicado = registro.duplicado(huella)
+    if duplicado is not None and duplicado != doc_id:
+        return {"mensaje": "Documento duplicado", "id": duplicado, "duplicado": True, "actualizado": False}
+
+    try:
+        embedding = codificar([doc.texto])
+    except Exception as e:
+        return {"error": f"Error generando embedding: {e}"}
+
+    with escritura_lock:
+        duplicado = registro.duplicado(huella)
+        if duplicado is not None and duplicado != doc_id:
+            return {"mensaje": "Documento duplicado", "id": duplicado, "duplicado": True, "actualizado": False}
+        try:
+            agregar_filas([registro_doc], embedding, [doc_id], [huella])
+        except Exception as e:
+            return {"error": f"Error agregando al índice FAISS: {e}"}
+
+    compactar_si_corresponde()
+    return {"mensaje": "Documento guardado", "id": doc_id, "actualizado": fila >= 0}
+
+
+@app.delete("/documentos/{doc_id}")
+def eliminar_documento(doc_id: int):
+    with escritura_lock:
+        if not persistencia.eliminar(doc_id):
+            raise HTTPException(status_code=404, detail="Documento no encontrado.")
+
+    compactar_si_corresponde()
+    return {"mensaje": "Documento eliminado", "id": doc_id, "total": registro.documentos_vigentes}
+
+
+@app.post("/compactar")
+def iniciar_compactacion():
+    """Compacta el índice en segundo plano, sin esperar al umbral de bajas."""
+    if compactacion_lock.locked():
+        return {"mensaje": "Ya hay una compactación en curso"}
+    threading.Thread(target=compactar, name="compactacion", daemon=True).start()
+    return {"mensaje": "Compactación iniciada", "excluidos_en_indice": registro.bajas_en_indice}
+
+
+@app.post("/embeddings")
+def embeddings(lote: Textos):
+    """
+    Embeddings de consultas (normalizados si la métrica es coseno), para
+    que los clientes comparen textos entre sí sin tocar el índice.
+    Pasan por la cache LRU: un /buscar posterior con el mismo texto no
+    vuelve a invocar al modelo.
+    """
+    if not lote.textos:
+        return {"vectores": [], "version_corpus": version_corpus()}
+
+    try:
+        vectores = indices.preparar(index, codificar_consultas(lote.textos))
+    except Exception as e:
+        return {"error": f"Error generando embeddings: {e}"}
+
+    return {
+        "vectores": vectores.tolist(),
+        "dimension": dimension,
+        "version_corpus": version_corpus(),
+    }
+
 
 @app.get("/buscar")
-def buscar(texto: str, k: int = 3):
+def buscar(texto: str, k: int = 3, min_score: float | None = None,
+           nprobe: int | None = None, ef_search: int | None = None,
+           tipo: str | None = None, origen: str | None = None, tribunal: str | None = None,
+           fecha_desde: str | None = None, fecha_hasta: str | None = None,
+           modo: str | None = None, peso_bm25: float | None = None,
+           peso_vector: float | None = None):
+    """
+    Búsqueda semántica. Los filtros opcionales (tipo, origen, tribunal,
+    fecha_desde/fecha_hasta en YYYY-MM-DD) se aplican antes de rankear:
+    se devuelven hasta k documentos que los cumplen.
+    `modo` (vector | bm25 | hibrido) elige el ranking; en hibrido se fusionan
+    el vectorial y el léxico (RRF) con los pesos indicados, y min_score no
+    descarta los documentos con coincidencia léxica.
+    """
     if not texto.strip():
         return {"error": "El texto de consulta está vacío"}
+    if k < 1:
+        return {"error": "k debe ser mayor o igual a 1"}
+    if modo is not None and modo not in MODOS_BUSQUEDA:
+        return {"error": f"modo debe ser uno de {', '.join(MODOS_BUSQUEDA)}"}
+    filtros = Filtros(
+        tipo=tipo, origen=origen, tribunal=tribunal,
+        fecha_desde=fecha_desde, fecha_hasta=fecha_hasta,
+    )
+    validar_filtros(filtros)
 
-    if len(documentos) == 0:
+    if registro.documentos_vigentes == 0:
         return {"resultados": [], "mensaje": "No hay documentos en el índice"}
 
     try:
-        embedding = model.encode([texto])
-        embedding = np.array(embedding, dtype=np.float32)
+        embedding = codificar_consultas([texto])
     except Exception as e:
         return {"error": f"Error generando embedding: {e}"}
 
+    ids = seleccionar_ids(filtros)
+
     try:
-        D, I = index.search(embedding, k)
+        [(D, I, fusion)] = rankear(
+            [texto], embedding, k, ids=ids, modo=modo, nprobe=nprobe, ef_search=ef_search,
+            peso_bm25=peso_bm25, peso_vector=peso_vector,
+        )
     except Exception as e:
         return {"error": f"Error buscando en FAISS: {e}"}
 
+    return {
+        "consulta": texto,
+        "resultados": formatear_resultados(D, I, min_score=min_score, fusion=fusion),
+    }
+
+
+@app.post("/buscar_lote")
+def buscar_lote(lote: LoteConsultas):
+    """
+    Búsqueda de muchas consultas a la vez: un único forward del modelo
+    y un único index.search sobre la matriz de consultas.
+    """
+    if not lote.consultas:
+        return {"resultados": []}
+    if lote.k < 1 or any(c.k is not None and c.k < 1 for c in lote.consultas):
+        return {"error": "k debe ser mayor o igual a 1"}
+    if lote.modo is not None and lote.modo not in MODOS_BUSQUEDA:
+        return {"error": f"modo debe ser uno de {', '.join(MODOS_BUSQUEDA)}"}
+    validar_filtros(lote.filtros)
+
+    if registro.documentos_vigentes == 0:
+        return {
+            "resultados": [{"consulta": c.texto, "resultados": []} for c in lote.consultas],
+            "mensaje": "No hay documentos en el índice"
+        }
+
+    validas = [i for i, c in enumerate(lote.consultas) if c.texto.strip()]
+    ks = [lote.consultas[i].k or lote.k for i in validas]
+
+    salida = [
+        {"consulta": c.texto, "error": "El texto de consulta está vacío"}
+        for c in lote.consultas
+    ]
+    if not validas:
+        return {"resultados": salida}
+
+    try:
+        embeddings = codificar_consultas([lote.consultas[i].texto for i in validas])
+    except Exception as e:
+        return {"error": f"Error generando embeddings: {e}"}
+
+    # Se busca con el k máximo y se recorta por consulta
+    try:
+        rankings = rankear(
+            [lote.consultas[i].texto for i in validas], embeddings, max(ks),
+            ids=seleccionar_ids(lote.filtros), modo=lote.modo,
+            nprobe=lote.nprobe, ef_search=lote.ef_search,
+            peso_bm25=lote.peso_bm25, peso_vector=lote.peso_vector,
+        )
+    except Exception as e:
+        return {"error": f"Error buscando en FAISS: {e}"}
+
+    for (D, I, fusion), i, k in zip(rankings, validas, ks):
+        consulta = lote.consultas[i]
+        min_score = consulta.min_score if consulta.min_score is not None else lote.min_score
+        salida[i] = {
+            "consulta": consulta.texto,
+            "resultados": formatear_resultados(D[:k], I[:k], min_score=min_score, fusion=fusion),
+        }
+
+    return {"resultados": salida}
+
+
+def formatear_resultados(distancias, indices_docs, min_score: float | None = None,
+                         fusion: dict | None = None) -> list:
+    """
+    Arma los resultados de una fila de index.search.
+    Descarta los huecos (-1) que FAISS devuelve cuando k supera al corpus
+    y, si se indica `min_score`, los hits con similitud coseno menor
+    (salvo los que tienen coincidencia léxica en modo bm25/hibrido, cuyos
+    scores de `fusion` se agregan al resultado).
+    """
+    scores = indices.a_scores(index, np.asarray(distancias))
     resultados = []
-    for dist, idx in zip(D[0], I[0]):
-        if idx < len(documentos):
-            doc = documentos[idx]
-            resultados.append({
-                "texto": doc["texto"],
-                "respuesta": doc["respuesta"],
-                "distancia": float(dist)
-            })
-
-    return {"consulta": texto, "resultados": resultados}
+    for dist, score, idx in zip(distancias, scores, indices_docs):
+        if idx < 0 or idx >= len(documentos):
+            continue
+        extra = fusion.get(int(idx)) if fusion else None
+        lexico_hit = extra is not None and extra["score_bm25"] > 0
+        if min_score is not None and score < min_score and not lexico_hit:
+            continue
+        doc = documentos[idx]
+        resultado = {
+            "id": registro.id_de(idx),
+            "texto": doc["texto"],
+            "respuesta": doc["respuesta"],
+            "score": float(score),
+            "distancia": float(dist)
+        }
+        resultado.update({campo: doc[campo] for campo in METADATOS if campo in doc})
+        if extra is not None:
+            resultado.update(extra)
+        resultados.append(resultado)
+    return resultados
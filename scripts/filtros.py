@@ -0,0 +1,141 @@
+# scripts/filtros.py
+
+import re
+import threading
+import unicodedata
+from datetime import date
+
+import numpy as np
+
+from scripts.registro_ids import ArregloCreciente
+
+# Tipos de documento conocidos
+TIPOS_DOCUMENTO = ("fallo", "libro", "consulta")
+
+RE_FECHA = re.compile(r"^(\d{4})-(\d{2})-(\d{2})")
+
+
+def _normalizar(valor: str) -> str:
+    valor = " ".join(str(valor).lower().split())
+    return "".join(
+        c for c in unicodedata.normalize("NFD", valor)
+        if unicodedata.category(c) != "Mn"
+    )
+
+
+def fecha_a_entero(fecha) -> int:
+    """'2021-03-12' -> 20210312; 0 si falta o no es ISO."""
+    m = RE_FECHA.match(fecha or "")
+    return int("".join(m.groups())) if m else 0
+
+
+def fecha_valida(fecha: str) -> bool:
+    """True si `fecha` es una fecha ISO YYYY-MM-DD existente."""
+    try:
+        return len(fecha) == 10 and date.fromisoformat(fecha) is not None
+    except (TypeError, ValueError):
+        return False
+
+
+def tipo_de_documento(doc: dict):
+    """Tipo declarado o, para documentos anteriores a los metadatos, inferido."""
+    if doc.get("tipo"):
+        return doc["tipo"]
+    if doc.get("tribunal") or doc.get("link"):
+        return "fallo"
+    if str(doc.get("respuesta", "")).startswith("Fragmento "):
+        return "libro"
+    return None
+
+
+class IndiceMetadatos:
+    """
+    Índice invertido en memoria de los metadatos de los documentos FAISS,
+    para filtrar búsquedas sin post-filtrar el top-k:
+    - tipo, origen, tribunal: valor normalizado -> ids (tribunal admite subcadena)
+    - fecha: arreglo numpy YYYYMMDD por id, para rangos
+    `seleccionar` devuelve los ids que cumplen los filtros; el servidor los
+    pasa a FAISS como IDSelector o, si son pocos, busca exacto sobre ellos.
+    Se construye una sola vez leyendo el almacén y después se mantiene con
+    `agregar` en cada escritura.
+    """
+
+    CAMPOS = ("tipo", "origen", "tribunal")
+
+    def __init__(self):
+        self.construido = False
+        self._lock = threading.Lock()
+        self._valores = {campo: {} for campo in self.CAMPOS}
+        self._fechas = ArregloCreciente(np.int32)
+        self.total = 0
+
+    def construir(self, documentos):
+        """Indexa todos los documentos del almacén. Llamar con las escrituras bloqueadas."""
+        with self._lock:
+            if self.construido:
+                return
+            self._indexar(documentos, 0)
+            self.construido = True
+
+    def agregar(self, registros: list, inicio: int):
+        """Indexa documentos recién agregados con ids inicio, inicio+1, ..."""
+        with self._lock:
+            if self.construido:
+                self._indexar(registros, inicio)
+
+    def _indexar(self, documentos, inicio: int):
+        for i, doc in enumerate(documentos, start=inicio):
+            for campo in self.CAMPOS:
+                valor = tipo_de_documento(doc) if campo == "tipo" else doc.get(campo)
+                if valor:
+                    self._valores[campo].setdefault(_normalizar(valor), []).append(i)
+            self._fechas.agregar([fecha_a_entero(doc.get("fecha"))])
+
+        self.total = len(self._fechas)
+
+    def _ids_campo(self, campo: str, valor: str, subcadena: bool = False):
+        buscado = _normalizar(valor)
+        if not subcadena:
+            return np.asarray(self._valores[campo].get(buscado, []), dtype=np.int64)
+        partes = [ids for v, ids in self._valores[campo].items() if buscado in v]
+        if not partes:
+            return np.zeros(0, dtype=np.int64)
+        return np.unique(np.concatenate([np.asarray(p, dtype=np.int64) for p in partes]))
+
+    def seleccionar(self, tipo: str = None, origen: str = None, tribunal: str = None,
+                    fecha_desde: str = None, fecha_hasta: str = None):
+        """
+        Ids (int64, ordenados) que cumplen todos los filtros indicados,
+        o None si no se indicó ninguno.
+        """
+        if not any((tipo, origen, tribunal, fecha_desde, fecha_hasta)):
+            return None
+
+        with self._lock:
+            seleccion = None
+            for campo, valor in (("tipo", tipo), ("origen", origen), ("tribunal", tribunal)):
+                if not valor:
+                    continue
+                ids = self._ids_campo(campo, valor, subcadena=(campo == "tribunal"))
+                seleccion = ids if seleccion is None else np.intersect1d(seleccion, ids)
+
+            if fecha_desde or fecha_hasta:
+                fechas = self._fechas.datos
+                mascara = fechas > 0
+                if fecha_desde:
+                    mascara &= fechas >= fecha_a_entero(fecha_desde)
+                if fecha_hasta:
+                    mascara &= fechas <= fecha_a_entero(fecha_hasta)
+                ids = np.nonzero(mascara)[0].astype(np.int64)
+                seleccion = ids if seleccion is None else np.intersect1d(seleccion, ids)
+
+        return seleccion
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            return {
+                "construido": self.construido,
+                "documentos": self.total,
+                "con_fecha": int(np.count_nonzero(self._fechas.datos)),
+                "valores": {campo: len(v) for campo, v in self._valores.items()},
+            }
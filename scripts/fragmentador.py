@@ -0,0 +1,248 @@
+# scripts/fragmentador.py
+
+import re
+from bisect import bisect_right
+
+# "ARTÍCULO 245", "Art. 245 bis.-", "Artículo 12°:" al comienzo de una línea
+RE_ARTICULO = re.compile(
+    r"^[ \t]*(?:ART[ÍI]CULO|Art[íi]culo|ART\.|Art\.)[ \t]*(\d+)[ \t]*(bis|ter|quater)?[ \t]*[°º]?",
+    re.MULTILINE,
+)
+
+# Encabezados: TÍTULO / CAPÍTULO / SECCIÓN ... o una línea corta toda en mayúsculas
+RE_ENCABEZADO = re.compile(
+    r"^[ \t]*(?:(?:T[ÍI]TULO|CAP[ÍI]TULO|SECCI[ÓO]N|PARTE|LIBRO)\b[^\n]*"
+    r"|[A-ZÁÉÍÓÚÑ][A-ZÁÉÍÓÚÑ0-9 ,;.\-–—]{3,80})[ \t]*$",
+    re.MULTILINE,
+)
+
+# Fin de oración: puntuación seguida de espacio y mayúscula / número / apertura, o párrafo
+RE_FIN_ORACION = re.compile(r"[.;:!?…](?=\s+[\"“(¿¡A-ZÁÉÍÓÚÑ0-9])|\n[ \t]*\n")
+
+# Abreviaturas que terminan en punto sin cerrar la oración
+ABREVIATURAS = {
+    "art", "arts", "inc", "incs", "ap", "dr", "dra", "sr", "sra", "pag", "pág", "págs",
+    "cfr", "conf", "etc", "nro", "núm", "n", "ss", "sgtes", "cap", "ed", "vol", "cit", "op",
+}
+
+ESTRATEGIAS = ("palabras", "ventana", "estructura")
+
+
+class TextoPaginado:
+    """
+    Texto completo de un libro con el número de página de cada posición.
+    Une los cortes de palabra con guion al final de línea y normaliza
+    espacios dentro de cada línea (los saltos se conservan para detectar
+    encabezados y artículos).
+    """
+
+    def __init__(self, paginas: list[str], primera: int = 1):
+        partes, self.inicios, posicion = [], [], 0
+        for pagina in paginas:
+            pagina = self.limpiar(pagina or "")
+            self.inicios.append(posicion)
+            partes.append(pagina)
+            posicion += len(pagina) + 2
+        self.texto = "\n\n".join(partes)
+        self.primera = primera
+
+    @staticmethod
+    def limpiar(texto: str) -> str:
+        texto = re.sub(r"(\w)-[ \t]*\n[ \t]*(\w)", r"\1\2", texto)
+        lineas = (" ".join(linea.split()) for linea in texto.splitlines())
+        return "\n".join(lineas).strip()
+
+    def pagina(self, posicion: int) -> int:
+        return self.primera + max(0, bisect_right(self.inicios, posicion) - 1)
+
+
+def _palabras(texto: str) -> int:
+    return len(texto.split())
+
+
+def oraciones(texto: str, inicio: int, fin: int) -> list[tuple[int, int]]:
+    """Spans (inicio, fin) de las oraciones de texto[inicio:fin]."""
+    spans, desde = [], inicio
+    for m in RE_FIN_ORACION.finditer(texto, inicio, fin):
+        if m.group().startswith((".",)):
+            previa = re.search(r"(\w+)$", texto[desde:m.start()])
+            if previa and (previa.group(1).lower() in ABREVIATURAS or len(previa.group(1)) == 1):
+                continue
+        corte = m.end()
+        if texto[desde:corte].strip():
+            spans.append((desde, corte))
+        desde = corte
+    if texto[desde:fin].strip():
+        spans.append((desde, fin))
+    return spans
+
+
+def unidades(texto: str, min_palabras: int = 50) -> list[dict]:
+    """
+    Divide el texto en unidades estructurales: cada artículo empieza una
+    unidad nueva; un encabezado también, salvo que la unidad en curso sea
+    más corta que `min_palabras` (así un título no queda solo). Los
+    encabezados sueltos sin artículo se pegan al artículo que les sigue, y
+    los consecutivos ("CAPÍTULO II" + "DE LA EXTINCIÓN") forman una sola
+    sección. Devuelve dicts con inicio, fin, articulo y seccion.
+    """
+    cortes = [(m.start(), "articulo", m) for m in RE_ARTICULO.finditer(texto)]
+    cortes += [(m.start(), "encabezado", m) for m in RE_ENCABEZADO.finditer(texto)
+               if not RE_ARTICULO.match(m.group())]
+    cortes.sort(key=lambda c: c[0])
+
+    salida = []
+    actual = {"inicio": 0, "articulo": None, "seccion": None}
+    seccion, fin_encabezado = None, -1
+    for posicion, clase, m in cortes:
+        corta = _palabras(texto[actual["inicio"]:posicion]) < min_palabras
+        if clase == "encabezado":
+            encabezado = m.group().strip()
+            contiguo = seccion and not texto[fin_encabezado:posicion].strip()
+            seccion = f"{seccion} - {encabezado}" if contiguo else encabezado
+            fin_encabezado = m.end()
+            if corta:
+                actual["seccion"] = seccion if actual["articulo"] is None else actual["seccion"] or seccion
+                continue
+            articulo = None
+        else:
+            articulo = m.group(1) + (f" {m.group(2)}" if m.group(2) else "")
+            if corta and actual["articulo"] is None:
+                # Solo encabezados antes del artículo: quedan en su unidad
+                actual.update(articulo=articulo, seccion=seccion)
+                continue
+
+        if texto[actual["inicio"]:posicion].strip():
+            salida.append({**actual, "fin": posicion})
+        actual = {"inicio": posicion, "articulo": articulo, "seccion": seccion}
+
+    if texto[actual["inicio"]:].strip():
+        salida.append({**actual, "fin": len(texto)})
+    return salida
+
+
+def _por_palabras(texto: str, inicio: int, fin: int, tam: int, paso: int) -> list[tuple[int, int]]:
+    palabras = [m.span() for m in re.finditer(r"\S+", texto[inicio:fin])]
+    spans = []
+    for i in range(0, max(len(palabras) - (tam - paso), 1), paso):
+        grupo = palabras[i:i + tam]
+        if grupo:
+            spans.append((inicio + grupo[0][0], inicio + grupo[-1][1]))
+    return spans
+
+
+def _empaquetar(texto: str, spans: list[tuple[int, int]], max_palabras: int,
+                solapamiento: int) -> list[tuple[int, int]]:
+    """
+    Agrupa oraciones consecutivas hasta `max_palabras`. Cada fragmento
+    repite al comienzo las últimas oraciones del anterior (hasta
+    `solapamiento` palabras). Una oración más larga que el máximo se corta
+    por palabras.
+    """
+    # Oraciones largas -> ventanas de palabras
+    piezas = []
+    for a, b in spans:
+        if _palabras(texto[a:b]) > max_palabras:
+            piezas.extend(_por_palabras(texto, a, b, max_palabras, max(1, max_palabras - solapamiento)))
+        else:
+            piezas.append((a, b))
+
+    fragmentos, actual, palabras = [], [], 0
+    for pieza in piezas:
+        n = _palabras(texto[pieza[0]:pieza[1]])
+        if actual and palabras + n > max_palabras:
+            fragmentos.append((actual[0][0], actual[-1][1]))
+            # Solapamiento: oraciones finales del fragmento recién cerrado
+            cola, en_cola = [], 0
+            for previa in reversed(actual):
+                m = _palabras(texto[previa[0]:previa[1]])
+                if en_cola + m > solapamiento or en_cola + m + n > max_palabras:
+                    break
+                cola.insert(0, previa)
+                en_cola += m
+            actual, palabras = cola, en_cola
+        actual.append(pieza)
+        palabras += n
+    if actual:
+        fragmentos.append((actual[0][0], actual[-1][1]))
+    return fragmentos
+
+
+def fragmentar(paginas: list[str], estrategia: str = "estructura", max_palabras: int = 250,
+               solapamiento: int = 40, primera_pagina: int = 1) -> list[dict]:
+    """
+    Fragmenta las páginas de un libro. Estrategias:
+    - palabras: ventanas fijas de `max_palabras` sin solapamiento (la carga original)
+    - ventana: ventanas fijas con `solapamiento` palabras repetidas
+    - estructura: respeta artículos, encabezados y oraciones, con solapamiento
+      por oraciones dentro del mismo artículo
+    Cada fragmento: texto, inicio/fin (posiciones en el texto completo),
+    paginas (desde, hasta), articulo y seccion (estos dos solo en estructura).
+    """
+    if estrategia not in ESTRATEGIAS:
+        raise ValueError(f"Estrategia desconocida: {estrategia} (opciones: {', '.join(ESTRATEGIAS)})")
+
+    libro = TextoPaginado(paginas, primera=primera_pagina)
+    texto = libro.texto
+
+    if estrategia == "estructura":
+        bloques = []
+        for unidad in unidades(texto):
+            spans = _empaquetar(
+                texto, oraciones(texto, unidad["inicio"], unidad["fin"]), max_palabras, solapamiento
+            )
+            bloques.extend((span, unidad["articulo"], unidad["seccion"]) for span in spans)
+    else:
+        paso = max_palabras if estrategia == "palabras" else max(1, max_palabras - solapamiento)
+        bloques = [(span, None, None) for span in _por_palabras(texto, 0, len(texto), max_palabras, paso)]
+
+    fragmentos = []
+    for (inicio, fin), articulo, seccion in bloques:
+        contenido = " ".join(texto[inicio:fin].split())
+        if not contenido:
+            continue
+        fragmentos.append({
+            "texto": contenido,
+            "inicio": inicio,
+            "fin": fin,
+            "paginas": (libro.pagina(inicio), libro.pagina(max(inicio, fin - 1))),
+            "articulo": articulo,
+            "seccion": seccion,
+        })
+    return fragmentos
+
+
+def articulos(paginas: list[str], primera_pagina: int = 1) -> dict:
+    """Número de artículo -> (inicio, fin) en el texto completo (la primera aparición)."""
+    texto = TextoPaginado(paginas, primera=primera_pagina).texto
+    spans = {}
+    for unidad in unidades(texto, min_palabras=0):
+        if unidad["articulo"] and unidad["articulo"] not in spans:
+            spans[unidad["articulo"]] = (unidad["inicio"], unidad["fin"])
+    return spans
+
+
+def texto_para_indice(fragmento: dict) -> str:
+    """Texto que se embebe: el artículo y la sección dan contexto a fragmentos sueltos."""
+    prefijo = " — ".join(x for x in (
+        fragmento.get("seccion"),
+        f"Art. {fragmento['articulo']}" if fragmento.get("articulo") else None,
+    ) if x)
+    return f"{prefijo}. {fragmento['texto']}" if prefijo else fragmento["texto"]
+
+
+def a_documento(fragmento: dict, numero: int, titulo: str = None) -> dict:
+    """Documento para /guardar_lote con páginas y artículo como metadatos."""
+    desde, hasta = fragmento["paginas"]
+    paginas = str(desde) if desde == hasta else f"{desde}-{hasta}"
+    documento = {
+        "texto": texto_para_indice(fragmento),
+        "respuesta": f"Fragmento {numero} del libro (pág. {paginas})",
+        "tipo": "libro",
+        "paginas": paginas,
+    }
+    if fragmento.get("articulo"):
+        documento["articulo"] = fragmento["articulo"]
+    if titulo:
+        documento["titulo"] = titulo
+    return documento
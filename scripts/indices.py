@@ -0,0 +1,226 @@
+# scripts/indices.py
+
+import os
+
+import faiss
+import numpy as np
+
+# Tipos de índice soportados por la fábrica
+TIPOS = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+
+# Métricas: coseno = producto interno sobre embeddings normalizados (L2)
+METRICAS = {
+    "coseno": faiss.METRIC_INNER_PRODUCT,
+    "l2": faiss.METRIC_L2,
+}
+
+# FAISS recomienda ~39 vectores de entrenamiento por centroide
+VECTORES_POR_CENTROIDE = 39
+
+
+def configuracion_desde_entorno() -> dict:
+    """Parámetros de la fábrica leídos de variables de entorno."""
+    return {
+        "tipo": os.getenv("FAISS_INDEX_TIPO", "flat"),
+        "metrica": os.getenv("FAISS_METRICA", "coseno"),
+        "nlist": int(os.getenv("FAISS_NLIST", "1024")),
+        "pq_m": int(os.getenv("FAISS_PQ_M", "48")),
+        "hnsw_m": int(os.getenv("FAISS_HNSW_M", "32")),
+        "ef_construction": int(os.getenv("FAISS_HNSW_EF_CONSTRUCTION", "200")),
+    }
+
+
+def crear_indice(tipo: str, dimension: int, vectores: np.ndarray = None,
+                 metrica: str = "coseno", nlist: int = 1024, pq_m: int = 48,
+                 hnsw_m: int = 32, ef_construction: int = 200):
+    """
+    Crea (y entrena, si corresponde) un índice FAISS vacío.
+    - flat: búsqueda exhaustiva, recall exacto
+    - ivf_flat: particiona en `nlist` celdas, busca en `nprobe`
+    - ivf_pq: como ivf_flat pero con vectores comprimidos (PQ de `pq_m` subvectores)
+    - hnsw: grafo navegable, sin entrenamiento
+    Los índices IVF necesitan vectores de entrenamiento; si no alcanzan,
+    se devuelve un índice flat.
+    """
+    if tipo not in TIPOS:
+        raise ValueError(f"Tipo de índice desconocido: {tipo}. Opciones: {', '.join(TIPOS)}")
+    if metrica not in METRICAS:
+        raise ValueError(f"Métrica desconocida: {metrica}. Opciones: {', '.join(METRICAS)}")
+
+    metric_type = METRICAS[metrica]
+
+    if tipo == "flat":
+        return _crear_flat(dimension, metric_type)
+
+    if tipo == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, hnsw_m, metric_type)
+        index.hnsw.efConstruction = ef_construction
+        return index
+
+    n = 0 if vectores is None else len(vectores)
+
+    # Ajustar nlist al corpus disponible
+    nlist = min(nlist, n // VECTORES_POR_CENTROIDE)
+    minimo = 256 if tipo == "ivf_pq" else 1
+    if nlist < 1 or n < minimo:
+        print(f"⚠ {n} vectores no alcanzan para entrenar {tipo}, se usa flat.")
+        return _crear_flat(dimension, metric_type)
+
+    cuantizador = _crear_flat(dimension, metric_type)
+    if tipo == "ivf_flat":
+        index = faiss.IndexIVFFlat(cuantizador, dimension, nlist, metric_type)
+    else:
+        if dimension % pq_m != 0:
+            raise ValueError(f"pq_m={pq_m} debe dividir la dimensión {dimension}")
+        index = faiss.IndexIVFPQ(cuantizador, dimension, nlist, pq_m, 8, metric_type)
+
+    index.train(preparar(index, vectores))
+    return index
+
+
+def _crear_flat(dimension: int, metric_type):
+    if metric_type == faiss.METRIC_INNER_PRODUCT:
+        return faiss.IndexFlatIP(dimension)
+    return faiss.IndexFlatL2(dimension)
+
+
+def es_coseno(index) -> bool:
+    return index.metric_type == faiss.METRIC_INNER_PRODUCT
+
+
+def con_ids(index):
+    """Envuelve un índice vacío en un IndexIDMap: los vectores se agregan con id explícito."""
+    return faiss.IndexIDMap(index)
+
+
+def base_de(index):
+    """El índice real dentro de un IndexIDMap (o el mismo índice si no está envuelto)."""
+    if isinstance(index, faiss.IndexIDMap):
+        return faiss.downcast_index(index.index)
+    return index
+
+
+def ids_en_indice(index) -> np.ndarray:
+    """Ids presentes en un IndexIDMap."""
+    return faiss.vector_to_array(index.id_map).astype(np.int64)
+
+
+def preparar(index, vectores: np.ndarray) -> np.ndarray:
+    """
+    Copia contigua float32 de `vectores`, normalizada si el índice es coseno.
+    Los logs guardan siempre el embedding crudo; la normalización se aplica
+    al entrar al índice, así un reindexado puede cambiar de métrica.
+    """
+    vectores = np.array(vectores, dtype=np.float32, copy=True, order="C")
+    if es_coseno(index) and len(vectores):
+        faiss.normalize_L2(vectores)
+    return vectores
+
+
+def agregar(index, vectores: np.ndarray, ids: np.ndarray = None):
+    if ids is None:
+        index.add(preparar(index, vectores))
+    else:
+        index.add_with_ids(preparar(index, vectores), np.ascontiguousarray(ids, dtype=np.int64))
+
+
+def a_scores(index, distancias: np.ndarray) -> np.ndarray:
+    """
+    Similitud coseno a partir de lo que devuelve index.search.
+    Para índices L2 se aproxima con 1 - d²/2, válido para embeddings
+    normalizados como los de all-MiniLM-L6-v2.
+    """
+    if es_coseno(index):
+        return distancias
+    return 1.0 - distancias / 2.0
+
+
+def tipo_de(index) -> str:
+    """Nombre del tipo de índice según la fábrica."""
+    index = base_de(index)
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf_flat"
+    return "flat"
+
+
+def parametros_busqueda(index, nprobe: int = None, ef_search: int = None, selector=None):
+    """
+    Parámetros de búsqueda por request (no modifican el índice compartido).
+    `selector` (faiss.IDSelector) restringe la búsqueda a un subconjunto de ids.
+    Devuelve None si no aplica ninguno.
+    """
+    tipo = tipo_de(index)
+
+    if tipo in ("ivf_flat", "ivf_pq") and (nprobe or selector is not None):
+        params = faiss.SearchParametersIVF()
+        if nprobe:
+            params.nprobe = min(nprobe, base_de(index).nlist)
+    elif tipo == "hnsw" and (ef_search or selector is not None):
+        params = faiss.SearchParametersHNSW()
+        if ef_search:
+            params.efSearch = ef_search
+    elif selector is not None:
+        params = faiss.SearchParameters()
+    else:
+        return None
+
+    if selector is not None:
+        params.sel = selector
+    return params
+
+
+def buscar(index, consultas: np.ndarray, k: int, nprobe: int = None, ef_search: int = None,
+           ids: np.ndarray = None, excluir: np.ndarray = None):
+    """
+    index.search con parámetros por request. Si se pasan `ids`, solo se
+    consideran esos documentos; con `excluir`, se descartan esos (ej. dados
+    de baja). El filtrado ocurre dentro de FAISS, no sobre el top-k.
+    """
+    consultas = preparar(index, consultas)
+
+    # Los selectores tienen que seguir vivos mientras corre la búsqueda
+    selector = None
+    if ids is not None:
+        ids = np.ascontiguousarray(ids, dtype=np.int64)
+        selector = faiss.IDSelectorBatch(len(ids), faiss.swig_ptr(ids))
+    elif excluir is not None and len(excluir):
+        excluir = np.ascontiguousarray(excluir, dtype=np.int64)
+        excluidos = faiss.IDSelectorBatch(len(excluir), faiss.swig_ptr(excluir))
+        selector = faiss.IDSelectorNot(excluidos)
+
+    params = parametros_busqueda(index, nprobe=nprobe, ef_search=ef_search, selector=selector)
+    if params is None:
+        return index.search(consultas, k)
+    return index.search(consultas, k, params=params)
+
+
+def buscar_exacto(index, vectores: np.ndarray, ids: np.ndarray, consultas: np.ndarray, k: int):
+    """
+    Búsqueda exacta sobre un subconjunto chico (`vectores` son las filas crudas
+    del log para `ids`). Devuelve (D, I) con la misma forma y métrica que
+    index.search, rellenando con -1 si el subconjunto tiene menos de k.
+    """
+    consultas = preparar(index, consultas)
+    base = preparar(index, vectores)
+
+    if es_coseno(index):
+        distancias = consultas @ base.T
+        orden = np.argsort(-distancias, axis=1)[:, :k]
+    else:
+        distancias = (
+            (consultas ** 2).sum(axis=1, keepdims=True)
+            - 2 * consultas @ base.T
+            + (base ** 2).sum(axis=1)
+        )
+        orden = np.argsort(distancias, axis=1)[:, :k]
+
+    D = np.full((len(consultas), k), -np.inf if es_coseno(index) else np.inf, dtype=np.float32)
+    I = np.full((len(consultas), k), -1, dtype=np.int64)
+    n = orden.shape[1]
+    D[:, :n] = np.take_along_axis(distancias, orden, axis=1)
+    I[:, :n] = np.asarray(ids, dtype=np.int64)[orden]
+    return D, I
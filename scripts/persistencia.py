@@ -0,0 +1,323 @@
+# scripts/persistencia.py
+
+import json
+import os
+import threading
+import time
+
+import faiss
+import numpy as np
+
+from scripts import indices
+from scripts.almacen_documentos import AlmacenDocumentos
+from scripts.registro_ids import RegistroIds
+
+# Reconstrucciones: vectores usados para entrenar y tamaño de cada index.add
+MUESTRA_ENTRENAMIENTO = 100_000
+LOTE_AGREGAR = 65_536
+
+
+class PersistenciaFAISS:
+    """
+    Persistencia incremental del servidor FAISS.
+    Maneja:
+    - almacén append-only de documentos (JSON Lines + offsets, leído por mmap)
+    - log append-only de embeddings (float32 crudo)
+    - ids estables, huellas y bajas de documentos (RegistroIds)
+    - snapshots periódicos / por umbral del índice
+    - recuperación ante caídas reproduciendo la cola del log
+    El índice es un IndexIDMap cuyo id es la fila del log: las filas dadas de
+    baja se excluyen al buscar hasta que una reconstrucción las saca del índice.
+    """
+
+    DOCS_LOG = "documentos.log.jsonl"
+    DOCS_OFFSETS = "documentos.offsets"
+    VECTORES_LOG = "embeddings.f32"
+    INDEX_FILE = "faiss_index.bin"
+    SNAPSHOT_META = "snapshot.json"
+    LEGACY_DOCS = "documentos.json"
+
+    def __init__(self, directorio: str, dimension: int, crear_indice,
+                 snapshot_cada: int = 1000, snapshot_segundos: float = 300,
+                 fsync: bool = False):
+        self.directorio = directorio
+        self.dimension = dimension
+        self.crear_indice = crear_indice
+        self.snapshot_cada = snapshot_cada
+        self.snapshot_segundos = snapshot_segundos
+        self.fsync = fsync
+
+        self.docs_log = os.path.join(directorio, self.DOCS_LOG)
+        self.docs_offsets = os.path.join(directorio, self.DOCS_OFFSETS)
+        self.vectores_log = os.path.join(directorio, self.VECTORES_LOG)
+        self.index_file = os.path.join(directorio, self.INDEX_FILE)
+        self.snapshot_meta = os.path.join(directorio, self.SNAPSHOT_META)
+        self.legacy_docs = os.path.join(directorio, self.LEGACY_DOCS)
+
+        self._lock = threading.Lock()
+        self._vec_fh = None
+        self.documentos = AlmacenDocumentos(self.docs_log, self.docs_offsets)
+        self.registro = RegistroIds(directorio)
+        self.total = 0
+        self.pendientes = 0
+        self.ultimo_snapshot = time.monotonic()
+
+        os.makedirs(directorio, exist_ok=True)
+
+    # ============================================================
+    # Carga y recuperación
+    # ============================================================
+    def cargar(self, codificar=None):
+        """
+        Devuelve (index, documentos), donde documentos es el AlmacenDocumentos.
+        Carga el último snapshot y reproduce la cola del log que no
+        alcanzó a quedar incluida en él.
+        """
+        self.documentos.abrir()
+        vectores = self._leer_vectores()
+
+        # Una caída a mitad de escritura puede dejar los logs desparejos
+        total = min(len(self.documentos), len(vectores))
+        if len(self.documentos) != total or len(vectores) != total:
+            print(f"⚠ Logs desparejos ({len(self.documentos)} docs / {len(vectores)} vectores), se truncan a {total}.")
+            del vectores
+            self.documentos.truncar(total)
+            self._truncar_vectores(total)
+            vectores = self._leer_vectores()
+
+        self._abrir_logs()
+        if total == 0 and self._migrar_legacy(codificar):
+            vectores = self._leer_vectores()
+            total = len(self.documentos)
+
+        self.registro.abrir(total, self.documentos)
+        self.total = total
+
+        index, en_snapshot = self._cargar_snapshot(total)
+        if index is None:
+            index = self.construir_indice(self.registro.filas_vigentes(total))
+            en_snapshot = total
+        elif en_snapshot < total:
+            # Cola posterior al snapshot: solo las filas que siguen vigentes
+            filas = en_snapshot + np.flatnonzero(self.registro.vigente(slice(en_snapshot, total)))
+            print(f"🔁 Reproduciendo {len(filas)} documentos desde el log.")
+            if len(filas):
+                indices.agregar(index, vectores[filas], ids=filas)
+
+        self.registro.sincronizar_indice(indices.ids_en_indice(index))
+        self.pendientes = total - en_snapshot
+
+        return index, self.documentos
+
+    def _cargar_snapshot(self, total: int):
+        """Devuelve (index, filas del log que cubre) o (None, 0)."""
+        if not (os.path.exists(self.index_file) and os.path.getsize(self.index_file) > 0):
+            return None, 0
+        if not os.path.exists(self.snapshot_meta):
+            return None, 0
+
+        try:
+            with open(self.snapshot_meta, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            index = faiss.read_index(self.index_file)
+        except Exception as e:
+            print(f"⚠ Snapshot ilegible, se reconstruye desde el log: {e}")
+            return None, 0
+
+        # Snapshots anteriores a los ids usaban la posición implícita
+        if not isinstance(index, faiss.IndexIDMap):
+            print("🔁 Snapshot sin ids de documento, se reconstruye el índice con IndexIDMap.")
+            return None, 0
+
+        # El snapshot solo es válido si coincide con lo que declara su metadata
+        filas = meta.get("filas", meta.get("documentos"))
+        if index.ntotal != meta.get("documentos") or filas is None or filas > total:
+            print("⚠ Snapshot inconsistente con el log, se reconstruye.")
+            return None, 0
+
+        return index, filas
+
+    def leer_vectores(self) -> np.ndarray:
+        """Vectores del log (mapeados desde disco, solo lectura)."""
+        return self._leer_vectores()
+
+    def _leer_vectores(self) -> np.ndarray:
+        if not os.path.exists(self.vectores_log):
+            return np.zeros((0, self.dimension), dtype=np.float32)
+
+        filas = os.path.getsize(self.vectores_log) // (self.dimension * 4)
+        if filas == 0:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+
+        return np.memmap(
+            self.vectores_log, dtype=np.float32, mode="r",
+            shape=(filas, self.dimension)
+        )
+
+    def _truncar_vectores(self, total: int):
+        with open(self.vectores_log, "a+b") as f:
+            f.truncate(total * self.dimension * 4)
+
+    def _migrar_legacy(self, codificar) -> bool:
+        """Convierte un documentos.json + faiss_index.bin previos al formato de log."""
+        if not (os.path.exists(self.legacy_docs) and os.path.getsize(self.legacy_docs) > 0):
+            return False
+
+        with open(self.legacy_docs, "r", encoding="utf-8") as f:
+            documentos = json.load(f)
+        if not documentos:
+            return False
+
+        vectores = None
+        if os.path.exists(self.index_file) and os.path.getsize(self.index_file) > 0:
+            try:
+                legacy = faiss.read_index(self.index_file)
+                if legacy.ntotal == len(documentos):
+                    vectores = legacy.reconstruct_n(0, legacy.ntotal)
+            except Exception as e:
+                print(f"⚠ No se pudieron recuperar los vectores del índice previo: {e}")
+
+        if vectores is None:
+            if codificar is None:
+                print("❌ No se puede migrar documentos.json sin vectores ni modelo.")
+                return False
+            vectores = codificar([d["texto"] for d in documentos])
+
+        print(f"📦 Migrando {len(documentos)} documentos al log incremental.")
+        self._escribir(documentos, np.asarray(vectores, dtype=np.float32))
+        return True
+
+    # ============================================================
+    # Escritura incremental
+    # ============================================================
+    def _abrir_logs(self):
+        if self._vec_fh is None:
+            self._vec_fh = open(self.vectores_log, "ab")
+
+    def _cerrar_logs(self):
+        if self._vec_fh is not None:
+            self._vec_fh.close()
+        self._vec_fh = None
+        self.documentos.cerrar()
+        self.registro.cerrar()
+
+    def _escribir(self, documentos: list, embeddings: np.ndarray, ids: list = None,
+                  huellas: list = None):
+        # Primero los vectores: un documento sin vector se descarta al recuperar
+        posicion = self._vec_fh.tell()
+        marca = None
+        try:
+            self._vec_fh.write(np.ascontiguousarray(embeddings, dtype=np.float32).tobytes())
+            self._vec_fh.flush()
+            if self.fsync:
+                os.fsync(self._vec_fh.fileno())
+
+            if ids is not None:
+                marca = self.registro.escribir(ids, huellas, fsync=self.fsync)
+
+            # El almacén confirma el documento
+            self.documentos.agregar(documentos, fsync=self.fsync)
+        except Exception:
+            # Sin confirmar: los bytes ya escritos correrían las filas siguientes de cada log
+            if marca is not None:
+                self.registro.descartar(marca)
+            self._truncar_vec_log(posicion)
+            raise
+
+        if ids is not None:
+            self.registro.confirmar(ids, huellas, fsync=self.fsync)
+
+    def _truncar_vec_log(self, tam: int):
+        try:
+            self._vec_fh.close()
+        except Exception:
+            pass
+        os.truncate(self.vectores_log, tam)
+        self._vec_fh = open(self.vectores_log, "ab")
+
+    def registrar(self, index, documentos: list, embeddings: np.ndarray, ids: list,
+                  huellas: list):
+        """
+        Agrega al log documentos ya indexados (en las filas total, total+1, ...)
+        con sus ids públicos y huellas de contenido.
+        Costo constante por inserción; el snapshot completo solo se escribe
+        al superar el umbral de documentos o de tiempo.
+        """
+        with self._lock:
+            self._escribir(documentos, embeddings, ids, huellas)
+            self.total += len(documentos)
+            self.pendientes += len(documentos)
+
+            vencido = time.monotonic() - self.ultimo_snapshot >= self.snapshot_segundos
+            if self.pendientes >= self.snapshot_cada or vencido:
+                self._snapshot(index)
+
+    def eliminar(self, doc_id: int) -> bool:
+        """Da de baja un documento por id público (tombstone en el log)."""
+        with self._lock:
+            return self.registro.eliminar(doc_id, fsync=self.fsync)
+
+    # ============================================================
+    # Snapshots
+    # ============================================================
+    def snapshot(self, index, forzar: bool = False):
+        with self._lock:
+            self._snapshot(index, forzar=forzar)
+
+    def _snapshot(self, index, forzar: bool = False):
+        if not forzar and self.pendientes == 0 and os.path.exists(self.snapshot_meta):
+            self.ultimo_snapshot = time.monotonic()
+            return
+
+        # Escritura atómica: archivo temporal + os.replace
+        tmp_index = self.index_file + ".tmp"
+        faiss.write_index(index, tmp_index)
+        os.replace(tmp_index, self.index_file)
+
+        tmp_meta = self.snapshot_meta + ".tmp"
+        with open(tmp_meta, "w", encoding="utf-8") as f:
+            json.dump({
+                "documentos": index.ntotal,
+                "filas": self.total,
+                "indice": type(indices.base_de(index)).__name__,
+                "timestamp": time.time(),
+            }, f)
+        os.replace(tmp_meta, self.snapshot_meta)
+
+        self.pendientes = 0
+        self.ultimo_snapshot = time.monotonic()
+
+    def construir_indice(self, filas: np.ndarray, crear_indice=None):
+        """
+        Índice nuevo (IndexIDMap) con los vectores de `filas`, entrenado con una
+        muestra y cargado por lotes para no copiar todo el log a memoria.
+        """
+        crear_indice = crear_indice or self.crear_indice
+        vectores = self._leer_vectores()
+
+        muestra = filas
+        if len(filas) > MUESTRA_ENTRENAMIENTO:
+            rng = np.random.default_rng(0)
+            muestra = np.sort(rng.choice(filas, size=MUESTRA_ENTRENAMIENTO, replace=False))
+
+        index = indices.con_ids(crear_indice(vectores[muestra]))
+        for inicio in range(0, len(filas), LOTE_AGREGAR):
+            lote = filas[inicio:inicio + LOTE_AGREGAR]
+            indices.agregar(index, vectores[lote], ids=lote)
+        return index
+
+    def reconstruir(self, crear_indice):
+        """
+        Reconstruye el índice desde el log de embeddings con `crear_indice(vectores)`,
+        solo con los documentos vigentes, y lo deja como snapshot vigente.
+        """
+        with self._lock:
+            index = self.construir_indice(self.registro.filas_vigentes(self.total), crear_indice)
+            self.registro.sincronizar_indice(indices.ids_en_indice(index))
+            self._snapshot(index, forzar=True)
+            return index
+
+    def cerrar(self, index):
+        with self._lock:
+            self._snapshot(index)
+            self._cerrar_logs()
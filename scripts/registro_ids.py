@@ -0,0 +1,337 @@
+# scripts/registro_ids.py
+
+import hashlib
+import os
+import threading
+
+import numpy as np
+
+
+def hash_contenido(doc: dict) -> int:
+    """Huella de 64 bits de texto + respuesta (espacios y mayúsculas normalizados)."""
+    texto = " ".join(str(doc.get("texto", "")).lower().split())
+    respuesta = " ".join(str(doc.get("respuesta", "")).lower().split())
+    digest = hashlib.blake2b(f"{texto}\x00{respuesta}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+class ArregloCreciente:
+    """Arreglo numpy con append amortizado (duplica la capacidad al llenarse)."""
+
+    def __init__(self, dtype, relleno=0):
+        self.dtype = np.dtype(dtype)
+        self.relleno = relleno
+        self._datos = np.full(1024, relleno, dtype=self.dtype)
+        self._n = 0
+
+    def __len__(self):
+        return self._n
+
+    @property
+    def datos(self) -> np.ndarray:
+        return self._datos[:self._n]
+
+    def _reservar(self, n: int):
+        if n > len(self._datos):
+            nuevo = np.full(max(n, 2 * len(self._datos)), self.relleno, dtype=self.dtype)
+            nuevo[:self._n] = self._datos[:self._n]
+            self._datos = nuevo
+
+    def agregar(self, valores):
+        valores = np.asarray(valores, dtype=self.dtype).ravel()
+        self._reservar(self._n + len(valores))
+        self._datos[self._n:self._n + len(valores)] = valores
+        self._n += len(valores)
+
+    def extender_hasta(self, n: int):
+        """Crece hasta `n` elementos rellenando con el valor por defecto."""
+        if n > self._n:
+            self._reservar(n)
+            self._n = n
+
+    def __getitem__(self, i):
+        return self.datos[i]
+
+    def __setitem__(self, i, valor):
+        self.datos[i] = valor
+
+
+class RegistroIds:
+    """
+    Ids estables, huellas de contenido y bajas de los documentos del servidor FAISS.
+    Cada documento ocupa una fila del log (posición en el almacén y en el log de
+    vectores) y esa fila es su id dentro del índice (IndexIDMap). El id público
+    es estable: un upsert agrega una fila nueva con el mismo id y da de baja la
+    anterior. Archivos append-only (uint64 por entrada):
+    - documentos.ids: id público de cada fila
+    - documentos.hash: huella de contenido de cada fila, para descartar duplicados
+    - eliminados.u64: filas dadas de baja (tombstones)
+    Los ids y huellas se escriben antes de confirmar el documento en el almacén;
+    al abrir se recortan a las filas confirmadas.
+    """
+
+    IDS = "documentos.ids"
+    HASHES = "documentos.hash"
+    ELIMINADOS = "eliminados.u64"
+
+    def __init__(self, directorio: str):
+        self.ids_path = os.path.join(directorio, self.IDS)
+        self.hashes_path = os.path.join(directorio, self.HASHES)
+        self.eliminados_path = os.path.join(directorio, self.ELIMINADOS)
+
+        self._lock = threading.Lock()
+        self._ids = ArregloCreciente(np.int64)
+        self._hashes = ArregloCreciente(np.uint64)
+        self._vigente = ArregloCreciente(np.bool_, relleno=False)
+        self._fila_por_id = ArregloCreciente(np.int64, relleno=-1)
+
+        # Huellas de las filas vigentes: ordenadas (carga) + dict (altas posteriores)
+        self._hash_orden = np.zeros(0, dtype=np.uint64)
+        self._hash_filas = np.zeros(0, dtype=np.int64)
+        self._hash_nuevas = {}
+
+        # Filas presentes en el índice que ya no están vigentes (se excluyen al buscar)
+        self._excluir = np.zeros(0, dtype=np.int64)
+        self.bajas_en_indice = 0
+        self.total_bajas = 0
+        self.documentos_vigentes = 0
+
+        self._fh = {}
+
+    # ============================================================
+    # Apertura
+    # ============================================================
+    @staticmethod
+    def _leer_u64(ruta: str) -> np.ndarray:
+        if not os.path.exists(ruta):
+            return None
+        tam = os.path.getsize(ruta) // 8
+        return np.fromfile(ruta, dtype=np.uint64, count=tam)
+
+    @staticmethod
+    def _reescribir(ruta: str, valores: np.ndarray):
+        tmp = ruta + ".tmp"
+        np.ascontiguousarray(valores, dtype=np.uint64).tofile(tmp)
+        os.replace(tmp, ruta)
+
+    def abrir(self, total: int, documentos):
+        """
+        Carga los archivos alineándolos a las `total` filas confirmadas.
+        Sin documentos.ids (datos previos a los ids) el id de cada fila es su posición;
+        sin documentos.hash las huellas se calculan leyendo el almacén una vez.
+        """
+        ids = self._leer_u64(self.ids_path)
+        if ids is None or len(ids) < total:
+            previos = 0 if ids is None else len(ids)
+            if total:
+                print(f"🔑 Asignando ids a {total - previos} documentos sin id.")
+            siguiente = int(ids.max()) + 1 if previos else 0
+            ids = np.concatenate([
+                np.zeros(0, dtype=np.uint64) if ids is None else ids,
+                np.arange(siguiente, siguiente + total - previos, dtype=np.uint64),
+            ])
+        ids = ids[:total]
+        self._reescribir(self.ids_path, ids)
+
+        hashes = self._leer_u64(self.hashes_path)
+        if hashes is None or len(hashes) < total:
+            previos = 0 if hashes is None else len(hashes)
+            if total:
+                print(f"🔑 Calculando huellas de {total - previos} documentos.")
+            faltantes = np.fromiter(
+                (hash_contenido(documentos[i]) for i in range(previos, total)),
+                dtype=np.uint64, count=total - previos,
+            )
+            hashes = np.concatenate([
+                np.zeros(0, dtype=np.uint64) if hashes is None else hashes, faltantes
+            ])
+        hashes = hashes[:total]
+        self._reescribir(self.hashes_path, hashes)
+
+        eliminados = self._leer_u64(self.eliminados_path)
+        eliminados = np.zeros(0, dtype=np.int64) if eliminados is None else eliminados.astype(np.int64)
+        eliminados = eliminados[eliminados < total]
+        self._reescribir(self.eliminados_path, eliminados)
+        self.total_bajas = len(eliminados)
+
+        self._ids.agregar(ids.astype(np.int64))
+        self._hashes.agregar(hashes)
+
+        # Fila vigente de cada id: la última escrita, salvo que esté dada de baja
+        if total:
+            self._fila_por_id.extender_hasta(int(self._ids.datos.max()) + 1)
+            np.maximum.at(self._fila_por_id.datos, self._ids.datos, np.arange(total, dtype=np.int64))
+
+        self._vigente.extender_hasta(total)
+        vigentes = self._fila_por_id.datos[self._fila_por_id.datos >= 0]
+        self._vigente[vigentes] = True
+        self._vigente[eliminados] = False
+        borrados = self._ids.datos[eliminados]
+        self._fila_por_id[borrados[self._fila_por_id[borrados] == eliminados]] = -1
+
+        filas = np.flatnonzero(self._vigente.datos)
+        self.documentos_vigentes = len(filas)
+        orden = np.argsort(self._hashes.datos[filas], kind="stable")
+        self._hash_orden = self._hashes.datos[filas][orden]
+        self._hash_filas = filas[orden]
+
+        for ruta in (self.ids_path, self.hashes_path, self.eliminados_path):
+            self._fh[ruta] = open(ruta, "ab")
+
+    def cerrar(self):
+        for fh in self._fh.values():
+            fh.close()
+        self._fh = {}
+
+    # ============================================================
+    # Consultas
+    # ============================================================
+    def __len__(self):
+        return len(self._ids)
+
+    def siguiente_id(self) -> int:
+        return len(self._fila_por_id)
+
+    def validar_ids(self, ids) -> np.ndarray:
+        """
+        Ids de filas nuevas: existentes (upsert) o a continuación del último.
+        Un id más alto dejaría un hueco del tamaño del id en _fila_por_id.
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        limite = self.siguiente_id() + len(ids)
+        if len(ids) and (int(ids.min()) < 0 or int(ids.max()) >= limite):
+            raise ValueError(f"Ids fuera de rango: deben estar entre 0 y {limite - 1}")
+        return ids
+
+    def fila(self, doc_id: int) -> int:
+        """Fila vigente del id público, o -1 si no existe o fue eliminado."""
+        if doc_id < 0 or doc_id >= len(self._fila_por_id):
+            return -1
+        return int(self._fila_por_id[doc_id])
+
+    def id_de(self, fila: int) -> int:
+        return int(self._ids[fila])
+
+    def huella(self, fila: int) -> int:
+        return int(self._hashes[fila])
+
+    def vigente(self, filas) -> np.ndarray:
+        return self._vigente.datos[filas]
+
+    def filas_vigentes(self, hasta: int = None) -> np.ndarray:
+        return np.flatnonzero(self._vigente.datos[:hasta])
+
+    def excluir(self) -> np.ndarray:
+        """Filas que siguen en el índice pero no deben aparecer en resultados."""
+        return self._excluir
+
+    def duplicado(self, huella: int):
+        """Id público de un documento vigente con la misma huella, o None."""
+        fila = self._hash_nuevas.get(huella)
+        if fila is not None and self._vigente[fila]:
+            return self.id_de(fila)
+
+        pos = int(np.searchsorted(self._hash_orden, np.uint64(huella)))
+        while pos < len(self._hash_orden) and self._hash_orden[pos] == huella:
+            if self._vigente[self._hash_filas[pos]]:
+                return self.id_de(self._hash_filas[pos])
+            pos += 1
+        return None
+
+    # ============================================================
+    # Escritura (llamar con las escrituras del servidor serializadas)
+    # ============================================================
+    def _append(self, ruta: str, valores, fsync: bool):
+        fh = self._fh[ruta]
+        fh.write(np.ascontiguousarray(valores, dtype=np.uint64).tobytes())
+        fh.flush()
+        if fsync:
+            os.fsync(fh.fileno())
+
+    def _truncar(self, ruta: str, tam: int):
+        """Vuelve un archivo append a `tam` bytes (descarta una escritura fallida)."""
+        try:
+            self._fh[ruta].close()
+        except Exception:
+            pass
+        os.truncate(ruta, tam)
+        self._fh[ruta] = open(ruta, "ab")
+
+    def escribir(self, ids: list, huellas: list, fsync: bool = False) -> dict:
+        """
+        Primera fase del alta: escribe ids y huellas de filas nuevas en disco,
+        antes de que el almacén confirme los documentos. No cambia el estado
+        en memoria. Devuelve la marca para `descartar` si el almacén falla.
+        """
+        with self._lock:
+            # Validación y reserva antes de escribir en disco
+            ids = self.validar_ids(ids)
+            self._fila_por_id.extender_hasta(int(ids.max()) + 1)
+            marca = {ruta: self._fh[ruta].tell() for ruta in (self.ids_path, self.hashes_path)}
+            try:
+                self._append(self.ids_path, ids, fsync)
+                self._append(self.hashes_path, huellas, fsync)
+            except Exception:
+                self._descartar(marca)
+                raise
+            return marca
+
+    def _descartar(self, marca: dict):
+        for ruta, tam in marca.items():
+            self._truncar(ruta, tam)
+
+    def descartar(self, marca: dict):
+        """Deshace `escribir` cuando los documentos no llegaron a confirmarse."""
+        with self._lock:
+            self._descartar(marca)
+
+    def confirmar(self, ids: list, huellas: list, fsync: bool = False):
+        """
+        Segunda fase del alta, con los documentos ya confirmados en el
+        almacén: las filas pasan a estar vigentes y un id que ya tenía fila
+        vigente (upsert) da de baja la anterior.
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        with self._lock:
+            reemplazadas = [self.fila(int(i)) for i in ids]
+            reemplazadas = [f for f in reemplazadas if f >= 0]
+
+            inicio = len(self._ids)
+            self._ids.agregar(ids)
+            self._hashes.agregar(huellas)
+            self._vigente.agregar(np.ones(len(ids), dtype=np.bool_))
+            self.documentos_vigentes += len(ids)
+            for fila, (doc_id, huella) in enumerate(zip(ids.tolist(), huellas), start=inicio):
+                self._fila_por_id[doc_id] = fila
+                self._hash_nuevas[int(huella)] = fila
+
+            if reemplazadas:
+                self._dar_de_baja(reemplazadas, fsync)
+
+    def eliminar(self, doc_id: int, fsync: bool = False) -> bool:
+        with self._lock:
+            fila = self.fila(doc_id)
+            if fila < 0:
+                return False
+            self._fila_por_id[doc_id] = -1
+            self._dar_de_baja([fila], fsync)
+            return True
+
+    def _dar_de_baja(self, filas: list, fsync: bool):
+        self._append(self.eliminados_path, filas, fsync)
+        self._vigente[np.asarray(filas, dtype=np.int64)] = False
+        self._excluir = np.union1d(self._excluir, np.asarray(filas, dtype=np.int64))
+        self.bajas_en_indice += len(filas)
+        self.total_bajas += len(filas)
+        self.documentos_vigentes -= len(filas)
+
+    def sincronizar_indice(self, filas_en_indice: np.ndarray):
+        """
+        Recalcula las filas a excluir a partir de las presentes en el índice
+        (al cargar o después de una compactación).
+        """
+        with self._lock:
+            filas_en_indice = np.asarray(filas_en_indice, dtype=np.int64)
+            dentro = filas_en_indice[filas_en_indice < len(self._vigente)]
+            self._excluir = np.sort(dentro[~self._vigente.datos[dentro]])
+            self.bajas_en_indice = len(self._excluir)
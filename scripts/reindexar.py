@@ -0,0 +1,61 @@
+# scripts/reindexar.py
+#
+# Reconstruye el índice FAISS desde el log de embeddings con otro tipo de índice.
+# Ejecutar con el servidor FAISS detenido (al cerrar escribe su propio snapshot):
+#   python -m scripts.reindexar --tipo ivf_flat --nlist 256 --directorio scripts/data
+# También sirve para pasar un índice L2 existente a coseno (--metrica coseno).
+
+import argparse
+import time
+
+from scripts import indices
+from scripts.persistencia import PersistenciaFAISS
+
+DIMENSION = 384
+
+
+def reindexar(directorio, tipo, metrica="coseno", nlist=1024, pq_m=48, hnsw_m=32,
+              ef_construction=200):
+    config = {
+        "tipo": tipo,
+        "metrica": metrica,
+        "nlist": nlist,
+        "pq_m": pq_m,
+        "hnsw_m": hnsw_m,
+        "ef_construction": ef_construction,
+    }
+
+    def crear(vectores):
+        return indices.crear_indice(dimension=DIMENSION, vectores=vectores, **config)
+
+    persistencia = PersistenciaFAISS(directorio, DIMENSION, crear_indice=crear)
+    persistencia.cargar()
+
+    print(f"🏗 Entrenando y reconstruyendo índice {tipo} con {persistencia.registro.documentos_vigentes} documentos...")
+    inicio = time.perf_counter()
+    index = persistencia.reconstruir(crear)
+    persistencia.cerrar(index)
+
+    print(
+        f"✔ Índice {indices.tipo_de(index)} con {index.ntotal} vectores "
+        f"guardado en {time.perf_counter() - inicio:.1f}s."
+    )
+    return index
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconstruir el índice FAISS desde documentos")
+    parser.add_argument("--directorio", default=".")
+    parser.add_argument("--tipo", choices=indices.TIPOS, default="flat")
+    parser.add_argument("--metrica", choices=list(indices.METRICAS), default="coseno")
+    parser.add_argument("--nlist", type=int, default=1024)
+    parser.add_argument("--pq-m", type=int, default=48)
+    parser.add_argument("--hnsw-m", type=int, default=32)
+    parser.add_argument("--ef-construction", type=int, default=200)
+    args = parser.parse_args()
+
+    reindexar(
+        args.directorio, args.tipo, metrica=args.metrica,
+        nlist=args.nlist, pq_m=args.pq_m,
+        hnsw_m=args.hnsw_m, ef_construction=args.ef_construction,
+    )